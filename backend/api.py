@@ -1,20 +1,37 @@
 import json
-from types import SimpleNamespace
+import os
 from pathlib import Path
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 import tempfile
 import csv
+import pickle
+from email.utils import formatdate, parsedate_to_datetime
 import networkx as nx
 from pydantic import BaseModel, Field
-from .node_feature_generation import feature_generator
 import shutil
-from fastapi import BackgroundTasks
 import uuid
 
-from .run import run_poligras
-from .dynamic_updates import apply_edge_updates, parse_update_stream, UpdateStreamError
+from .dynamic_updates import MaintenancePolicy, parse_update_stream, UpdateStreamError
+from .update_ingest import DEFAULT_BATCH_SIZE, ingest_updates, iter_file_chunks
+from .summary_versions import SummaryRegistry, VersionUnavailableError
+from .summary_events import summary_event_stream
+from .summary_drift import DriftMonitor, DriftPolicy
+from .summary_jobs import JobManager
+from .dataset_catalog import DatasetCatalog
+from .artifact_bundle import BundleFormatError, ensure_bundle, load_output
+from .artifact_pages import DEFAULT_PAGE_SIZE, PageQuery, PageQueryError, StaleCursorError, page
+from .supernode_index import DEFAULT_EDGE_LIMIT, SupernodeIndex
+from .artifact_cache import ArtifactCache, cache_budget_from_env
+from .derived_artifacts import derived_file, source_stamp, text_writer
+from .atomic_files import gzip_copy
+from .csr_graph import CSRFormatError, CSRGraph, csr_path_for
+from .graph_ingest import is_graph_source
+from .feature_jobs import UPLOADS_DIR_NAME, FeaturePool, read_state
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from typing import Optional
 
 # Increase multipart limits for large folder uploads
 try:
@@ -25,6 +42,8 @@ except ImportError:
     pass
 
 
+TRUST_PICKLE_UPLOADS = os.environ.get("POLIGRAS_TRUST_PICKLE_UPLOADS", "").lower() in ("1", "true", "yes")
+
 ALLOWED_EXTS = (
     ".csv",
     ".zip",
@@ -46,10 +65,116 @@ class PoligrasRequest(BaseModel):
     dropout: float = 0.0
     weight_decay: float = 0.0
     bad_counter: int = 0
+    seed: Optional[int] = Field(None, description="Random seed; runs with equal inputs, parameters and seed are reused")
 
 
 app = FastAPI(title="Poligras Service", version="1.0.0")
 
+# Long-lived dynamic summaries, one per dataset, shared by all update endpoints.
+# POLIGRAS_UPDATE_WINDOW (seconds of update timestamps) turns on sliding-window expiry.
+# POLIGRAS_UPDATE_SHARDS > 1 applies batches in that many long-lived worker
+# processes per dataset instead; membership then stays fixed (no maintenance).
+_update_window = os.environ.get("POLIGRAS_UPDATE_WINDOW")
+_update_shards = 1 if _update_window else int(os.environ.get("POLIGRAS_UPDATE_SHARDS", "1"))
+summary_registry = SummaryRegistry(
+    Path(__file__).parent / "dataset",
+    policy=MaintenancePolicy() if _update_shards <= 1 else None,
+    window=float(_update_window) if _update_window else None,
+    shards=_update_shards,
+)
+
+
+# Maps dataset folders and meta ids to their artifacts, so no endpoint scans
+# the datasets directory to find an output.
+dataset_catalog = DatasetCatalog(Path(__file__).parent / "dataset")
+
+
+# Parsed outputs, bundles and drill-down indexes shared by requests, keyed by
+# file path and mtime. POLIGRAS_ARTIFACT_CACHE_MB bounds it (default 512).
+artifact_cache = ArtifactCache(cache_budget_from_env())
+
+
+def _cached_output(output_path: Path) -> dict:
+    """Parsed output; shared between requests, so never mutate it."""
+    return artifact_cache.get("payload", output_path, load_output)
+
+
+def _cached_bundle(output_path: Path):
+    return artifact_cache.get("bundle", output_path, ensure_bundle, weigh=lambda bundle: bundle.estimated_memory())
+
+
+def _resolve_output_path(dataset_id: str) -> Path:
+    """`output.json` of a dataset given its folder name or its `meta.dataset` id."""
+    entry = dataset_catalog.resolve(dataset_id)
+    if entry is None or not entry.has_output:
+        raise HTTPException(404, "Output not found for this dataset")
+    return entry.output_path
+
+
+def _get_session(dataset_id: str):
+    """Dynamic summary of a dataset given its folder name or its `meta.dataset` id."""
+    try:
+        return summary_registry.get(dataset_id)
+    except FileNotFoundError:
+        pass
+    entry = dataset_catalog.resolve(dataset_id)
+    if entry is None or entry.id == dataset_id:
+        raise HTTPException(404, "Output not found for this dataset")
+    try:
+        return summary_registry.get(entry.id)
+    except FileNotFoundError:
+        raise HTTPException(404, "Output not found for this dataset")
+
+
+def _env_threshold(name: str, default: Optional[float]) -> Optional[float]:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return None if value.strip().lower() in ("", "off", "none") else float(value)
+
+
+# Uploaded graphs are ingested and their features generated in worker
+# processes; runs of a dataset wait until its features are ready.
+feature_pool = FeaturePool(
+    Path(__file__).parent / "dataset",
+    max_workers=int(os.environ.get("POLIGRAS_FEATURE_WORKERS", "1")),
+    on_done=dataset_catalog.record,
+)
+
+# Poligras fits run in worker processes, never on the event loop.
+job_manager = JobManager(
+    Path(__file__).parent / "dataset",
+    max_workers=int(os.environ.get("POLIGRAS_JOB_WORKERS", "2")),
+)
+
+def _wait_for_job(dataset_id: str, parameters: dict, only_if_missing: bool = False) -> Path:
+    """Run a fit through the job queue, wait for it and return the path of the written output.
+
+    With `only_if_missing`, concurrent callers (in any worker process) share
+    one fit of the dataset.
+    """
+    job = job_manager.submit(dataset_id, parameters, only_if_missing=only_if_missing)
+    job.wait()
+    if job.status != "succeeded":
+        raise HTTPException(500, f"Poligras run {job.status}: {job.error}")
+    return Path(__file__).parent / "dataset" / dataset_id / "output.json"
+
+
+def _run_in_job(dataset_id: str, parameters: dict, only_if_missing: bool = False) -> dict:
+    """Like `_wait_for_job`, but returns the parsed output."""
+    return _cached_output(_wait_for_job(dataset_id, parameters, only_if_missing))
+
+
+# Re-summarises a dataset in the background once its dynamic summary has drifted
+# too far from the last full run ("off" disables a check).
+drift_monitor = DriftMonitor(
+    summary_registry,
+    DriftPolicy(
+        max_correction_growth=_env_threshold("POLIGRAS_DRIFT_MAX_CORRECTION_GROWTH", DriftPolicy.max_correction_growth),
+        min_reward_ratio=_env_threshold("POLIGRAS_DRIFT_MIN_REWARD_RATIO", DriftPolicy.min_reward_ratio),
+    ),
+)
+
 # Enhanced CORS middleware configuration
 app.add_middleware(
     CORSMiddleware,
@@ -85,53 +210,114 @@ async def bad_request_handler(request, exc):
 
 
 
+def _save_upload(file: UploadFile, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer, 1 << 20)
+
+
 @app.post("/upload-multiple")
 async def upload_multiple_files(
-    background_tasks: BackgroundTasks,
     files: list[UploadFile] = File(...)
 ):
+    """Store an uploaded dataset.
+
+    Edge lists (SNAP, CSV, graph-txt) and archives of them are parsed into a
+    CSR graph, and node features generated, in the feature worker pool;
+    `GET /datasets/{id}/features` reports when they are ready. Pickled `_graph` / `_feat` files are only
+    accepted when POLIGRAS_TRUST_PICKLE_UPLOADS is set, since loading them
+    runs arbitrary code.
+    """
     try:
+        for file in files:
+            filename = file.filename.lower()
+            if not is_graph_source(filename) and ("_graph" in filename or "_feat" in filename) and not TRUST_PICKLE_UPLOADS:
+                raise HTTPException(
+                    400,
+                    f"'{file.filename}' looks like a pickled graph or feature file, which this server does not load; "
+                    "upload an edge list (SNAP, CSV or graph-txt, optionally zipped or tarred) instead",
+                )
+
         dataset_id = str(uuid.uuid4())
         dataset_dir = Path(__file__).parent / "dataset" / dataset_id
         dataset_dir.mkdir(parents=True, exist_ok=True)
 
         uploaded_files = []
+        graph_sources = []
         has_graph = False
         has_feat = False
 
         for file in files:
             filename = file.filename.lower()
+            file_path = None
 
-            if "_graph" in filename:
+            if is_graph_source(filename):
+                file_path = dataset_dir / UPLOADS_DIR_NAME / Path(file.filename).name
+                graph_sources.append(file_path)
+                new_filename = file_path.name
+            elif "_graph" in filename:
                 has_graph = True
                 new_filename = f"{dataset_id}_graph"
             elif "_feat" in filename:
                 has_feat = True
                 new_filename = f"{dataset_id}_feat"
             else:
-                new_filename = file.filename
+                new_filename = Path(file.filename).name
 
-            file_path = dataset_dir / new_filename
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+            # Copied in a worker thread so large uploads never block the event loop.
+            await run_in_threadpool(_save_upload, file, file_path or dataset_dir / new_filename)
 
             uploaded_files.append(new_filename)
 
-        # Run feature generation in background
-        if has_graph and not has_feat:
-            background_tasks.add_task(feature_generator, dataset_id)
+        dataset_catalog.record(dataset_id)
+
+        # Ingest edge lists, or just generate features, in a worker process
+        if graph_sources or (has_graph and not has_feat):
+            feature_pool.submit(dataset_id, graph_sources, generate_features=not has_feat)
 
         return {
             "dataset_id": dataset_id,
             "files_uploaded": len(files),
             "files": uploaded_files,
-            "features_generation_started": has_graph and not has_feat
+            "graph_ingestion_started": bool(graph_sources),
+            "features_generation_started": (has_graph or bool(graph_sources)) and not has_feat
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, f"Upload error: {str(e)}")
 
 
+@app.get("/datasets/{dataset_id}/graph")
+def get_graph_info(dataset_id: str):
+    """Size and ingestion stats of a dataset's CSR graph."""
+    dataset_dir = Path(__file__).parent / "dataset" / dataset_id
+    try:
+        graph = CSRGraph(csr_path_for(dataset_dir, dataset_id))
+    except CSRFormatError:
+        raise HTTPException(404, "No ingested graph found for this dataset")
+    return {
+        "dataset_id": dataset_id,
+        "num_nodes": graph.num_nodes,
+        "num_edges": graph.num_edges,
+        "directed": graph.manifest["directed"],
+        "stats": graph.stats,
+    }
+
+
+@app.get("/datasets/{dataset_id}/features")
+def get_feature_status(dataset_id: str):
+    """Readiness of a dataset's node features (`pending`, `ready` or `failed`)."""
+    dataset_dir = Path(__file__).parent / "dataset" / dataset_id
+    if not dataset_dir.is_dir():
+        raise HTTPException(404, f"Dataset '{dataset_id}' not found")
+    state = feature_pool.status(dataset_id)
+    if state is None:
+        state = {"status": "ready" if (dataset_dir / f"{dataset_id}_feat").exists() else "missing", "error": None, "updated_at": None}
+    return {"dataset_id": dataset_id, **state}
+
+
 @app.post("/poligras")
 def run_poligras_endpoint(payload: PoligrasRequest):
     try:
@@ -140,13 +326,8 @@ def run_poligras_endpoint(payload: PoligrasRequest):
         if not dataset_dir.exists():
             raise HTTPException(404, f"Dataset '{payload.dataset}' not found")
         
-        args = SimpleNamespace(**payload.dict())
-        result = run_poligras(args)
-        
-        if result is None:
-            raise HTTPException(500, "Analysis completed but returned no results")
-        
-        return result
+        parameters = payload.dict()
+        return _run_in_job(parameters.pop("dataset"), parameters)
         
     except HTTPException:
         raise
@@ -154,6 +335,38 @@ def run_poligras_endpoint(payload: PoligrasRequest):
         raise HTTPException(500, f"Processing error: {str(e)}")
 
 
+@app.post("/jobs", status_code=202)
+def submit_job(payload: PoligrasRequest):
+    """Queue a Poligras fit and return its job; the output is written to the dataset directory."""
+    dataset_dir = Path(__file__).parent / "dataset" / payload.dataset
+    if not dataset_dir.exists():
+        raise HTTPException(404, f"Dataset '{payload.dataset}' not found")
+    parameters = payload.dict()
+    return job_manager.submit(parameters.pop("dataset"), parameters).as_dict()
+
+
+@app.get("/jobs")
+def list_jobs(dataset: Optional[str] = None):
+    return [job.as_dict() for job in job_manager.jobs(dataset)]
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Job status with the latest progress report (count, iteration, best reward, compression)."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return job.as_dict()
+
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return job.as_dict()
+
+
 @app.post("/upload-json")
 async def upload_json(file: UploadFile = File(...)):
     try:
@@ -166,206 +379,567 @@ async def upload_json(file: UploadFile = File(...)):
         # Stream copy directly to file
         with open(file_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
+        dataset_catalog.record(dataset_id)
             
         return {"dataset_id": dataset_id, "message": "JSON uploaded successfully"}
     except Exception as e:
         raise HTTPException(500, f"Upload error: {str(e)}")
 
 
+def _output_etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _not_modified(etag: str, mtime: float, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+    """Evaluate conditional request headers; If-None-Match wins over If-Modified-Since."""
+    if if_none_match is not None:
+        # Both encodings of one output share the validator, minus the suffix.
+        tags = {tag.strip().removeprefix("W/").replace('-gzip"', '"') for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for token in (accept_encoding or "").split(","):
+        coding, _, params = token.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            quality = params.strip().removeprefix("q=")
+            try:
+                return not params or float(quality) > 0
+            except ValueError:
+                return False
+    return False
+
+
 @app.get("/datasets/{dataset_id}/output")
-async def get_dataset_output(dataset_id: str):
-    """Always returns the ORIGINAL output.json (never dynamic updates)."""
+async def get_dataset_output(
+    dataset_id: str,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """Always returns the ORIGINAL output.json (never dynamic updates).
+
+    The stored bytes are streamed as-is, or its precompressed `output.json.gz`
+    when the client accepts gzip. `ETag`/`Last-Modified` follow the file, so
+    a repeat request with `If-None-Match`/`If-Modified-Since` gets a 304.
+    """
     try:
         dataset_dir = Path(__file__).parent / "dataset" / dataset_id
-        output_path = dataset_dir / "output.json"
+        entry = dataset_catalog.resolve(dataset_id)
+
+        stat = None
+        if entry is not None and entry.has_output:
+            output_path = entry.output_path
+            try:
+                stat = output_path.stat()
+            except FileNotFoundError:
+                # Deleted since it was indexed; refresh the row and treat the output as missing.
+                dataset_catalog.record(entry.id)
 
         # If output.json is missing but the uploaded graph exists, run Poligras
-        # synchronously so the first visualization request can obtain the
-        # generated output. This covers the common case where a user uploads
+        # (as a shared background job) and wait for it so the first
+        # visualization request can obtain the generated output. This covers the common case where a user uploads
         # graph files and is immediately routed to the visualization page.
-        if not output_path.exists():
-            # graph file uploaded by `upload_multiple_files` is saved as
-            # `{dataset_id}_graph` (pickle). If it's present, we can run Poligras.
+        if stat is None:
+            # `upload_multiple_files` leaves a CSR graph (`{dataset_id}_graph.csr`)
+            # or a trusted `{dataset_id}_graph` pickle, possibly still being prepared.
+            # If either is present or pending, we can run Poligras; the run waits for the features.
             graph_path = dataset_dir / f"{dataset_id}_graph"
-            feat_path = dataset_dir / f"{dataset_id}_feat"
-
-            if graph_path.exists():
-                # Build default args (matches defaults in run.parse_args)
-                args = SimpleNamespace(
-                    dataset=dataset_id,
-                    counts=100,
-                    group_size=200,
-                    hidden_size1=64,
-                    hidden_size2=32,
-                    lr=0.001,
-                    dropout=0.0,
-                    weight_decay=0.0,
-                    bad_counter=0,
-                )
 
-                # Run Poligras synchronously and write output.json
-                result = run_poligras(args)
-                if result is None:
-                    raise HTTPException(500, "Poligras completed but returned no output")
-
-                # After run_poligras, output.json should exist; fall through to read it
+            if graph_path.exists() or csr_path_for(dataset_dir, dataset_id).exists() or read_state(dataset_dir) is not None:
+                # Default parameters (match run.parse_args). The fit runs in a
+                # job worker; only a threadpool thread waits for it.
+                parameters = PoligrasRequest(dataset=dataset_id).dict()
+                parameters.pop("dataset")
+                output_path = await run_in_threadpool(_wait_for_job, dataset_id, parameters, True)
             else:
                 raise HTTPException(404, "Output not found for this dataset")
-
-        with open(output_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data
+            stat = output_path.stat()
+
+        etag = _output_etag(stat)
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if _not_modified(etag, stat.st_mtime, if_none_match, if_modified_since):
+            return Response(status_code=304, headers=headers)
+
+        if _accepts_gzip(accept_encoding):
+            # Written by run_poligras; compressed here once for older or uploaded outputs.
+            gzip_path = await run_in_threadpool(gzip_copy, output_path)
+            headers["ETag"] = etag[:-1] + '-gzip"'
+            headers["Content-Encoding"] = "gzip"
+            return FileResponse(gzip_path, media_type="application/json", headers=headers)
+        return FileResponse(output_path, media_type="application/json", headers=headers)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(500, f"Error reading output: {str(e)}")
 
 
-@app.post("/datasets/{dataset_id}/apply-updates")
-async def apply_updates_to_summary(dataset_id: str, updates_file: UploadFile = File(...)):
+def _page(dataset_id: str, resource: str, fields: Optional[str], **query) -> dict:
+    """One page of a stored artifact, read from the output's columnar bundle."""
+    output_path = _resolve_output_path(dataset_id)
     try:
-        dataset_dir = Path(__file__).parent / "dataset" / dataset_id
-        output_path = dataset_dir / "output.json"
+        bundle = _cached_bundle(output_path)
+        return page(bundle, resource, PageQuery(fields=fields.split(",") if fields else None, **query))
+    except StaleCursorError as exc:
+        raise HTTPException(409, str(exc)) from exc
+    except PageQueryError as exc:
+        raise HTTPException(400, str(exc)) from exc
+    except BundleFormatError as exc:
+        raise HTTPException(422, f"Output cannot be paginated: {exc}") from exc
+
+
+@app.get("/datasets/{dataset_id}/summary/nodes")
+def get_summary_nodes(
+    dataset_id: str,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    min_size: Optional[int] = None,
+):
+    """Supernodes (`id`, `size`), optionally only those with at least `min_size` members.
 
-        # If the exact dataset folder doesn't contain output.json, try to
-        # locate an output.json whose internal meta.dataset matches the
-        # requested dataset_id. This covers cases where the frontend stores
-        # a different identifier than the folder name (e.g. original meta id).
-        if not output_path.exists():
-            datasets_root = Path(__file__).parent / "dataset"
-            found = None
-            if datasets_root.exists():
-                for child in datasets_root.iterdir():
-                    candidate = child / "output.json"
-                    if candidate.exists():
-                        try:
-                            with candidate.open("r", encoding="utf-8") as f:
-                                jd = json.load(f)
-                            meta_id = jd.get("meta", {}).get("dataset")
-                            if meta_id == dataset_id:
-                                found = candidate
-                                break
-                        except Exception:
-                            continue
-
-            if found:
-                output_path = found
-            else:
-                raise HTTPException(404, "Output not found for this dataset")
+    Like the other paginated endpoints, returns `{items, total, next_cursor}`;
+    pass `next_cursor` back as `cursor` for the next page and `fields` as a
+    comma-separated list to trim each item.
+    """
+    return _page(dataset_id, "summary-nodes", fields, limit=limit, cursor=cursor, min_size=min_size)
+
+
+@app.get("/datasets/{dataset_id}/summary/edges")
+def get_summary_edges(
+    dataset_id: str,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    min_weight: Optional[float] = None,
+    min_density: Optional[float] = None,
+    top_k: Optional[int] = None,
+):
+    """Superedges (`source`, `target`, `weight`, `density`); `top_k` keeps the heaviest, heaviest first."""
+    return _page(
+        dataset_id, "summary-edges", fields,
+        limit=limit, cursor=cursor, min_weight=min_weight, min_density=min_density, top_k=top_k,
+    )
 
-        with output_path.open("r", encoding="utf-8") as f:
-            summary_payload = json.load(f)
 
-        update_bytes = await updates_file.read()
-        try:
-            update_records = parse_update_stream(update_bytes)
-        except UpdateStreamError as exc:
-            raise HTTPException(400, f"Invalid update stream file: {exc}") from exc
+@app.get("/datasets/{dataset_id}/initial/nodes")
+def get_initial_nodes(dataset_id: str, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, fields: Optional[str] = None):
+    """Nodes of the stored initial graph (`id`, `degree`)."""
+    return _page(dataset_id, "initial-nodes", fields, limit=limit, cursor=cursor)
+
+
+@app.get("/datasets/{dataset_id}/initial/edges")
+def get_initial_edges(
+    dataset_id: str,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    min_weight: Optional[float] = None,
+    top_k: Optional[int] = None,
+):
+    """Edges of the stored initial graph (`source`, `target`, `weight`)."""
+    return _page(dataset_id, "initial-edges", fields, limit=limit, cursor=cursor, min_weight=min_weight, top_k=top_k)
+
+
+@app.get("/datasets/{dataset_id}/corrections")
+def get_corrections(
+    dataset_id: str,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    kind: Optional[str] = None,
+):
+    """Correction edges (`kind`, `source`, `target`), positive before negative unless `kind` picks one."""
+    return _page(dataset_id, "corrections", fields, limit=limit, cursor=cursor, kind=kind)
+
 
-        updated_summary = apply_edge_updates(summary_payload, update_records)
+@app.get("/datasets/{dataset_id}/timeline")
+def get_timeline(dataset_id: str, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, fields: Optional[str] = None):
+    """Merge timeline steps (`n1`, `n2`, `stats`)."""
+    return _page(dataset_id, "timeline", fields, limit=limit, cursor=cursor)
 
-        updated_output_path = dataset_dir / "output_dynamic.json"
-        with updated_output_path.open("w", encoding="utf-8") as f:
-            json.dump(updated_summary, f, indent=2)
 
-        # Also persist the updated summary at the workspace root for quick inspection/debugging
-        project_root = Path(__file__).resolve().parent.parent
-        root_summary_path = project_root / f"{dataset_id}_output_dynamic.json"
-        with root_summary_path.open("w", encoding="utf-8") as f:
-            json.dump(updated_summary, f, indent=2)
+def _supernode_index(dataset_id: str) -> SupernodeIndex:
+    """Drill-down index of a dataset's output, built once per published version."""
+    output_path = _resolve_output_path(dataset_id)
+    try:
+        return artifact_cache.get(
+            "supernode-index",
+            output_path,
+            lambda path: SupernodeIndex(_cached_bundle(path)),
+            weigh=lambda index: index.nbytes,
+        )
+    except BundleFormatError as exc:
+        raise HTTPException(422, f"Output cannot be indexed: {exc}") from exc
+
+
+@app.get("/datasets/{dataset_id}/supernodes/{supernode_id}")
+def get_supernode(dataset_id: str, supernode_id: str, limit: int = DEFAULT_EDGE_LIMIT):
+    """Members of one supernode, the original edges inside it and its neighbouring supernodes.
+
+    Internal edges are rebuilt from the self-loop superedge minus its
+    negative corrections, plus positive corrections; at most `limit` are
+    listed (`truncated` tells whether there are more).
+    """
+    index = _supernode_index(dataset_id)
+    if supernode_id not in index:
+        raise HTTPException(404, f"Supernode '{supernode_id}' not found")
+    return index.describe(supernode_id, limit=limit)
+
+
+@app.get("/datasets/{dataset_id}/supernodes/{supernode_id}/expand")
+def expand_supernode(dataset_id: str, supernode_id: str, neighbour: str, limit: int = DEFAULT_EDGE_LIMIT):
+    """Original edges between a supernode and `neighbour` (both directions for directed graphs)."""
+    index = _supernode_index(dataset_id)
+    for sid in (supernode_id, neighbour):
+        if sid not in index:
+            raise HTTPException(404, f"Supernode '{sid}' not found")
+    return index.edges_between(supernode_id, neighbour, limit=limit)
+
+
+@app.post("/datasets/{dataset_id}/apply-updates")
+async def apply_updates_to_summary(
+    dataset_id: str,
+    updates_file: UploadFile = File(...),
+    since: Optional[int] = None,
+    full: bool = False,
+):
+    """Apply an update batch as a new summary version.
+
+    Updates accumulate across requests. By default the response is the diff
+    from version `since` (the previous version when omitted) to the new one;
+    `full=true` returns the whole updated summary instead. If `since` is
+    older than the retained history the diff carries a `snapshot` instead.
+    """
+    try:
+        # The folder name or the output's meta.dataset id (which the frontend
+        # may store instead), resolved through the catalog.
+        output_path = _resolve_output_path(dataset_id)
+        update_bytes = await updates_file.read()
 
-        return updated_summary
+        def _apply():
+            # Opening the session may replay the update log, and parsing and
+            # checking scale with the upload, so none of it runs on the event loop.
+            session = summary_registry.get(output_path.parent.name)
+            try:
+                update_records = parse_update_stream(update_bytes)
+                for update in update_records:
+                    session.check(update)
+            except UpdateStreamError as exc:
+                raise HTTPException(400, f"Invalid update stream file: {exc}") from exc
+
+            # The batch is fsynced to the dataset's update log before it is
+            # applied; no full summary is rewritten per request.
+            version = session.apply_updates(update_records)
+            if full:
+                return Response(content=session.snapshot_json(), media_type="application/json")
+            try:
+                return session.diff(version - 1 if since is None else since, version)
+            except VersionUnavailableError:
+                return {"from_version": since, "to_version": version, "snapshot": json.loads(session.snapshot_json())}
+
+        return await run_in_threadpool(_apply)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(500, f"Failed to apply updates: {str(e)}")
 
 
+@app.post("/datasets/{dataset_id}/apply-updates-stream")
+async def apply_update_log_to_summary(
+    dataset_id: str,
+    updates_file: UploadFile = File(...),
+    format: str = "auto",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+):
+    """Apply a line-delimited update log (NDJSON, CSV or edge list) incrementally.
+
+    Unlike `/apply-updates` the upload is parsed chunk by chunk and applied in
+    micro-batches on top of the latest dynamic summary; malformed lines are
+    reported instead of rejecting the whole file.
+    """
+    try:
+        if format not in ("auto", "ndjson", "csv", "edgelist"):
+            raise HTTPException(400, f"Unsupported update log format '{format}'")
+        if batch_size < 1:
+            raise HTTPException(400, "batch_size must be positive")
+
+        def _ingest():
+            # Opening the session may replay the update log; parsing and
+            # applying are CPU bound. Keep all of it off the event loop.
+            # Each micro-batch is logged durably by the session as it is applied.
+            session = _get_session(dataset_id)
+            start_version = session.version
+            report = ingest_updates(session, iter_file_chunks(updates_file.file), format, batch_size)
+            return {
+                "dataset_id": dataset_id,
+                "from_version": start_version,
+                "to_version": session.version,
+                **report.as_dict(),
+            }
+
+        return await run_in_threadpool(_ingest)
+    except HTTPException:
+        raise
+    except UpdateStreamError as exc:
+        raise HTTPException(400, f"Invalid update stream file: {exc}") from exc
+    except Exception as e:
+        raise HTTPException(500, f"Failed to apply update log: {str(e)}")
+
+
+@app.get("/datasets/{dataset_id}/versions")
+def get_summary_versions(dataset_id: str):
+    """Current dynamic summary version and the oldest version a diff can start from."""
+    session = _get_session(dataset_id)
+    return {
+        "dataset_id": dataset_id,
+        "version": session.version,
+        "oldest_version": session.oldest_version,
+    }
+
+
+@app.get("/datasets/{dataset_id}/diff")
+def get_summary_diff(dataset_id: str, from_version: int, to_version: Optional[int] = None):
+    """Compact diff between two dynamic summary versions (to the latest by default)."""
+    session = _get_session(dataset_id)
+    try:
+        return session.diff(from_version, to_version)
+    except VersionUnavailableError as exc:
+        raise HTTPException(410, str(exc)) from exc
+
+
+@app.get("/datasets/{dataset_id}/dynamic-output")
+def get_dynamic_output(dataset_id: str, version: Optional[int] = None):
+    """Full snapshot of the latest dynamic summary version, or of a retained `version`."""
+    session = _get_session(dataset_id)
+    if version is None:
+        return Response(content=session.snapshot_json(), media_type="application/json")
+    try:
+        return session.snapshot_at(version)
+    except VersionUnavailableError as exc:
+        raise HTTPException(410, str(exc)) from exc
+
+
+@app.post("/datasets/{dataset_id}/rollback")
+def rollback_dynamic_summary(dataset_id: str, to_version: int):
+    """Restore a retained version as a new version and return the diff from the previous one.
+
+    Cost is proportional to the changes undone. The rollback is logged like
+    any other batch, so it survives restarts.
+    """
+    session = _get_session(dataset_id)
+    try:
+        version = session.rollback(to_version)
+    except VersionUnavailableError as exc:
+        raise HTTPException(410, str(exc)) from exc
+    return {"rolled_back_to": to_version, **session.diff(version - 1, version)}
+
+
+@app.get("/datasets/{dataset_id}/drift")
+def get_summary_drift(dataset_id: str):
+    """Compression drift of the dynamic summary against the last full run, plus the latest re-summarisation job."""
+    try:
+        return drift_monitor.status(dataset_id)
+    except FileNotFoundError:
+        raise HTTPException(404, "Output not found for this dataset")
+
+
+@app.post("/datasets/{dataset_id}/resummarize", status_code=202)
+def resummarize_dataset(dataset_id: str):
+    """Re-run Poligras on the current graph in the background and swap the result in.
+
+    The run is warm-started from the current supernode membership; updates
+    applied meanwhile are replayed on top. Poll `/drift` for the job status.
+    """
+    try:
+        job = drift_monitor.trigger(dataset_id, reason="manual", force=True)
+    except FileNotFoundError:
+        raise HTTPException(404, "Output not found for this dataset")
+    if job is None:
+        raise HTTPException(409, "A re-summarisation is already running for this dataset")
+    return job.as_dict()
+
+
+@app.get("/datasets/{dataset_id}/events")
+def stream_summary_events(
+    dataset_id: str,
+    since: Optional[int] = None,
+    corrections: bool = False,
+    last_event_id: Optional[str] = Header(None),
+):
+    """Server-sent events for changes to the dynamic summary.
+
+    Each `change` event is a compact diff (superedges, supernodes, stats and
+    versions; correction counts unless `corrections=true`) from the last
+    delivered version. Events for slow clients are coalesced. Reconnecting
+    clients resume from `Last-Event-ID`; a `reset` event means the client
+    fell behind the retained history and should refetch `/dynamic-output`.
+    """
+    session = _get_session(dataset_id)
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    return StreamingResponse(
+        summary_event_stream(session, since, include_corrections=corrections),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/health")
 def health_check():
     return {"status": "healthy", "service": "poligras"}
 
 
+@app.get("/cache")
+def get_cache_stats():
+    """Entries, estimated bytes and hit/miss/eviction counters of the artifact cache."""
+    return artifact_cache.stats()
+
+
+@app.get("/datasets")
+def list_datasets():
+    """Catalogued datasets with their meta id, artifact sizes and run parameters."""
+    return [entry.as_dict() for entry in dataset_catalog.entries()]
+
+
+def _write_initial_gpickle(data: dict, handle) -> None:
+    """Pickle the initial graph of an output as `{'G': networkx graph}` (Poligras input format)."""
+    initial = data.get("graphs", {}).get("initial", {}) or {}
+    if not initial:
+        raise HTTPException(400, "No initial graph found in output.json")
+
+    directed = bool(initial.get("directed", False))
+    G = nx.DiGraph() if directed else nx.Graph()
+
+    # Add nodes with their attributes
+    for node in initial.get("nodes", []) or []:
+        nid = node.get("id")
+        attrs: dict = {}
+        if "degree" in node:
+            attrs["degree"] = node.get("degree")
+        if "label" in node:
+            attrs["label"] = node.get("label")
+        G.add_node(nid, **attrs)
+
+    # Add edges with their attributes
+    for edge in initial.get("edges", []) or []:
+        src = edge.get("source")
+        tgt = edge.get("target")
+        edge_attrs: dict = {}
+        if "weight" in edge:
+            edge_attrs["weight"] = edge.get("weight")
+        G.add_edge(src, tgt, **edge_attrs)
+
+    pickle.dump({'G': G}, handle)
+
+
+def _write_summary_gpickle(data: dict, handle) -> None:
+    """Pickle the summary graph of an output (supernodes with members, superedges) as `{'G': graph}`."""
+    summary = data.get("graphs", {}).get("summary", {}) or {}
+    artifacts = data.get("artifacts", {}) or {}
+
+    directed = bool(summary.get("directed", False))
+    G = nx.DiGraph() if directed else nx.Graph()
+
+    # Add summary nodes (supernodes) with attributes (size and members if available)
+    members_map = (artifacts.get("supernodes", {}) or {}).get("members", {})
+    for node in summary.get("nodes", []) or []:
+        nid = node.get("id")
+        attrs: dict = {}
+        if "size" in node:
+            attrs["size"] = node.get("size")
+        # include members list when available
+        if members_map and nid in members_map:
+            attrs["members"] = members_map.get(nid)
+        G.add_node(nid, **attrs)
+
+    # Add summary edges with attributes
+    for edge in summary.get("edges", []) or []:
+        src = edge.get("source")
+        tgt = edge.get("target")
+        edge_attrs: dict = {}
+        if "weight" in edge:
+            edge_attrs["weight"] = edge.get("weight")
+        if "density" in edge:
+            edge_attrs["density"] = edge.get("density")
+        G.add_edge(src, tgt, **edge_attrs)
+
+    # Optionally attach correction counts as graph-level attributes
+    corrections = artifacts.get("corrections", {}) or {}
+    G.graph["correction_positive_count"] = len(corrections.get("positive", []))
+    G.graph["correction_negative_count"] = len(corrections.get("negative", []))
+
+    pickle.dump({'G': G}, handle)
+
+
+def _write_corrections_csv(data: dict, handle) -> None:
+    """Stream the correction edges of an output as CSV rows: type,source,target."""
+    # Support older exports where corrections live at top-level or under artifacts
+    corrections = data.get("artifacts", {}).get("corrections") or data.get("corrections") or {}
+
+    # Each correction entry may be a dict or list depending on export
+    def normalize_pair(p):
+        if isinstance(p, dict):
+            return p.get("source"), p.get("target")
+        if isinstance(p, (list, tuple)) and len(p) >= 2:
+            return p[0], p[1]
+        return None, None
+
+    text = text_writer(handle)
+    writer = csv.writer(text)
+    writer.writerow(["type", "source", "target"])
+    for kind in ("positive", "negative"):
+        for entry in corrections.get(kind, []):
+            s, t = normalize_pair(entry)
+            if s is not None:
+                writer.writerow([kind, s, t])
+    text.flush()
+    text.detach()
+
+
+def _dynamic_download(dataset_id: str, not_found: str, name: str, write) -> Path:
+    """Derived file of the latest dynamic summary version, built once per version."""
+    try:
+        session = _get_session(dataset_id)
+    except HTTPException:
+        raise HTTPException(404, not_found)
+    version, snapshot = session.published_snapshot()
+    base_path = summary_registry.base_path(session.log.dataset_dir.name)
+    return derived_file(
+        base_path,
+        name,
+        lambda handle: write(json.loads(snapshot), handle),
+        stamp=f"v{version}-{source_stamp(base_path)}",
+    )
+
+
 @app.get("/datasets/{dataset_id}/download-graph")
 def download_initial_graph_gpickle(dataset_id: str):
     """Download the initial graph as a Poligras-compatible gpickle file.
     
     Returns a pickle file containing {'G': NetworkX graph} which can be
-    directly used as input for Poligras.
+    directly used as input for Poligras. Built once per output and served
+    from disk (Range requests are supported).
     """
     try:
-        import io
-        import pickle as pkl
-        
-        dataset_dir = Path(__file__).parent / "dataset" / dataset_id
-        output_path = dataset_dir / "output.json"
-        
-        # Fallback: search for output.json by meta.dataset
-        if not output_path.exists():
-            datasets_root = Path(__file__).parent / "dataset"
-            found = None
-            if datasets_root.exists():
-                for child in datasets_root.iterdir():
-                    candidate = child / "output.json"
-                    if candidate.exists():
-                        try:
-                            with candidate.open("r", encoding="utf-8") as f:
-                                jd = json.load(f)
-                            meta_id = jd.get("meta", {}).get("dataset")
-                            if meta_id == dataset_id:
-                                found = candidate
-                                break
-                        except Exception:
-                            continue
-
-            if found:
-                output_path = found
-            else:
-                raise HTTPException(404, "Output not found for this dataset")
-        
-        with output_path.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-        
-        # Extract initial graph from output.json
-        initial = data.get("graphs", {}).get("initial", {}) or {}
-        
-        if not initial:
-            raise HTTPException(400, "No initial graph found in output.json")
-        
-        directed = bool(initial.get("directed", False))
-        G = nx.DiGraph() if directed else nx.Graph()
-        
-        # Add nodes with their attributes
-        for node in initial.get("nodes", []) or []:
-            nid = node.get("id")
-            attrs: dict = {}
-            if "degree" in node:
-                attrs["degree"] = node.get("degree")
-            if "label" in node:
-                attrs["label"] = node.get("label")
-            G.add_node(nid, **attrs)
-        
-        # Add edges with their attributes
-        for edge in initial.get("edges", []) or []:
-            src = edge.get("source")
-            tgt = edge.get("target")
-            edge_attrs: dict = {}
-            if "weight" in edge:
-                edge_attrs["weight"] = edge.get("weight")
-            G.add_edge(src, tgt, **edge_attrs)
-        
-        # Create pickle with {'G': graph} structure (Poligras input format)
-        graph_payload = {'G': G}
-        
-        buf = io.BytesIO()
-        pkl.dump(graph_payload, buf)
-        buf.seek(0)
-        
-        return StreamingResponse(
-            buf,
-            media_type="application/octet-stream",
-            headers={"Content-Disposition": f"attachment; filename=\"{dataset_id}_graph.gpickle\""},
+        output_path = _resolve_output_path(dataset_id)
+        path = derived_file(
+            output_path,
+            "initial_graph.gpickle",
+            lambda handle: _write_initial_gpickle(_cached_output(output_path), handle),
         )
+        return FileResponse(path, media_type="application/octet-stream", filename=f"{dataset_id}_graph.gpickle")
     except HTTPException:
         raise
     except Exception as e:
@@ -390,61 +964,17 @@ def download_summary_pickle(dataset_id: str):
                 filename=f"{dataset_id}_graph_summary.gpickle",
             )
 
-        # Otherwise, synthesize a true NetworkX gpickle from output.json
+        # Otherwise, synthesize a true NetworkX gpickle from output.json (once per output)
         output_path = dataset_dir / "output.json"
         if not output_path.exists():
             raise HTTPException(404, "Summary pickle not found and output.json not available for this dataset")
 
-        with output_path.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        summary = data.get("graphs", {}).get("summary", {}) or {}
-        artifacts = data.get("artifacts", {}) or {}
-
-        directed = bool(summary.get("directed", False))
-        G = nx.DiGraph() if directed else nx.Graph()
-
-        # Add summary nodes (supernodes) with attributes (size and members if available)
-        members_map = (artifacts.get("supernodes", {}) or {}).get("members", {})
-        for node in summary.get("nodes", []) or []:
-            nid = node.get("id")
-            attrs: dict = {}
-            if "size" in node:
-                attrs["size"] = node.get("size")
-            # include members list when available
-            if members_map and nid in members_map:
-                attrs["members"] = members_map.get(nid)
-            G.add_node(nid, **attrs)
-
-        # Add summary edges with attributes
-        for edge in summary.get("edges", []) or []:
-            src = edge.get("source")
-            tgt = edge.get("target")
-            edge_attrs: dict = {}
-            if "weight" in edge:
-                edge_attrs["weight"] = edge.get("weight")
-            if "density" in edge:
-                edge_attrs["density"] = edge.get("density")
-            G.add_edge(src, tgt, **edge_attrs)
-
-        # Optionally attach correction counts as graph-level attributes
-        corrections = artifacts.get("corrections", {}) or {}
-        G.graph["correction_positive_count"] = len(corrections.get("positive", []))
-        G.graph["correction_negative_count"] = len(corrections.get("negative", []))
-
-        import io
-        import pickle as pkl
-
-        buf = io.BytesIO()
-        # Use Poligras input format: {'G': graph}
-        pkl.dump({'G': G}, buf)
-        buf.seek(0)
-
-        return StreamingResponse(
-            buf,
-            media_type="application/octet-stream",
-            headers={"Content-Disposition": f"attachment; filename=\"{dataset_id}_graph_summary.gpickle\""},
+        path = derived_file(
+            output_path,
+            "summary_graph.gpickle",
+            lambda handle: _write_summary_gpickle(_cached_output(output_path), handle),
         )
+        return FileResponse(path, media_type="application/octet-stream", filename=f"{dataset_id}_graph_summary.gpickle")
     except HTTPException:
         raise
     except Exception as e:
@@ -458,75 +988,14 @@ def download_corrections_csv(dataset_id: str):
     CSV columns: type,source,target  where type is 'positive' or 'negative'.
     """
     try:
-        dataset_dir = Path(__file__).parent / "dataset" / dataset_id
-        output_path = dataset_dir / "output.json"
-
-        # If output.json not found in the expected folder, try to locate an
-        # output.json whose internal `meta.dataset` matches the requested id.
-        if not output_path.exists():
-            datasets_root = Path(__file__).parent / "dataset"
-            found = None
-            if datasets_root.exists():
-                for child in datasets_root.iterdir():
-                    candidate = child / "output.json"
-                    if candidate.exists():
-                        try:
-                            with candidate.open("r", encoding="utf-8") as f:
-                                jd = json.load(f)
-                            meta_id = jd.get("meta", {}).get("dataset")
-                            if meta_id == dataset_id:
-                                found = candidate
-                                break
-                        except Exception:
-                            continue
-
-            if found:
-                output_path = found
-            else:
-                raise HTTPException(404, "Output not found for this dataset")
-
-        with output_path.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        # Support older exports where corrections live at top-level or under artifacts
-        corrections = data.get("artifacts", {}).get("corrections") or data.get("corrections") or {}
-        positive = corrections.get("positive", [])
-        negative = corrections.get("negative", [])
-
-        import io
-
-        # Build CSV in-memory as text, then encode to bytes for robust streaming
-        text_buf = io.StringIO()
-        writer = csv.writer(text_buf)
-        writer.writerow(["type", "source", "target"])
-
-        # Each correction entry may be a dict or list depending on export
-        def normalize_pair(p):
-            if isinstance(p, dict):
-                return p.get("source"), p.get("target")
-            if isinstance(p, (list, tuple)) and len(p) >= 2:
-                return p[0], p[1]
-            return None, None
-
-        for entry in positive:
-            s, t = normalize_pair(entry)
-            if s is not None:
-                writer.writerow(["positive", s, t])
-
-        for entry in negative:
-            s, t = normalize_pair(entry)
-            if s is not None:
-                writer.writerow(["negative", s, t])
-
-        csv_bytes = text_buf.getvalue().encode("utf-8")
-        byte_buf = io.BytesIO(csv_bytes)
-        byte_buf.seek(0)
-
-        return StreamingResponse(
-            byte_buf,
-            media_type="text/csv; charset=utf-8",
-            headers={"Content-Disposition": f"attachment; filename=\"{dataset_id}_corrections.csv\""},
+        # Folder name or the output's `meta.dataset` id.
+        output_path = _resolve_output_path(dataset_id)
+        path = derived_file(
+            output_path,
+            "corrections.csv",
+            lambda handle: _write_corrections_csv(_cached_output(output_path), handle),
         )
+        return FileResponse(path, media_type="text/csv; charset=utf-8", filename=f"{dataset_id}_corrections.csv")
     except HTTPException:
         raise
     except Exception as e:
@@ -535,89 +1004,17 @@ def download_corrections_csv(dataset_id: str):
 
 @app.get("/datasets/{dataset_id}/download-updated-summary")
 def download_updated_summary_pickle(dataset_id: str):
-    """Return a pickled NetworkX graph synthesized from `output_dynamic.json`.
+    """Return a pickled NetworkX graph synthesized from the latest dynamic summary.
 
-    Falls back to `output.json` if `output_dynamic.json` doesn't exist.
+    This is `output.json` with the dataset's logged updates replayed on top.
+    The file is built once per summary version.
     """
     try:
-        dataset_dir = Path(__file__).parent / "dataset" / dataset_id
-        dynamic_path = dataset_dir / "output_dynamic.json"
-
-        # Prefer the dynamic updated output; fall back to original output.json
-        if dynamic_path.exists():
-            source_path = dynamic_path
-        else:
-            source_path = dataset_dir / "output.json"
-
-        # If neither exist, try the meta.dataset fallback search
-        if not source_path.exists():
-            datasets_root = Path(__file__).parent / "dataset"
-            found = None
-            if datasets_root.exists():
-                for child in datasets_root.iterdir():
-                    candidate = child / ("output_dynamic.json" if (child / "output_dynamic.json").exists() else "output.json")
-                    if candidate.exists():
-                        try:
-                            with candidate.open("r", encoding="utf-8") as f:
-                                jd = json.load(f)
-                            meta_id = jd.get("meta", {}).get("dataset")
-                            if meta_id == dataset_id:
-                                found = candidate
-                                break
-                        except Exception:
-                            continue
-
-            if found:
-                source_path = found
-            else:
-                raise HTTPException(404, "Updated summary not found for this dataset")
-
-        with source_path.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        summary = data.get("graphs", {}).get("summary", {}) or {}
-        artifacts = data.get("artifacts", {}) or {}
-
-        directed = bool(summary.get("directed", False))
-        G = nx.DiGraph() if directed else nx.Graph()
-
-        members_map = (artifacts.get("supernodes", {}) or {}).get("members", {})
-        for node in summary.get("nodes", []) or []:
-            nid = node.get("id")
-            attrs: dict = {}
-            if "size" in node:
-                attrs["size"] = node.get("size")
-            if members_map and nid in members_map:
-                attrs["members"] = members_map.get(nid)
-            G.add_node(nid, **attrs)
-
-        for edge in summary.get("edges", []) or []:
-            src = edge.get("source")
-            tgt = edge.get("target")
-            edge_attrs: dict = {}
-            if "weight" in edge:
-                edge_attrs["weight"] = edge.get("weight")
-            if "density" in edge:
-                edge_attrs["density"] = edge.get("density")
-            G.add_edge(src, tgt, **edge_attrs)
-
-        corrections = artifacts.get("corrections", {}) or {}
-        G.graph["correction_positive_count"] = len(corrections.get("positive", []))
-        G.graph["correction_negative_count"] = len(corrections.get("negative", []))
-
-        import io
-        import pickle as pkl
-
-        buf = io.BytesIO()
-        # Use Poligras input format: {'G': graph}
-        pkl.dump({'G': G}, buf)
-        buf.seek(0)
-
-        filename = f"{dataset_id}_graph_summary_dynamic.gpickle"
-        return StreamingResponse(
-            buf,
-            media_type="application/octet-stream",
-            headers={"Content-Disposition": f"attachment; filename=\"{filename}\""},
+        path = _dynamic_download(
+            dataset_id, "Updated summary not found for this dataset", "summary_graph_dynamic.gpickle", _write_summary_gpickle
+        )
+        return FileResponse(
+            path, media_type="application/octet-stream", filename=f"{dataset_id}_graph_summary_dynamic.gpickle"
         )
     except HTTPException:
         raise
@@ -627,80 +1024,13 @@ def download_updated_summary_pickle(dataset_id: str):
 
 @app.get("/datasets/{dataset_id}/download-updated-corrections")
 def download_updated_corrections_csv(dataset_id: str):
-    """Return the corrections CSV from `output_dynamic.json` (or fallback to `output.json`)."""
+    """Return the corrections CSV of the latest dynamic summary."""
     try:
-        dataset_dir = Path(__file__).parent / "dataset" / dataset_id
-        dynamic_path = dataset_dir / "output_dynamic.json"
-
-        if dynamic_path.exists():
-            source_path = dynamic_path
-        else:
-            source_path = dataset_dir / "output.json"
-
-        # Fallback search by meta.dataset if necessary
-        if not source_path.exists():
-            datasets_root = Path(__file__).parent / "dataset"
-            found = None
-            if datasets_root.exists():
-                for child in datasets_root.iterdir():
-                    candidate = child / ("output_dynamic.json" if (child / "output_dynamic.json").exists() else "output.json")
-                    if candidate.exists():
-                        try:
-                            with candidate.open("r", encoding="utf-8") as f:
-                                jd = json.load(f)
-                            meta_id = jd.get("meta", {}).get("dataset")
-                            if meta_id == dataset_id:
-                                found = candidate
-                                break
-                        except Exception:
-                            continue
-
-            if found:
-                source_path = found
-            else:
-                raise HTTPException(404, "Corrections not found for this dataset")
-
-        with source_path.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        corrections = data.get("artifacts", {}).get("corrections") or data.get("corrections") or {}
-        positive = corrections.get("positive", [])
-        negative = corrections.get("negative", [])
-
-        import io
-
-        text_buf = io.StringIO()
-        writer = csv.writer(text_buf)
-        writer.writerow(["type", "source", "target"])
-
-        def normalize_pair(p):
-            if isinstance(p, dict):
-                return p.get("source"), p.get("target")
-            if isinstance(p, (list, tuple)) and len(p) >= 2:
-                return p[0], p[1]
-            return None, None
-
-        for entry in positive:
-            s, t = normalize_pair(entry)
-            if s is not None:
-                writer.writerow(["positive", s, t])
-
-        for entry in negative:
-            s, t = normalize_pair(entry)
-            if s is not None:
-                writer.writerow(["negative", s, t])
-
-        csv_bytes = text_buf.getvalue().encode("utf-8")
-        byte_buf = io.BytesIO(csv_bytes)
-        byte_buf.seek(0)
-
-        filename = f"{dataset_id}_corrections_dynamic.csv"
-        return StreamingResponse(
-            byte_buf,
-            media_type="text/csv; charset=utf-8",
-            headers={"Content-Disposition": f"attachment; filename=\"{filename}\""},
+        path = _dynamic_download(
+            dataset_id, "Corrections not found for this dataset", "corrections_dynamic.csv", _write_corrections_csv
         )
+        return FileResponse(path, media_type="text/csv; charset=utf-8", filename=f"{dataset_id}_corrections_dynamic.csv")
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(500, f"Error preparing updated corrections CSV: {str(e)}")
\ No newline at end of file
+        raise HTTPException(500, f"Error preparing updated corrections CSV: {str(e)}")
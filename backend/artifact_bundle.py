@@ -0,0 +1,415 @@
+"""Binary columnar bundle of a Poligras output.
+
+``output.json`` spells every node, edge, membership and correction out as
+JSON objects, with membership stored twice. A bundle keeps the same data
+as ``.npy`` columns in a directory next to the JSON (``output.json`` ->
+``output.bundle/``):
+
+* ``labels.bin`` / ``labels.offsets`` - UTF-8 string table; all node and
+  supernode ids below are indices into it
+* ``initial.*`` - initial graph nodes, degrees and weighted edges
+* ``summary.*`` - supernodes, sizes and superedges (weight, density)
+* ``members.*`` - membership in CSR form (``node_to_supernode`` is its
+  inverse and is not stored)
+* ``corrections.positive`` / ``corrections.negative`` - ``(k, 2)`` pairs
+
+``manifest.json`` holds the scalar fields (meta, stats, graph flags and
+counts), the column dtypes and shapes and the size and mtime of the JSON
+the bundle was built from; ``timeline.json`` holds the merge timeline.
+Columns are memory-mapped on load. A bundle whose source JSON has changed
+since is stale and ignored, so ``output.json`` stays the source of truth;
+``ArtifactBundle.payload`` exports the JSON form again on demand.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from backend.atomic_files import replace_dir
+from backend.output_types import PoligrasOutput
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = "poligras-bundle"
+BUNDLE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+TIMELINE_NAME = "timeline.json"
+
+_INITIAL_NODE_KEYS = {"id", "degree"}
+_INITIAL_EDGE_KEYS = {"source", "target", "weight"}
+_SUMMARY_NODE_KEYS = {"id", "size"}
+_SUMMARY_EDGE_KEYS = {"source", "target", "weight", "density"}
+
+
+class BundleFormatError(ValueError):
+    """Raised when a payload cannot be stored losslessly as a bundle."""
+
+
+def bundle_path_for(output_path: Path) -> Path:
+    return output_path.with_suffix(".bundle")
+
+
+class _LabelTable:
+    def __init__(self) -> None:
+        self.index: Dict[str, int] = {}
+
+    def __call__(self, label) -> int:
+        if not isinstance(label, str):
+            raise BundleFormatError(f"Expected a string id, got {label!r}")
+        position = self.index.get(label)
+        if position is None:
+            position = self.index[label] = len(self.index)
+        return position
+
+
+def _check_keys(entries: List[Dict], allowed: set, what: str) -> None:
+    for entry in entries:
+        if not entry.keys() <= allowed:
+            raise BundleFormatError(f"Unsupported {what} fields: {sorted(entry.keys() - allowed)}")
+
+
+def _source_stamp(source: Path) -> Dict:
+    stat = source.stat()
+    return {"name": source.name, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def write_bundle(bundle_dir: Path, payload: PoligrasOutput, source: Optional[Path] = None) -> Path:
+    """Write ``payload`` as a bundle at ``bundle_dir``, replacing any existing one.
+
+    ``source`` is the JSON file the payload was written to; the bundle is
+    tied to its current size and mtime. Raises ``BundleFormatError`` for
+    payloads that do not follow ``PoligrasOutput`` closely enough to be
+    round-tripped.
+    """
+
+    graphs = payload.get("graphs") or {}
+    initial, summary = graphs.get("initial"), graphs.get("summary")
+    artifacts = dict(payload.get("artifacts") or {})
+    if initial is None or summary is None:
+        raise BundleFormatError("Payload is missing the initial or summary graph")
+    membership = artifacts.pop("supernodes", None) or {}
+    corrections = artifacts.pop("corrections", None) or {}
+
+    labels = _LabelTable()
+    columns: Dict[str, np.ndarray] = {}
+
+    nodes, edges = initial.get("nodes") or [], initial.get("edges") or []
+    _check_keys(nodes, _INITIAL_NODE_KEYS, "initial node")
+    _check_keys(edges, _INITIAL_EDGE_KEYS, "initial edge")
+    if any("weight" not in e for e in edges):
+        raise BundleFormatError("Initial edges without a weight are not supported")
+    ids = [node["id"] for node in nodes] + [e[k] for e in edges for k in ("source", "target")]
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in ids):
+        id_type = "int"
+    elif all(isinstance(value, str) for value in ids):
+        id_type = "str"
+    else:
+        raise BundleFormatError("Initial graph mixes integer and string node ids")
+    as_label = (lambda value: labels(str(value))) if id_type == "int" else labels
+    columns["initial.node"] = np.fromiter((as_label(n["id"]) for n in nodes), dtype=np.int32, count=len(nodes))
+    columns["initial.degree"] = np.fromiter((n["degree"] for n in nodes), dtype=np.int64, count=len(nodes))
+    columns["initial.edges"] = np.array(
+        [(as_label(e["source"]), as_label(e["target"])) for e in edges], dtype=np.int32
+    ).reshape(-1, 2)
+    columns["initial.weight"] = np.fromiter((e["weight"] for e in edges), dtype=np.float64, count=len(edges))
+
+    nodes, edges = summary.get("nodes") or [], summary.get("edges") or []
+    _check_keys(nodes, _SUMMARY_NODE_KEYS, "summary node")
+    _check_keys(edges, _SUMMARY_EDGE_KEYS, "summary edge")
+    if any("weight" not in e for e in edges):
+        raise BundleFormatError("Superedges without a weight are not supported")
+    columns["summary.node"] = np.fromiter((labels(n["id"]) for n in nodes), dtype=np.int32, count=len(nodes))
+    columns["summary.size"] = np.fromiter((n["size"] for n in nodes), dtype=np.int64, count=len(nodes))
+    columns["summary.edges"] = np.array(
+        [(labels(e["source"]), labels(e["target"])) for e in edges], dtype=np.int32
+    ).reshape(-1, 2)
+    columns["summary.weight"] = np.fromiter((e["weight"] for e in edges), dtype=np.float64, count=len(edges))
+    # NaN marks a superedge without a density.
+    columns["summary.density"] = np.fromiter(
+        (e.get("density", math.nan) for e in edges), dtype=np.float64, count=len(edges)
+    )
+
+    members = membership.get("members") or {}
+    node_to_supernode = membership.get("node_to_supernode") or {}
+    inverse = {member: supernode for supernode, group in members.items() for member in group}
+    if inverse != node_to_supernode:
+        raise BundleFormatError("node_to_supernode is not the inverse of members")
+    columns["members.supernode"] = np.fromiter((labels(s) for s in members), dtype=np.int32, count=len(members))
+    columns["members.offsets"] = np.cumsum([0] + [len(group) for group in members.values()], dtype=np.int64)
+    columns["members.node"] = np.fromiter(
+        (labels(m) for group in members.values() for m in group),
+        dtype=np.int32,
+        count=int(columns["members.offsets"][-1]),
+    )
+
+    for kind in ("positive", "negative"):
+        pairs = corrections.get(kind) or []
+        _check_keys(pairs, {"source", "target"}, "correction")
+        columns[f"corrections.{kind}"] = np.array(
+            [(labels(p["source"]), labels(p["target"])) for p in pairs], dtype=np.int32
+        ).reshape(-1, 2)
+
+    encoded = [label.encode("utf-8") for label in labels.index]
+    columns["labels.offsets"] = np.cumsum([0] + [len(label) for label in encoded], dtype=np.int64)
+    columns["labels.bin"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "source": _source_stamp(source) if source is not None else None,
+        "initial_id_type": id_type,
+        "meta": payload.get("meta"),
+        "stats": payload.get("stats"),
+        "graphs": {
+            "initial": {k: v for k, v in initial.items() if k not in ("nodes", "edges")},
+            "summary": {k: v for k, v in summary.items() if k not in ("nodes", "edges")},
+        },
+        "artifacts": artifacts,
+        "extra": {k: v for k, v in payload.items() if k not in ("meta", "stats", "graphs", "timeline", "artifacts")},
+        "has_timeline": "timeline" in payload,
+        "columns": {name: {"dtype": array.dtype.str, "shape": list(array.shape)} for name, array in columns.items()},
+    }
+
+    staging = bundle_dir.with_name(f".{bundle_dir.name}.{os.getpid()}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    try:
+        for name, array in columns.items():
+            np.save(staging / f"{name}.npy", array, allow_pickle=False)
+        with (staging / TIMELINE_NAME).open("w", encoding="utf-8") as f:
+            json.dump(payload.get("timeline") or [], f)
+        # The manifest goes last: a directory without one is never loaded.
+        with (staging / MANIFEST_NAME).open("w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        replace_dir(staging, bundle_dir)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return bundle_dir
+
+
+class ArtifactBundle:
+    """Read-only view of a bundle; columns are memory-mapped on first access."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with (path / MANIFEST_NAME).open("r", encoding="utf-8") as f:
+            self.manifest: Dict = json.load(f)
+        if self.manifest.get("format") != BUNDLE_FORMAT or self.manifest.get("version") != BUNDLE_VERSION:
+            raise BundleFormatError(f"Unsupported bundle at {path}")
+        self._columns: Dict[str, np.ndarray] = {}
+        self._labels: Optional[List[str]] = None
+
+    @classmethod
+    def for_output(cls, output_path: Path) -> Optional["ArtifactBundle"]:
+        """Bundle built from ``output_path`` in its current state, or None if missing or stale."""
+
+        bundle_dir = bundle_path_for(output_path)
+        if not (bundle_dir / MANIFEST_NAME).exists():
+            return None
+        try:
+            bundle = cls(bundle_dir)
+            if bundle.manifest.get("source") != _source_stamp(output_path):
+                return None
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable bundle %s", bundle_dir, exc_info=True)
+            return None
+        return bundle
+
+    def column(self, name: str) -> np.ndarray:
+        array = self._columns.get(name)
+        if array is None:
+            spec = self.manifest["columns"][name]
+            if 0 in spec["shape"]:
+                # Empty files cannot be memory-mapped.
+                array = np.empty(spec["shape"], dtype=np.dtype(spec["dtype"]))
+            else:
+                array = np.load(self.path / f"{name}.npy", mmap_mode="r", allow_pickle=False)
+            self._columns[name] = array
+        return array
+
+    @property
+    def labels(self) -> List[str]:
+        if self._labels is None:
+            blob = self.column("labels.bin").tobytes()
+            offsets = self.column("labels.offsets").tolist()
+            self._labels = [blob[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+        return self._labels
+
+    def estimated_memory(self) -> int:
+        """Heap this handle may hold: the decoded string table (columns are memory-mapped)."""
+
+        labels = self.manifest["columns"]["labels.offsets"]["shape"][0]
+        return 1024 + 8 * self.manifest["columns"]["labels.bin"]["shape"][0] + 64 * labels
+
+    def label(self, index: int) -> str:
+        """One string-table entry, decoded without materialising the whole table."""
+
+        if self._labels is not None:
+            return self._labels[index]
+        offsets = self.column("labels.offsets")
+        return self.column("labels.bin")[offsets[index]:offsets[index + 1]].tobytes().decode("utf-8")
+
+    def initial_id(self, index: int):
+        """Initial-graph node id for a string-table index, typed as in the JSON."""
+
+        label = self.label(index)
+        return int(label) if self.manifest["initial_id_type"] == "int" else label
+
+    def timeline(self) -> List[Dict]:
+        if not self.manifest.get("has_timeline"):
+            return []
+        with (self.path / TIMELINE_NAME).open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @property
+    def directed(self) -> bool:
+        return bool(self.manifest["graphs"]["initial"].get("directed", False))
+
+    @property
+    def artifacts(self) -> Dict:
+        """Scalar artifact fields (``self_loops``, ``version``, ...)."""
+
+        return self.manifest["artifacts"]
+
+    def pairs(self, name: str) -> Iterator[Tuple[str, str]]:
+        labels = self.labels
+        for source, target in self.column(name).tolist():
+            yield labels[source], labels[target]
+
+    def members(self) -> Dict[str, List[str]]:
+        labels = self.labels
+        nodes = self.column("members.node").tolist()
+        offsets = self.column("members.offsets").tolist()
+        return {
+            labels[supernode]: [labels[node] for node in nodes[offsets[i]:offsets[i + 1]]]
+            for i, supernode in enumerate(self.column("members.supernode").tolist())
+        }
+
+    def payload(self, include_membership: bool = True) -> PoligrasOutput:
+        """Rebuild the ``PoligrasOutput`` the bundle was written from.
+
+        ``include_membership=False`` leaves out supernode membership and
+        corrections, for callers that rebuild those themselves.
+        """
+
+        labels = self.labels
+        manifest = self.manifest
+        node_id = int if manifest["initial_id_type"] == "int" else str
+
+        initial = dict(manifest["graphs"]["initial"])
+        initial["nodes"] = [
+            {"id": node_id(labels[node]), "degree": degree}
+            for node, degree in zip(self.column("initial.node").tolist(), self.column("initial.degree").tolist())
+        ]
+        initial["edges"] = [
+            {"source": node_id(labels[source]), "target": node_id(labels[target]), "weight": weight}
+            for (source, target), weight in zip(self.column("initial.edges").tolist(), self.column("initial.weight").tolist())
+        ]
+
+        summary = dict(manifest["graphs"]["summary"])
+        summary["nodes"] = [
+            {"id": labels[node], "size": size}
+            for node, size in zip(self.column("summary.node").tolist(), self.column("summary.size").tolist())
+        ]
+        summary["edges"] = []
+        for (source, target), weight, density in zip(
+            self.column("summary.edges").tolist(),
+            self.column("summary.weight").tolist(),
+            self.column("summary.density").tolist(),
+        ):
+            edge = {"source": labels[source], "target": labels[target], "weight": weight}
+            if not math.isnan(density):
+                edge["density"] = density
+            summary["edges"].append(edge)
+
+        payload: Dict = {}
+        if manifest.get("meta") is not None:
+            payload["meta"] = manifest["meta"]
+        payload["stats"] = manifest["stats"]
+        payload["graphs"] = {"initial": initial, "summary": summary}
+        if manifest.get("has_timeline"):
+            payload["timeline"] = self.timeline()
+        artifacts = dict(manifest["artifacts"])
+        if include_membership:
+            members = self.members()
+            artifacts["supernodes"] = {
+                "members": members,
+                "node_to_supernode": {m: supernode for supernode, group in members.items() for m in group},
+            }
+            artifacts["corrections"] = {
+                kind: [{"source": s, "target": t} for s, t in self.pairs(f"corrections.{kind}")]
+                for kind in ("positive", "negative")
+            }
+        payload["artifacts"] = artifacts
+        payload.update(manifest["extra"])
+        return payload  # type: ignore[return-value]
+
+
+def load_output(output_path: Path) -> PoligrasOutput:
+    """Parsed ``output_path``, rebuilt from its bundle when an up-to-date one exists."""
+
+    bundle = ArtifactBundle.for_output(output_path)
+    if bundle is not None:
+        return bundle.payload()
+    with output_path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def ensure_bundle(output_path: Path) -> ArtifactBundle:
+    """Up-to-date bundle of ``output_path``, built from the JSON first if needed.
+
+    Raises ``BundleFormatError`` when the output cannot be bundled.
+    """
+
+    bundle = ArtifactBundle.for_output(output_path)
+    if bundle is None:
+        with output_path.open("r", encoding="utf-8") as f:
+            payload = json.load(f)
+        bundle = ArtifactBundle(write_bundle(bundle_path_for(output_path), payload, source=output_path))
+    return bundle
+
+
+def write_output_bundle(output_path: Path, payload: PoligrasOutput) -> Optional[Path]:
+    """Best-effort bundle for a freshly written ``output_path``; returns None if the payload does not fit."""
+
+    try:
+        return write_bundle(bundle_path_for(output_path), payload, source=output_path)
+    except BundleFormatError as exc:
+        logger.info("No bundle for %s: %s", output_path, exc)
+        return None
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert between output.json and binary bundles.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Write the bundle for an output.json")
+    build.add_argument("output", type=Path)
+    export = sub.add_parser("export", help="Export a bundle back to JSON")
+    export.add_argument("bundle", type=Path)
+    export.add_argument("destination", type=Path)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        with args.output.open("r", encoding="utf-8") as f:
+            payload = json.load(f)
+        bundle_dir = write_bundle(bundle_path_for(args.output), payload, source=args.output)
+        size = sum(p.stat().st_size for p in bundle_dir.iterdir())
+        print(f"Wrote {bundle_dir} ({size} bytes, source {args.output.stat().st_size} bytes)")
+    else:
+        with args.destination.open("w", encoding="utf-8") as f:
+            json.dump(ArtifactBundle(args.bundle).payload(), f, indent=2)
+        print(f"Exported {args.bundle} to {args.destination}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Memory-bounded LRU cache of parsed and indexed dataset artifacts.
+
+Entries are keyed by artifact kind and file path, and carry the file's
+mtime and size when they were loaded; a republished file therefore misses
+instead of serving stale data. Each entry has an estimated cost in bytes
+and least recently used entries are evicted once the total exceeds the
+budget. Values that alone exceed the budget are returned but not kept.
+
+Loads of one key are single-flight: concurrent requests for a cold
+artifact wait for one parse instead of each doing their own. Cached values
+are shared between requests and must be treated as read-only.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Parsed JSON takes several times its file size as Python objects.
+PARSED_JSON_EXPANSION = 8
+
+_Key = Tuple[str, str]
+
+
+@dataclass
+class _Entry:
+    stamp: Tuple[int, int]
+    value: Any
+    cost: int
+
+
+@dataclass
+class _Loading:
+    lock: threading.Lock
+    users: int = 0
+
+
+class ArtifactCache:
+    """LRU of artifacts derived from files, bounded by ``max_bytes`` of estimated cost."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[_Key, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loading: Dict[_Key, _Loading] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(
+        self,
+        kind: str,
+        path: Path,
+        loader: Callable[[Path], T],
+        weigh: Optional[Callable[[T], int]] = None,
+    ) -> T:
+        """Cached ``loader(path)`` for the file's current version.
+
+        ``weigh`` estimates a value's memory cost; by default it is the
+        file size times ``PARSED_JSON_EXPANSION``.
+        """
+
+        key = (kind, str(path))
+        stat = path.stat()
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        value = self._lookup(key, stamp)
+        if value is not None:
+            return value
+
+        with self._lock:
+            loading = self._loading.setdefault(key, _Loading(threading.Lock()))
+            loading.users += 1
+        try:
+            with loading.lock:
+                # Another request may have loaded it while we waited.
+                value = self._lookup(key, stamp, count_miss=False)
+                if value is not None:
+                    return value
+                value = loader(path)
+                cost = weigh(value) if weigh is not None else stat.st_size * PARSED_JSON_EXPANSION
+                self._store(key, _Entry(stamp, value, cost))
+                return value
+        finally:
+            # The last request using this lock retires it; an earlier one
+            # would let a newcomer start a second parse while others still wait.
+            with self._lock:
+                loading.users -= 1
+                if loading.users == 0 and self._loading.get(key) is loading:
+                    del self._loading[key]
+
+    def _lookup(self, key: _Key, stamp: Tuple[int, int], count_miss: bool = True):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.stamp == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+            if count_miss:
+                self.misses += 1
+            return None
+
+    def _store(self, key: _Key, entry: _Entry) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.cost
+            if entry.cost > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._bytes += entry.cost
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.cost
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def cache_budget_from_env(default_mb: int = 512) -> int:
+    """Budget in bytes from ``POLIGRAS_ARTIFACT_CACHE_MB``."""
+
+    return int(float(os.environ.get("POLIGRAS_ARTIFACT_CACHE_MB", default_mb)) * 1024 * 1024)
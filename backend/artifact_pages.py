@@ -0,0 +1,191 @@
+"""Cursor-paginated, field-selected reads of a summary's artifacts.
+
+Pages are cut straight from the memory-mapped columns of an
+``ArtifactBundle``: filters and orderings run on the numeric columns and
+only the rows of the requested page are decoded into objects. Cursors are
+opaque; they carry the row offset plus a token of the bundle they were
+issued for, so paging across a re-published output fails loudly instead of
+skipping or repeating rows.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from backend.artifact_bundle import ArtifactBundle
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 10_000
+
+
+class PageQueryError(ValueError):
+    """Raised for invalid page requests (unknown fields, bad cursor, ...)."""
+
+
+class StaleCursorError(PageQueryError):
+    """Raised when a cursor was issued for a different version of the artifacts."""
+
+
+@dataclass(frozen=True)
+class PageQuery:
+    limit: int = DEFAULT_PAGE_SIZE
+    cursor: Optional[str] = None
+    fields: Optional[Sequence[str]] = None
+    min_size: Optional[int] = None
+    min_weight: Optional[float] = None
+    min_density: Optional[float] = None
+    top_k: Optional[int] = None
+    kind: Optional[str] = None  # corrections: positive | negative
+
+
+def _summary_node(bundle: ArtifactBundle, row: int) -> Dict:
+    return {
+        "id": bundle.label(int(bundle.column("summary.node")[row])),
+        "size": int(bundle.column("summary.size")[row]),
+    }
+
+
+def _summary_edge(bundle: ArtifactBundle, row: int) -> Dict:
+    source, target = bundle.column("summary.edges")[row]
+    edge = {
+        "source": bundle.label(int(source)),
+        "target": bundle.label(int(target)),
+        "weight": float(bundle.column("summary.weight")[row]),
+    }
+    density = float(bundle.column("summary.density")[row])
+    if not math.isnan(density):
+        edge["density"] = density
+    return edge
+
+
+def _initial_node(bundle: ArtifactBundle, row: int) -> Dict:
+    return {
+        "id": bundle.initial_id(int(bundle.column("initial.node")[row])),
+        "degree": int(bundle.column("initial.degree")[row]),
+    }
+
+
+def _initial_edge(bundle: ArtifactBundle, row: int) -> Dict:
+    source, target = bundle.column("initial.edges")[row]
+    return {
+        "source": bundle.initial_id(int(source)),
+        "target": bundle.initial_id(int(target)),
+        "weight": float(bundle.column("initial.weight")[row]),
+    }
+
+
+# resource -> (row count column, row builder, selectable fields)
+RESOURCES: Dict[str, tuple] = {
+    "summary-nodes": ("summary.node", _summary_node, ("id", "size")),
+    "summary-edges": ("summary.weight", _summary_edge, ("source", "target", "weight", "density")),
+    "initial-nodes": ("initial.node", _initial_node, ("id", "degree")),
+    "initial-edges": ("initial.weight", _initial_edge, ("source", "target", "weight")),
+}
+
+
+def _cursor_token(bundle: ArtifactBundle) -> str:
+    source = json.dumps(bundle.manifest.get("source"), sort_keys=True)
+    return format(zlib.crc32(source.encode("utf-8")), "08x")
+
+
+def _decode_cursor(cursor: Optional[str], token: str) -> int:
+    if not cursor:
+        return 0
+    offset, _, issued_for = cursor.partition(".")
+    if not offset.isdigit():
+        raise PageQueryError(f"Malformed cursor '{cursor}'")
+    if issued_for != token:
+        raise StaleCursorError("The dataset's artifacts changed since this cursor was issued; restart from the first page")
+    return int(offset)
+
+
+def _select(fields: Optional[Sequence[str]], allowed: Sequence[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise PageQueryError(f"Unknown fields {unknown}; choose from {list(allowed)}")
+    return list(fields)
+
+
+def _paginate(rows: np.ndarray, build: Callable[[int], Dict], query: PageQuery, token: str, fields) -> Dict:
+    if not 1 <= query.limit <= MAX_PAGE_SIZE:
+        raise PageQueryError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    offset = _decode_cursor(query.cursor, token)
+    window = rows[offset:offset + query.limit].tolist()
+    items = [build(row) for row in window]
+    if fields is not None:
+        items = [{field: item[field] for field in fields if field in item} for item in items]
+    end = offset + len(window)
+    return {
+        "items": items,
+        "total": int(len(rows)),
+        "next_cursor": f"{end}.{token}" if end < len(rows) else None,
+    }
+
+
+def _filtered_rows(bundle: ArtifactBundle, resource: str, query: PageQuery) -> np.ndarray:
+    count = bundle.manifest["columns"][RESOURCES[resource][0]]["shape"][0]
+    mask = np.ones(count, dtype=bool)
+    if resource == "summary-nodes":
+        if query.min_size is not None:
+            mask &= bundle.column("summary.size") >= query.min_size
+    elif resource in ("summary-edges", "initial-edges"):
+        weights = bundle.column("summary.weight" if resource == "summary-edges" else "initial.weight")
+        if query.min_weight is not None:
+            mask &= weights >= query.min_weight
+        if query.min_density is not None:
+            if resource != "summary-edges":
+                raise PageQueryError("min_density only applies to summary edges")
+            # NaN (no density) never passes.
+            mask &= bundle.column("summary.density") >= query.min_density
+        if query.top_k is not None:
+            rows = np.flatnonzero(mask)
+            order = np.argsort(-weights[rows], kind="stable")
+            return rows[order[: max(query.top_k, 0)]]
+    return np.flatnonzero(mask)
+
+
+def page(bundle: ArtifactBundle, resource: str, query: PageQuery) -> Dict:
+    """One page of ``resource`` (see ``RESOURCES``, plus ``corrections`` and ``timeline``)."""
+
+    token = _cursor_token(bundle)
+    if query.top_k is not None and resource not in ("summary-edges", "initial-edges"):
+        raise PageQueryError("top_k only applies to edges")
+    if query.min_size is not None and resource != "summary-nodes":
+        raise PageQueryError("min_size only applies to summary nodes")
+    if query.kind is not None and resource != "corrections":
+        raise PageQueryError("kind only applies to corrections")
+
+    if resource == "corrections":
+        fields = _select(query.fields, ("kind", "source", "target"))
+        kinds = ("positive", "negative") if query.kind is None else (query.kind,)
+        if any(kind not in ("positive", "negative") for kind in kinds):
+            raise PageQueryError("kind must be 'positive' or 'negative'")
+        columns = [bundle.column(f"corrections.{kind}") for kind in kinds]
+        bounds = np.cumsum([0] + [len(column) for column in columns])
+
+        def build(row: int) -> Dict:
+            part = int(np.searchsorted(bounds, row, side="right")) - 1
+            source, target = columns[part][row - bounds[part]]
+            return {"kind": kinds[part], "source": bundle.label(int(source)), "target": bundle.label(int(target))}
+
+        return _paginate(np.arange(bounds[-1]), build, query, token, fields)
+
+    if resource == "timeline":
+        fields = _select(query.fields, ("n1", "n2", "stats"))
+        steps = bundle.timeline()
+        return _paginate(np.arange(len(steps)), steps.__getitem__, query, token, fields)
+
+    if resource not in RESOURCES:
+        raise PageQueryError(f"Unknown resource '{resource}'")
+    _, row_builder, allowed = RESOURCES[resource]
+    fields = _select(query.fields, allowed)
+    rows = _filtered_rows(bundle, resource, query)
+    return _paginate(rows, lambda row: row_builder(bundle, row), query, token, fields)
@@ -0,0 +1,154 @@
+"""Inter-process file locks and atomic file publication.
+
+``FileLock`` is an advisory ``flock`` on a lock file, so it coordinates
+threads and processes alike, including separate uvicorn workers. On
+platforms without ``fcntl`` it degrades to a process-local lock.
+
+``atomic_write`` writes to a temporary file next to the target, fsyncs it
+and renames it into place. Readers therefore see either the old file or
+the complete new one, never a partial write; ``replace_dir`` does the same
+for a directory. ``gzip_copy`` keeps a precompressed ``<file>.gz`` next to
+a published file for serving.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Callable, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None  # type: ignore[assignment]
+
+_local_locks: Dict[str, threading.Lock] = {}
+_local_locks_guard = threading.Lock()
+
+
+class FileLock:
+    """Exclusive lock held on ``path`` (created if missing)."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._handle: Optional[IO[bytes]] = None
+        self._local: Optional[threading.Lock] = None
+
+    def acquire(
+        self,
+        blocking: bool = True,
+        poll_interval: float = 0.5,
+        cancelled: Optional[Callable[[], bool]] = None,
+    ) -> bool:
+        """Take the lock; returns False if it is held elsewhere and ``blocking`` is off or ``cancelled()`` turns true."""
+
+        while True:
+            if self._try_acquire():
+                return True
+            if not blocking or (cancelled is not None and cancelled()):
+                return False
+            time.sleep(poll_interval)
+
+    def _try_acquire(self) -> bool:
+        if fcntl is None:
+            with _local_locks_guard:
+                lock = _local_locks.setdefault(str(self.path.resolve()), threading.Lock())
+            if not lock.acquire(blocking=False):
+                return False
+            self._local = lock
+            return True
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        handle = self.path.open("ab")
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._handle = handle
+        return True
+
+    def release(self) -> None:
+        if self._handle is not None:
+            fcntl.flock(self._handle.fileno(), fcntl.LOCK_UN)
+            self._handle.close()
+            self._handle = None
+        if self._local is not None:
+            self._local.release()
+            self._local = None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+@contextmanager
+def atomic_write(path: Path, mode: str = "w", encoding: Optional[str] = "utf-8") -> Iterator[IO]:
+    """Open a temporary sibling of ``path`` for writing and rename it over ``path`` on success."""
+
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with tmp_path.open(mode, encoding=None if "b" in mode else encoding) as handle:
+            yield handle
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def write_json_atomic(path: Path, payload, indent: Optional[int] = 2) -> None:
+    with atomic_write(path) as handle:
+        json.dump(payload, handle, indent=indent)
+
+
+def replace_dir(staging: Path, target: Path) -> None:
+    """Publish the fully written directory ``staging`` as ``target``, replacing any previous one."""
+
+    # Directories cannot be renamed over non-empty ones; move the old one
+    # aside first. Open memory maps of its files stay valid.
+    retired = target.with_name(f".{target.name}.{os.getpid()}.old")
+    if target.exists():
+        os.replace(target, retired)
+    os.replace(staging, target)
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def link_or_copy(source: Path, target: Path) -> None:
+    """Place ``source`` at ``target`` (replacing it atomically), by hard link where possible."""
+
+    tmp_path = target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            shutil.copy2(source, tmp_path)
+        os.replace(tmp_path, target)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def gzip_copy(path: Path, compresslevel: int = 6) -> Path:
+    """Precompressed ``<path>.gz``, (re)written if missing or not matching ``path``'s mtime."""
+
+    gzip_path = path.with_name(path.name + ".gz")
+    stat = path.stat()
+    if gzip_path.exists() and gzip_path.stat().st_mtime_ns == stat.st_mtime_ns:
+        return gzip_path
+    with path.open("rb") as source, atomic_write(gzip_path, "wb") as raw:
+        with gzip.GzipFile(filename="", mode="wb", fileobj=raw, compresslevel=compresslevel, mtime=0) as target:
+            shutil.copyfileobj(source, target, 1 << 20)
+    # The copy carries the source's mtime; a republished source no longer matches it.
+    os.utime(gzip_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    return gzip_path
@@ -0,0 +1,308 @@
+"""Compact on-disk graphs in compressed sparse row (CSR) form.
+
+A CSR graph is a directory (``<dataset>_graph.csr``) of plain ``.npy``
+files plus a manifest:
+
+* ``indptr.npy``  -- int64, ``num_nodes + 1`` row offsets;
+* ``indices.npy`` -- int32 (int64 for huge graphs), sorted neighbour rows;
+* ``nodes.npy`` or ``nodes.json`` -- original node id of each row (int64
+  when every id is an integer, strings otherwise);
+* ``self_loops.npy`` -- int64, sorted rows with a self-loop (only written
+  when there are any);
+* ``manifest.json`` -- format, sizes and ingestion stats, written last.
+
+Rows are simple (no self-loops or duplicate edges); self-loops are kept
+apart in ``self_loops.npy`` and counted in the stats. An undirected edge
+appears in both rows; a directed one only in its source's row, so a row
+lists what ``G[node]`` lists in networkx. Rows are numbered in order of
+first appearance in the source, like the nodes of a networkx graph built
+from it. The arrays are memory-mapped on first access, and no pickle is
+involved. networkx is only an import/export adapter (``from_networkx``,
+``CSRGraph.to_networkx``).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import pickle
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from backend.atomic_files import replace_dir
+
+CSR_FORMAT = "poligras-csr"
+CSR_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+NodeIds = Union[np.ndarray, List[str]]
+
+
+def csr_path_for(dataset_dir: Path, dataset: str) -> Path:
+    return dataset_dir / f"{dataset}_graph.csr"
+
+
+class CSRFormatError(ValueError):
+    """Raised when a directory is not a CSR graph this version can read."""
+
+
+def build_csr(pairs: np.ndarray, num_nodes: int, directed: bool = False, chunk_size: int = 1 << 22) -> Dict:
+    """Deduplicated CSR arrays from a (k, 2) array of row pairs (possibly memory-mapped).
+
+    Undirected graphs get each pair in both rows. Returns ``indptr``,
+    ``indices``, the ``self_loop_rows`` kept out of the rows, and the
+    distinct ``self_loops`` and ``duplicate_edges`` dropped on the way.
+    """
+
+    copies = 1 if directed else 2
+    keys = np.empty(copies * len(pairs), dtype=np.int64)
+    filled = 0
+    looped = np.zeros(num_nodes, dtype=bool)
+    for start in range(0, len(pairs), chunk_size):
+        chunk = np.asarray(pairs[start:start + chunk_size], dtype=np.int64)
+        loop = chunk[:, 0] == chunk[:, 1]
+        looped[chunk[loop, 0]] = True
+        source, target = chunk[~loop, 0], chunk[~loop, 1]
+        keys[filled:filled + len(source)] = source * num_nodes + target
+        if not directed:
+            keys[filled + len(source):filled + 2 * len(source)] = target * num_nodes + source
+        filled += copies * len(source)
+    keys = np.unique(keys[:filled])
+
+    rows = keys // num_nodes
+    index_dtype = np.int32 if num_nodes < 2**31 else np.int64
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_nodes), out=indptr[1:])
+    return {
+        "indptr": indptr,
+        "indices": (keys - rows * num_nodes).astype(index_dtype),
+        "self_loop_rows": np.flatnonzero(looped).astype(np.int64),
+        "self_loops": int(looped.sum()),
+        "duplicate_edges": (filled - len(keys)) // copies,
+    }
+
+
+def write_csr(
+    target: Path,
+    indptr: np.ndarray,
+    indices: np.ndarray,
+    node_ids: NodeIds,
+    stats: Optional[Dict] = None,
+    directed: bool = False,
+    self_loop_rows: Optional[np.ndarray] = None,
+) -> "CSRGraph":
+    """Publish a CSR graph at ``target`` (staged, then renamed into place)."""
+
+    num_nodes = len(indptr) - 1
+    integer_ids = isinstance(node_ids, np.ndarray)
+    degrees = np.diff(indptr)
+    manifest = {
+        "format": CSR_FORMAT,
+        "version": CSR_VERSION,
+        "num_nodes": num_nodes,
+        "num_edges": int(len(indices) if directed else len(indices) // 2),
+        "directed": directed,
+        "node_ids": "int" if integer_ids else "str",
+        "stats": {
+            "max_degree": int(degrees.max()) if num_nodes else 0,
+            "mean_degree": float(degrees.mean()) if num_nodes else 0.0,
+            **(stats or {}),
+        },
+    }
+
+    staging = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    try:
+        np.save(staging / "indptr.npy", indptr, allow_pickle=False)
+        np.save(staging / "indices.npy", indices, allow_pickle=False)
+        if integer_ids:
+            np.save(staging / "nodes.npy", node_ids.astype(np.int64), allow_pickle=False)
+        else:
+            with (staging / "nodes.json").open("w", encoding="utf-8") as f:
+                json.dump([str(node) for node in node_ids], f)
+        if self_loop_rows is not None and len(self_loop_rows):
+            np.save(staging / "self_loops.npy", np.asarray(self_loop_rows, dtype=np.int64), allow_pickle=False)
+        # The manifest goes last: a directory without one is never loaded.
+        with (staging / MANIFEST_NAME).open("w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        replace_dir(staging, target)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return CSRGraph(target)
+
+
+class CSRGraph:
+    """Read-only, memory-mapped view of a CSR graph directory."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        try:
+            with (path / MANIFEST_NAME).open("r", encoding="utf-8") as f:
+                self.manifest: Dict = json.load(f)
+        except FileNotFoundError:
+            raise CSRFormatError(f"No CSR graph at {path}") from None
+        if self.manifest.get("format") != CSR_FORMAT or self.manifest.get("version") != CSR_VERSION:
+            raise CSRFormatError(f"Unsupported CSR graph at {path}")
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._node_ids: Optional[NodeIds] = None
+
+    def _array(self, name: str) -> np.ndarray:
+        array = self._arrays.get(name)
+        if array is None:
+            # A plain ndarray view of the mapping: slicing np.memmap objects is much slower.
+            array = np.load(self.path / f"{name}.npy", mmap_mode="r", allow_pickle=False).view(np.ndarray)
+            self._arrays[name] = array
+        return array
+
+    @property
+    def num_nodes(self) -> int:
+        return int(self.manifest["num_nodes"])
+
+    @property
+    def num_edges(self) -> int:
+        return int(self.manifest["num_edges"])
+
+    @property
+    def directed(self) -> bool:
+        return bool(self.manifest["directed"])
+
+    @property
+    def stats(self) -> Dict:
+        return self.manifest.get("stats", {})
+
+    @property
+    def indptr(self) -> np.ndarray:
+        return self._array("indptr")
+
+    @property
+    def indices(self) -> np.ndarray:
+        return self._array("indices")
+
+    def self_loop_rows(self) -> np.ndarray:
+        """Sorted rows with a self-loop (empty for graphs written before they were kept)."""
+
+        if not (self.path / "self_loops.npy").exists():
+            return np.empty(0, dtype=np.int64)
+        return self._array("self_loops")
+
+    def degrees(self) -> np.ndarray:
+        """Degree of each row (in- plus out-degree when directed, a self-loop counting twice, as in networkx)."""
+
+        degrees = np.diff(self.indptr)
+        if self.directed:
+            degrees = degrees + np.bincount(self.indices, minlength=self.num_nodes)
+        looped = self.self_loop_rows()
+        if len(looped):
+            degrees = degrees.copy()
+            degrees[looped] += 2
+        return degrees
+
+    def edge_rows(self) -> np.ndarray:
+        """(m, 2) row pairs of every edge, in the order networkx lists them for ``to_networkx()``."""
+
+        indptr, indices = self.indptr, self.indices
+        rows = np.repeat(np.arange(self.num_nodes), np.diff(indptr))
+        if not self.directed:
+            upper = rows < indices
+            rows, indices = rows[upper], indices[upper]
+        return np.column_stack((rows, indices))
+
+    def neighbours(self, row: int) -> np.ndarray:
+        indptr = self.indptr
+        return self.indices[indptr[row]:indptr[row + 1]]
+
+    def predecessors(self, row: int) -> np.ndarray:
+        """Rows with an edge into ``row``; the same as ``neighbours`` when undirected.
+
+        A directed graph's reverse index is built in memory on first use.
+        """
+
+        if not self.directed:
+            return self.neighbours(row)
+        if "reverse_indptr" not in self._arrays:
+            order = np.argsort(self.indices, kind="stable")
+            sources = np.repeat(np.arange(self.num_nodes, dtype=self.indices.dtype), np.diff(self.indptr))
+            indptr = np.zeros(self.num_nodes + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.indices, minlength=self.num_nodes), out=indptr[1:])
+            self._arrays["reverse_indices"] = sources[order]
+            self._arrays["reverse_indptr"] = indptr
+        indptr = self._arrays["reverse_indptr"]
+        return self._arrays["reverse_indices"][indptr[row]:indptr[row + 1]]
+
+    @property
+    def node_ids(self) -> NodeIds:
+        """Original id of each row."""
+
+        if self._node_ids is None:
+            if self.manifest["node_ids"] == "int":
+                self._node_ids = self._array("nodes")
+            else:
+                with (self.path / "nodes.json").open("r", encoding="utf-8") as f:
+                    self._node_ids = json.load(f)
+        return self._node_ids
+
+    def to_networkx(self, node_ids: Optional[NodeIds] = None):
+        """networkx graph in the runner's format (``weight=1``, ``if_true=True`` on every edge).
+
+        Nodes are named by ``node_ids`` (default: the original ids).
+        """
+
+        import networkx as nx
+
+        ids = self.node_ids if node_ids is None else node_ids
+        ids = ids.tolist() if isinstance(ids, np.ndarray) else ids
+        graph = nx.DiGraph() if self.directed else nx.Graph()
+        graph.add_nodes_from(ids)
+        edges = self.edge_rows()
+        graph.add_edges_from(
+            zip((ids[row] for row in edges[:, 0].tolist()), (ids[col] for col in edges[:, 1].tolist())),
+            weight=1,
+            if_true=True,
+        )
+        graph.add_edges_from(((ids[row], ids[row]) for row in self.self_loop_rows().tolist()), weight=1, if_true=True)
+        return graph
+
+
+def from_networkx(graph, target: Path, stats: Optional[Dict] = None) -> CSRGraph:
+    """Write a networkx graph as a CSR graph (edge attributes are dropped)."""
+
+    nodes: Sequence = list(graph.nodes())
+    row_of = {node: row for row, node in enumerate(nodes)}
+    pairs = np.fromiter(
+        (row_of[node] for edge in graph.edges() for node in edge[:2]),
+        dtype=np.int64,
+        count=2 * graph.number_of_edges(),
+    ).reshape(-1, 2)
+    directed = graph.is_directed()
+    built = build_csr(pairs, len(nodes), directed=directed)
+    if all(isinstance(node, (int, np.integer)) and not isinstance(node, bool) for node in nodes):
+        node_ids: NodeIds = np.asarray(nodes, dtype=np.int64)
+    else:
+        node_ids = [str(node) for node in nodes]
+    return write_csr(
+        target,
+        built["indptr"],
+        built["indices"],
+        node_ids,
+        {"self_loops": built["self_loops"], "duplicate_edges": built["duplicate_edges"], **(stats or {})},
+        directed=directed,
+        self_loop_rows=built["self_loop_rows"],
+    )
+
+
+def open_dataset_graph(dataset_dir: Path, dataset: str) -> CSRGraph:
+    """The dataset's CSR graph; a legacy ``<dataset>_graph`` networkx pickle is converted on first use."""
+
+    path = csr_path_for(dataset_dir, dataset)
+    if not path.exists():
+        legacy = dataset_dir / f"{dataset}_graph"
+        if not legacy.exists():
+            raise FileNotFoundError(f"No graph found for dataset '{dataset}' in {dataset_dir}")
+        with legacy.open("rb") as f:
+            graph = pickle.load(f)["G"]
+        return from_networkx(graph, path, {"converted_from": legacy.name})
+    return CSRGraph(path)
@@ -0,0 +1,243 @@
+"""Persistent catalog of datasets under ``backend/dataset``.
+
+Endpoints resolve a dataset either by folder name or by the ``meta.dataset``
+id stored inside its ``output.json``. Finding the latter used to mean
+parsing every ``output.json`` on disk. The catalog is a small SQLite file
+(``.catalog.sqlite3`` in the datasets root) mapping folder ids and meta ids
+to artifact paths, sizes and run parameters, so a lookup is one indexed
+query.
+
+Entries are recorded when uploads finish and whenever ``run_poligras``
+publishes an output. Folders created behind the catalog's back are picked
+up on first lookup by folder name, and ``python -m
+backend.dataset_catalog --rebuild`` reindexes everything. Hidden folders
+(scratch space such as ``.resummarize-*``) are never cataloged.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from backend.csr_graph import csr_path_for
+
+CATALOG_NAME = ".catalog.sqlite3"
+_META_PREFIX_BYTES = 1 << 16
+_WHITESPACE = re.compile(r"\s*")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (
+    id TEXT PRIMARY KEY,
+    meta_dataset TEXT,
+    has_output INTEGER NOT NULL,
+    output_size INTEGER,
+    has_graph INTEGER NOT NULL,
+    has_features INTEGER NOT NULL,
+    run_id TEXT,
+    parameters TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS datasets_meta ON datasets (meta_dataset);
+"""
+
+
+@dataclass(frozen=True)
+class DatasetEntry:
+    id: str
+    dataset_dir: Path
+    meta_dataset: Optional[str]
+    has_output: bool
+    output_size: Optional[int]
+    has_graph: bool
+    has_features: bool
+    run_id: Optional[str]
+    parameters: Optional[Dict]
+    updated_at: float
+
+    @property
+    def output_path(self) -> Path:
+        return self.dataset_dir / "output.json"
+
+    def as_dict(self) -> Dict:
+        payload = asdict(self)
+        payload["dataset_dir"] = str(self.dataset_dir)
+        return payload
+
+
+def read_output_meta(path: Path) -> Optional[Dict]:
+    """``meta`` block of an ``output.json`` without parsing the whole file.
+
+    Outputs written by ``run_poligras`` start with ``meta``, so it is
+    decoded from the first few KiB. Otherwise the file is parsed fully.
+    """
+
+    with path.open("rb") as f:
+        head = f.read(_META_PREFIX_BYTES).decode("utf-8", errors="ignore")
+    key = head.find('"meta"')
+    if key != -1:
+        colon = head.find(":", key)
+        if colon != -1:
+            start = _WHITESPACE.match(head, colon + 1).end()  # type: ignore[union-attr]
+            try:
+                meta, _ = json.JSONDecoder().raw_decode(head, start)
+                if isinstance(meta, dict):
+                    return meta
+            except json.JSONDecodeError:
+                pass
+    with path.open("r", encoding="utf-8") as f:
+        meta = json.load(f).get("meta")
+    return meta if isinstance(meta, dict) else None
+
+
+class DatasetCatalog:
+    """SQLite-backed index of dataset folders; safe to share between processes."""
+
+    def __init__(self, datasets_root: Path, path: Optional[Path] = None):
+        self.datasets_root = datasets_root
+        self.path = path or datasets_root / CATALOG_NAME
+        fresh = not self.path.exists()
+        self.datasets_root.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        if fresh:
+            self.rebuild()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def record(self, dataset_id: str, meta: Optional[Dict] = None) -> Optional[DatasetEntry]:
+        """(Re)index one dataset folder and return its entry.
+
+        ``meta`` may be passed when the caller just produced the output, to
+        avoid reading it back. Returns None (and forgets the id) when the
+        folder is gone or hidden.
+        """
+
+        dataset_dir = self.datasets_root / dataset_id
+        if dataset_id.startswith(".") or not dataset_dir.is_dir():
+            self.remove(dataset_id)
+            return None
+
+        output_path = dataset_dir / "output.json"
+        output_size: Optional[int] = None
+        if output_path.exists():
+            output_size = output_path.stat().st_size
+            if meta is None:
+                try:
+                    meta = read_output_meta(output_path)
+                except (OSError, ValueError):
+                    meta = None
+        meta = meta or {}
+        row = (
+            dataset_id,
+            meta.get("dataset"),
+            int(output_size is not None),
+            output_size,
+            int((dataset_dir / f"{dataset_id}_graph").exists() or csr_path_for(dataset_dir, dataset_id).exists()),
+            int((dataset_dir / f"{dataset_id}_feat").exists()),
+            meta.get("run_id"),
+            json.dumps(meta["parameters"]) if meta.get("parameters") is not None else None,
+            time.time(),
+        )
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO datasets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+        return self._entry(row)
+
+    def remove(self, dataset_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM datasets WHERE id = ?", (dataset_id,))
+
+    def get(self, dataset_id: str) -> Optional[DatasetEntry]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM datasets WHERE id = ?", (dataset_id,)).fetchone()
+        return self._entry(row) if row is not None else None
+
+    def resolve(self, dataset_id: str) -> Optional[DatasetEntry]:
+        """Entry for a folder id, or else for a ``meta.dataset`` id.
+
+        A folder id with an output takes precedence. Folders missing from
+        the catalog (or whose output appeared later) are indexed on the
+        spot.
+        """
+
+        entry = self.get(dataset_id)
+        if entry is None or not entry.has_output:
+            if (self.datasets_root / dataset_id / "output.json").exists():
+                return self.record(dataset_id)
+        if entry is not None and entry.has_output:
+            return entry
+
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM datasets WHERE meta_dataset = ? AND has_output = 1 ORDER BY updated_at DESC LIMIT 1",
+                (dataset_id,),
+            ).fetchone()
+        if row is not None:
+            found = self._entry(row)
+            if found.output_path.exists():
+                return found
+            self.record(found.id)
+        return entry
+
+    def entries(self) -> List[DatasetEntry]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM datasets ORDER BY id").fetchall()
+        return [self._entry(row) for row in rows]
+
+    def rebuild(self) -> int:
+        """Reindex every folder under the datasets root; returns the number of entries."""
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM datasets")
+        count = 0
+        for child in sorted(self.datasets_root.iterdir()):
+            if child.is_dir() and self.record(child.name) is not None:
+                count += 1
+        return count
+
+    def _entry(self, row) -> DatasetEntry:
+        dataset_id, meta_dataset, has_output, output_size, has_graph, has_features, run_id, parameters, updated_at = row
+        return DatasetEntry(
+            id=dataset_id,
+            dataset_dir=self.datasets_root / dataset_id,
+            meta_dataset=meta_dataset,
+            has_output=bool(has_output),
+            output_size=output_size,
+            has_graph=bool(has_graph),
+            has_features=bool(has_features),
+            run_id=run_id,
+            parameters=json.loads(parameters) if parameters else None,
+            updated_at=updated_at,
+        )
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or rebuild the dataset catalog.")
+    parser.add_argument("--root", type=str, default=str(Path(__file__).resolve().parent / "dataset"))
+    parser.add_argument("--rebuild", action="store_true", help="Reindex every dataset folder")
+    args = parser.parse_args()
+
+    catalog = DatasetCatalog(Path(args.root))
+    if args.rebuild:
+        print(f"Indexed {catalog.rebuild()} datasets into {catalog.path}")
+    for entry in catalog.entries():
+        print(json.dumps(entry.as_dict()))
+
+
+if __name__ == "__main__":
+    main()
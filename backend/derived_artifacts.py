@@ -0,0 +1,82 @@
+"""On-disk cache of files derived from a dataset's outputs.
+
+Download formats (gpickles, CSVs) are built from ``output.json`` or from a
+dynamic summary version. They are written once into the dataset's
+``.derived/`` directory, under a name that carries a stamp of their source,
+and served from there afterwards. A republished source gets a new stamp, so
+the next request rebuilds the file.
+
+Superseded files are not removed right away, since a download may still be
+reading one: the previous version is always kept, and older ones only once
+the file that replaced them is ``STALE_GRACE_SECONDS`` old.
+"""
+
+from __future__ import annotations
+
+import io
+import time
+from pathlib import Path
+from typing import IO, Callable, Optional
+
+from backend.atomic_files import atomic_write
+
+DERIVED_DIR_NAME = ".derived"
+# How long a superseded file outlives its replacement, for downloads still reading it.
+STALE_GRACE_SECONDS = 15 * 60
+
+
+def source_stamp(source: Path) -> str:
+    stat = source.stat()
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def derived_file(
+    source: Path,
+    name: str,
+    build: Callable[[IO[bytes]], None],
+    stamp: Optional[str] = None,
+) -> Path:
+    """Path of ``name`` derived from ``source``, built by ``build(handle)`` if missing or stale.
+
+    ``stamp`` overrides the default stamp (``source``'s mtime and size),
+    e.g. to also key on a dynamic summary version. Exceptions from ``build``
+    propagate and leave no file behind.
+    """
+
+    stem, _, suffix = name.partition(".")
+    directory = source.parent / DERIVED_DIR_NAME
+    target = directory / f"{stem}.{stamp or source_stamp(source)}.{suffix}"
+    if target.exists():
+        return target
+
+    directory.mkdir(exist_ok=True)
+    with atomic_write(target, "wb") as handle:
+        build(handle)
+    _remove_superseded(directory, stem, suffix)
+    return target
+
+
+def _remove_superseded(directory: Path, stem: str, suffix: str) -> None:
+    """Drop versions of ``stem`` whose replacement is older than the grace period, keeping the previous one."""
+
+    versions = []
+    for path in directory.glob(f"{stem}.*.{suffix}"):
+        try:
+            versions.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            continue
+    versions.sort(reverse=True)
+    cutoff = time.time() - STALE_GRACE_SECONDS
+    # versions[i] was superseded when versions[i - 1] was written.
+    for (replaced_at, _), (_, stale) in zip(versions[1:], versions[2:]):
+        if replaced_at < cutoff:
+            stale.unlink(missing_ok=True)
+
+
+def text_writer(handle: IO[bytes]) -> io.TextIOWrapper:
+    """UTF-8 text view of a binary ``build`` handle, suitable for ``csv.writer``.
+
+    Call ``detach()`` when done so the handle itself is not closed.
+    """
+
+    return io.TextIOWrapper(handle, encoding="utf-8", newline="")
@@ -3,17 +3,25 @@
 from __future__ import annotations
 
 import copy
+import heapq
 import json
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 from itertools import combinations
-from typing import Dict, Iterable, List, Literal, Optional, Sequence, Set, Tuple
+from typing import TYPE_CHECKING, Callable, Dict, FrozenSet, Iterable, Iterator, List, Literal, Optional, Sequence, Set, Tuple, Union
 
 from backend.output_types import PoligrasOutput, SummaryEdge
 
+if TYPE_CHECKING:
+    from backend.artifact_bundle import ArtifactBundle
+
 PairKey = Tuple[str, str]
 EdgeKey = Tuple[str, str]
 Operation = Literal["add", "remove"]
+CorrectionKind = Literal["positive", "negative"]
+# (is_superedge, positive corrections, negative corrections) of one pair.
+PairImage = Tuple[bool, FrozenSet[EdgeKey], FrozenSet[EdgeKey]]
 logger = logging.getLogger(__name__)
 if not logger.handlers:
     handler = logging.StreamHandler()
@@ -33,6 +41,86 @@ class EdgeUpdate:
     operation: Operation
     source: str
     target: str
+    timestamp: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class MaintenancePolicy:
+    """Knobs for incremental supernode maintenance during dynamic updates.
+
+    ``admit_new_nodes`` lets additions introduce nodes that are missing from
+    the membership map (they start as singleton supernodes). A touched
+    supernode is split back into singletons once its correction count exceeds
+    ``max(split_min_corrections, split_corrections_per_member * size)`` and
+    the split lowers superedges plus corrections. New and split-off
+    supernodes are then greedily re-merged with nearby supernodes while the
+    merge reward stays positive, so maintenance never makes the summary
+    more expensive.
+
+    Re-merging is bounded so that hubs cannot make it dominate a batch.
+    Ranking a seed's candidates walks at most ``max_candidate_scan`` pairs
+    of its neighbours, and one ``maintain`` call visits at most
+    ``max_work_per_batch`` pairs in total; seeds left when that runs out
+    are carried over to the next call.
+    """
+
+    admit_new_nodes: bool = True
+    split_min_corrections: int = 16
+    split_corrections_per_member: float = 4.0
+    max_merge_candidates: int = 32
+    max_merges: int = 256
+    max_candidate_scan: int = 4096
+    max_work_per_batch: int = 250_000
+
+
+@dataclass
+class SummaryChanges:
+    """Before/after images of every summary element touched by one or more batches.
+
+    Each mapping goes from an element key to ``(before, after)``; ``None``
+    means the element did not exist on that side. Corrections are keyed by
+    edge and valued by the correction set holding the edge. ``undo`` keeps
+    the pair-level before image of every changed pair, which together with
+    the supernode before images is enough to restore the earlier state
+    exactly (see ``_SummaryDynamicState.restore_images``).
+    """
+
+    superedges: Dict[PairKey, Tuple[Optional[SummaryEdge], Optional[SummaryEdge]]] = field(default_factory=dict)
+    corrections: Dict[EdgeKey, Tuple[Optional[CorrectionKind], Optional[CorrectionKind]]] = field(default_factory=dict)
+    supernodes: Dict[str, Tuple[Optional[List[str]], Optional[List[str]]]] = field(default_factory=dict)
+    undo: Dict[PairKey, PairImage] = field(default_factory=dict)
+    stats_before: Dict = field(default_factory=dict)
+    stats_after: Dict = field(default_factory=dict)
+
+    def then(self, later: "SummaryChanges") -> "SummaryChanges":
+        """Compose with the changes of a later batch, dropping elements that net to no change."""
+
+        def _merge(earlier: Dict, subsequent: Dict) -> Dict:
+            merged = dict(earlier)
+            for key, (before, after) in subsequent.items():
+                if key in merged:
+                    before = merged[key][0]
+                if before == after:
+                    merged.pop(key, None)
+                else:
+                    merged[key] = (before, after)
+            return merged
+
+        return SummaryChanges(
+            superedges=_merge(self.superedges, later.superedges),
+            corrections=_merge(self.corrections, later.corrections),
+            supernodes=_merge(self.supernodes, later.supernodes),
+            undo={**later.undo, **self.undo},
+            stats_before=self.stats_before or later.stats_before,
+            stats_after=later.stats_after or self.stats_after,
+        )
+
+
+@dataclass
+class _ChangeRecorder:
+    pairs: Dict[PairKey, Tuple[Optional[SummaryEdge], frozenset, frozenset, bool]] = field(default_factory=dict)
+    supernodes: Dict[str, Optional[List[str]]] = field(default_factory=dict)
+    stats_before: Dict = field(default_factory=dict)
 
 
 def parse_update_stream(raw_data: bytes | str) -> List[EdgeUpdate]:
@@ -60,61 +148,158 @@ def parse_update_stream(raw_data: bytes | str) -> List[EdgeUpdate]:
     if not isinstance(entries, list):
         raise UpdateStreamError("Expected a JSON array or an object with an 'updates' list")
 
-    def _get_field(entry: Dict, keys: Sequence[str]) -> Optional[str | int]:
-        for key in keys:
-            if key in entry and entry[key] is not None:
-                return entry[key]
-        return None
+    return [update_from_entry(entry, f"Update #{idx}") for idx, entry in enumerate(entries)]
 
-    updates: List[EdgeUpdate] = []
-    for idx, entry in enumerate(entries):
-        if not isinstance(entry, dict):
-            raise UpdateStreamError(f"Update #{idx} is not an object")
 
-        op_token = _get_field(entry, ("operation", "op", "action", "type"))
-        if not isinstance(op_token, str):
-            raise UpdateStreamError(f"Update #{idx} is missing an operation field (use 'type', 'op', 'operation', or 'action')")
+OPERATION_FIELDS = ("operation", "op", "action", "type")
+SOURCE_FIELDS = ("source", "u", "from")
+TARGET_FIELDS = ("target", "v", "to")
+TIMESTAMP_FIELDS = ("timestamp", "ts", "time")
 
-        op_norm = op_token.strip().lower()
-        if op_norm in {"add", "addition", "insert", "insertion"}:
-            operation: Operation = "add"
-        elif op_norm in {"remove", "removal", "delete", "deletion"}:
-            operation = "remove"
-        else:
-            raise UpdateStreamError(f"Update #{idx} has unsupported operation '{op_token}'")
-
-        source = _get_field(entry, ("source", "u", "from"))
-        target = _get_field(entry, ("target", "v", "to"))
-        if source is None or target is None:
-            raise UpdateStreamError(f"Update #{idx} must specify 'source' and 'target'")
-
-        updates.append(
-            EdgeUpdate(
-                operation=operation,
-                source=str(source),
-                target=str(target),
-            )
-        )
 
-    return updates
+def normalise_operation(op_token: str, label: str) -> Operation:
+    """Map the accepted operation spellings onto ``add``/``remove``."""
+
+    op_norm = op_token.strip().lower()
+    if op_norm in {"add", "addition", "insert", "insertion", "+"}:
+        return "add"
+    if op_norm in {"remove", "removal", "delete", "deletion", "-"}:
+        return "remove"
+    raise UpdateStreamError(f"{label} has unsupported operation '{op_token}'")
 
 
-def apply_edge_updates(summary_output: PoligrasOutput, updates: Sequence[EdgeUpdate]) -> PoligrasOutput:
-    """Apply a stream of updates to an existing Poligras summary payload."""
+def parse_timestamp(value: object, label: str) -> float:
+    """Accept epoch seconds (number or numeric string) or an ISO 8601 string."""
+
+    if isinstance(value, bool):
+        raise UpdateStreamError(f"{label} has an invalid timestamp {value!r}")
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        token = value.strip()
+        try:
+            return float(token)
+        except ValueError:
+            pass
+        try:
+            parsed = datetime.fromisoformat(token.replace("Z", "+00:00"))
+        except ValueError as exc:
+            raise UpdateStreamError(f"{label} has an invalid timestamp '{value}'") from exc
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    raise UpdateStreamError(f"{label} has an invalid timestamp {value!r}")
+
+
+def update_from_entry(entry: object, label: str) -> EdgeUpdate:
+    """Validate one decoded update object; ``label`` prefixes error messages."""
+
+    if not isinstance(entry, dict):
+        raise UpdateStreamError(f"{label} is not an object")
+
+    def _get_field(keys: Sequence[str]) -> Optional[str | int]:
+        for key in keys:
+            if key in entry and entry[key] is not None:
+                return entry[key]
+        return None
+
+    op_token = _get_field(OPERATION_FIELDS)
+    if not isinstance(op_token, str):
+        raise UpdateStreamError(f"{label} is missing an operation field (use 'type', 'op', 'operation', or 'action')")
+    operation = normalise_operation(op_token, label)
+
+    source = _get_field(SOURCE_FIELDS)
+    target = _get_field(TARGET_FIELDS)
+    if source is None or target is None:
+        raise UpdateStreamError(f"{label} must specify 'source' and 'target'")
+
+    timestamp = _get_field(TIMESTAMP_FIELDS)
+    return EdgeUpdate(
+        operation=operation,
+        source=str(source),
+        target=str(target),
+        timestamp=None if timestamp is None else parse_timestamp(timestamp, label),
+    )
+
+
+def load_dynamic_state(
+    summary_output: Union[PoligrasOutput, "ArtifactBundle"],
+    policy: Optional[MaintenancePolicy] = None,
+    window: Optional[float] = None,
+) -> "_SummaryDynamicState":
+    """Build a mutable dynamic state for callers that apply updates incrementally.
+
+    ``summary_output`` may also be an ``ArtifactBundle`` of the summary.
+    """
+
+    if isinstance(summary_output, dict):
+        return _SummaryDynamicState(summary_output, policy=policy, window=window)
+    return _SummaryDynamicState.from_bundle(summary_output, policy=policy, window=window)
+
+
+def apply_edge_updates(
+    summary_output: PoligrasOutput,
+    updates: Sequence[EdgeUpdate],
+    coalesce: bool = True,
+    policy: Optional[MaintenancePolicy] = None,
+    workers: int = 1,
+    window: Optional[float] = None,
+) -> PoligrasOutput:
+    """Apply a stream of updates to an existing Poligras summary payload.
+
+    With ``coalesce`` enabled the batch is grouped by supernode pair and each
+    pair's net delta is applied once (see ``_SummaryDynamicState.apply_batch``);
+    the result is identical to applying the updates one at a time. Passing a
+    ``policy`` enables structural maintenance (new nodes, splits and local
+    re-merging) once the batch has been applied. Without a policy,
+    ``workers`` > 1 applies the coalesced batch with a ``ShardedDynamicEngine``
+    (one process per worker). ``window`` enables sliding-window expiry (see
+    ``_SummaryDynamicState``); note that a fresh state only tracks the
+    timestamps of this call's updates.
+    """
 
     if not updates:
         return copy.deepcopy(summary_output)
 
-    state = _SummaryDynamicState(summary_output)
-    for update in updates:
-        state.apply(update)
+    if workers > 1 and coalesce and policy is None and window is None:
+        from backend.sharded_updates import ShardedDynamicEngine
+
+        with ShardedDynamicEngine(summary_output, workers=workers) as engine:
+            engine.apply_batch(updates)
+            return engine.materialise()
+
+    state = _SummaryDynamicState(summary_output, policy=policy, window=window)
+    if coalesce or window is not None:
+        state.apply_batch(updates)
+    else:
+        for update in updates:
+            state.apply(update)
+    if policy is not None:
+        state.maintain()
     return state.materialise()
 
 
 class _SummaryDynamicState:
-    """Mutable helper that tracks summary state while applying updates."""
+    """Mutable helper that tracks summary state while applying updates.
+
+    With a ``window`` (in timestamp units, usually seconds) the state keeps
+    only edges added within the last ``window`` of stream time. The
+    watermark is the largest update timestamp seen so far; updates without
+    a timestamp are stamped with the current watermark. Each batch appends
+    removals for edges that fell out of the window, and they go through the
+    same coalesced correction/superedge logic as explicit removals. Edges
+    from the base summary, and edges added before any timestamp was seen,
+    carry no time and never expire; re-adding one with a timestamp leaves it
+    pinned. Admitted nodes that a batch's removals leave without edges are
+    dropped again, together with their supernode once it is empty.
+    """
 
-    def __init__(self, payload: PoligrasOutput):
+    def __init__(
+        self,
+        payload: PoligrasOutput,
+        policy: Optional[MaintenancePolicy] = None,
+        window: Optional[float] = None,
+    ):
         artifacts = payload.get("artifacts")
         if not artifacts:
             raise UpdateStreamError("Summary payload is missing artifacts metadata. Regenerate the summary with an updated backend build.")
@@ -125,50 +310,401 @@ class _SummaryDynamicState:
         if not isinstance(members_raw, dict) or not isinstance(node_to_super, dict):
             raise UpdateStreamError("Summary artifacts do not contain supernode membership information.")
 
-        self.members: Dict[str, List[str]] = {
-            str(supernode): [str(node) for node in nodes]
-            for supernode, nodes in members_raw.items()
-        }
-        self.node_to_super: Dict[str, str] = {str(node): str(supernode) for node, supernode in node_to_super.items()}
-        self.directed = bool(payload["graphs"]["initial"].get("directed", False))
-        self.self_loops = int(artifacts.get("self_loops", 0))
-
         corrections_raw = artifacts.get("corrections", {}) or {}
-        positive_edges = corrections_raw.get("positive", [])
-        negative_edges = corrections_raw.get("negative", [])
+        self._initialise(
+            copy.deepcopy(payload),
+            members={
+                str(supernode): [str(node) for node in nodes]
+                for supernode, nodes in members_raw.items()
+            },
+            node_to_super={str(node): str(supernode) for node, supernode in node_to_super.items()},
+            positive=self._endpoints(corrections_raw.get("positive", [])),
+            negative=self._endpoints(corrections_raw.get("negative", [])),
+            superedges=self._endpoints(payload["graphs"]["summary"].get("edges", [])),
+            policy=policy,
+            window=window,
+        )
 
-        self.correction_plus = self._build_edge_index(positive_edges)
-        self.correction_minus = self._build_edge_index(negative_edges)
-        self.superedges: Set[PairKey] = self._build_superedge_set(payload["graphs"]["summary"].get("edges", []))
+    @classmethod
+    def from_bundle(
+        cls,
+        bundle: "ArtifactBundle",
+        policy: Optional[MaintenancePolicy] = None,
+        window: Optional[float] = None,
+    ) -> "_SummaryDynamicState":
+        """Build the state straight from a memory-mapped ``ArtifactBundle``.
+
+        Membership, corrections and superedges are read from the bundle's
+        columns instead of from JSON objects.
+        """
+
+        members = bundle.members()
+        state = cls.__new__(cls)
+        state._initialise(
+            bundle.payload(include_membership=False),
+            members=members,
+            node_to_super={node: supernode for supernode, nodes in members.items() for node in nodes},
+            positive=bundle.pairs("corrections.positive"),
+            negative=bundle.pairs("corrections.negative"),
+            superedges=bundle.pairs("summary.edges"),
+            policy=policy,
+            window=window,
+        )
+        return state
 
-        self._base_payload = copy.deepcopy(payload)
+    def _initialise(
+        self,
+        base_payload: PoligrasOutput,
+        members: Dict[str, List[str]],
+        node_to_super: Dict[str, str],
+        positive: Iterable[EdgeKey],
+        negative: Iterable[EdgeKey],
+        superedges: Iterable[EdgeKey],
+        policy: Optional[MaintenancePolicy],
+        window: Optional[float],
+    ) -> None:
+        self.members = members
+        self.node_to_super = node_to_super
+        self.directed = bool(base_payload["graphs"]["initial"].get("directed", False))
+        self.self_loops = int(base_payload["artifacts"].get("self_loops", 0))
+
+        self.correction_plus = self._build_edge_index(positive)
+        self.correction_minus = self._build_edge_index(negative)
+        self.superedges: Set[PairKey] = self._build_superedge_set(superedges)
+
+        # Structural maintenance bookkeeping; the pair index is only needed
+        # (and only built) when a maintenance policy is active.
+        self.policy = policy
+        self._pairs_by_super: Optional[Dict[str, Set[PairKey]]] = None
+        self._touched: Set[str] = set()
+        self._admitted: Set[str] = set()
+        # Nodes added by updates rather than by the base summary; only these are ever evicted.
+        self._admitted_nodes: Set[str] = set()
+        self._membership_changed = False
+        self._recorder: Optional[_ChangeRecorder] = None
+        self._correction_totals: Optional[List[int]] = None
+        # Per-maintain() scratch: dense-pair profiles of supernodes and pairs visited.
+        self._dense_profiles: Dict[str, Dict[Tuple[int, int], int]] = {}
+        self._work = 0
+        if policy is not None:
+            self._pairs_by_super = {}
+            for pair_key in self.superedges | set(self.correction_plus) | set(self.correction_minus):
+                self._index_pair(pair_key)
+
+        # Sliding-window bookkeeping: last add time per live edge plus a
+        # min-heap of (time, edge) with lazily discarded stale entries.
+        if window is not None and window <= 0:
+            raise ValueError("window must be positive")
+        self.window = window
+        self.watermark: Optional[float] = None
+        self._edge_times: Dict[EdgeKey, float] = {}
+        self._expiry: List[Tuple[float, EdgeKey]] = []
+
+        self._base_payload = base_payload
 
     # ------------------------------------------------------------------
     # Public API
     # ------------------------------------------------------------------
     def apply(self, update: EdgeUpdate) -> None:
-        source = str(update.source)
-        target = str(update.target)
-        if source == target:
-            raise UpdateStreamError("Self-loop updates are not supported in the dynamic summary model.")
-
-        try:
-            super_u = self.node_to_super[source]
-            super_v = self.node_to_super[target]
-        except KeyError as exc:
-            raise UpdateStreamError(f"Node '{exc.args[0]}' is not present in the summary membership map.") from exc
-
-        pair_key = self._pair_key(super_u, super_v)
-        edge_key = self._edge_key(source, target)
+        resolved = self._resolve(update)
+        if resolved is None:
+            return
+        pair_key, edge_key, super_u, super_v = resolved
 
         if update.operation == "add":
             self._apply_addition(pair_key, edge_key, super_u, super_v)
         else:
             self._apply_removal(pair_key, edge_key, super_u, super_v)
 
+    def check(self, update: EdgeUpdate) -> None:
+        """Raise ``UpdateStreamError`` if ``update`` would be rejected, without side effects."""
+
+        if str(update.source) == str(update.target):
+            raise UpdateStreamError("Self-loop updates are not supported in the dynamic summary model.")
+        if self.policy is not None and self.policy.admit_new_nodes:
+            return
+        for node in (str(update.source), str(update.target)):
+            if node not in self.node_to_super:
+                raise UpdateStreamError(f"Node '{node}' is not present in the summary membership map.")
+
+    def apply_batch(self, updates: Iterable[EdgeUpdate]) -> None:
+        """Apply a batch of updates, coalescing them per supernode pair.
+
+        Opposing operations on the same edge cancel out (the last operation
+        wins), and each pair's remaining net delta is applied in one step so
+        the promote/demote threshold is evaluated once per pair rather than
+        once per update. Pairs whose current encoding disagrees with the
+        majority rule (e.g. self-loop superedges kept by ``encode``'s quarter
+        threshold) are replayed in order, so the outcome always matches
+        sequential ``apply`` calls. In window mode the removals of expired
+        edges are appended to the batch.
+        """
+
+        if self.window is not None:
+            updates = self._stamp_and_expire(list(updates))
+            self._apply_coalesced(updates)
+            self._evict_isolated(updates)
+            return
+        self._apply_coalesced(updates)
+
+    def advance_to(self, timestamp: float) -> int:
+        """Move the window watermark forward without new updates; returns the number of expired edges."""
+
+        if self.window is None:
+            return 0
+        if self.watermark is None or timestamp > self.watermark:
+            self.watermark = float(timestamp)
+        expired = self._collect_expired()
+        self._apply_coalesced(expired)
+        self._evict_isolated(expired)
+        return len(expired)
+
+    def _apply_coalesced(self, updates: Iterable[EdgeUpdate]) -> None:
+        net_ops: Dict[PairKey, Dict[EdgeKey, Operation]] = {}
+        replay: Dict[PairKey, List[Tuple[EdgeKey, Operation]]] = {}
+        for update in updates:
+            resolved = self._resolve(update)
+            if resolved is None:
+                continue
+            pair_key, edge_key, super_u, super_v = resolved
+            pair_ops = net_ops.get(pair_key)
+            if pair_ops is None:
+                pair_ops = net_ops[pair_key] = {}
+                if not self._is_majority_encoded(pair_key, super_u, super_v):
+                    replay[pair_key] = []
+            pair_ops[edge_key] = update.operation
+            if pair_key in replay:
+                replay[pair_key].append((edge_key, update.operation))
+
+        for pair_key, pair_ops in net_ops.items():
+            super_u, super_v = pair_key
+            if pair_key in replay:
+                for edge_key, operation in replay[pair_key]:
+                    if operation == "add":
+                        self._apply_addition(pair_key, edge_key, super_u, super_v)
+                    else:
+                        self._apply_removal(pair_key, edge_key, super_u, super_v)
+            else:
+                self._apply_net_delta(pair_key, pair_ops, super_u, super_v)
+
+    def apply_updates(self, updates: Iterable[EdgeUpdate]) -> None:
+        """Apply one batch (coalesced) followed by structural maintenance, if enabled."""
+
+        self.apply_batch(updates)
+        if self.policy is not None:
+            self.maintain()
+
+    def begin_changes(self) -> None:
+        """Start recording before-images so ``collect_changes`` can report a diff."""
+
+        self._recorder = _ChangeRecorder(stats_before=self.current_stats())
+
+    def collect_changes(self) -> SummaryChanges:
+        """Stop recording and return what changed since ``begin_changes``."""
+
+        recorder, self._recorder = self._recorder, None
+        if recorder is None:
+            raise RuntimeError("collect_changes() called without begin_changes()")
+
+        totals = self._totals()
+        changes = SummaryChanges(stats_before=recorder.stats_before)
+        # An edge can move between pairs when membership changes, so its
+        # before/after kinds are gathered across all recorded pairs.
+        kind_before: Dict[EdgeKey, CorrectionKind] = {}
+        kind_after: Dict[EdgeKey, CorrectionKind] = {}
+        for pair_key, (edge_before, plus_before, minus_before, was_superedge) in recorder.pairs.items():
+            edge_after = self._superedge_entry(pair_key)
+            if edge_before != edge_after:
+                changes.superedges[pair_key] = (edge_before, edge_after)
+
+            plus_after = self.correction_plus.get(pair_key, set())
+            minus_after = self.correction_minus.get(pair_key, set())
+            if was_superedge != (pair_key in self.superedges) or plus_before != plus_after or minus_before != minus_after:
+                changes.undo[pair_key] = (was_superedge, plus_before, minus_before)
+            totals[0] += len(plus_after) - len(plus_before)
+            totals[1] += len(minus_after) - len(minus_before)
+            kind_before.update(dict.fromkeys(plus_before - plus_after, "positive"))
+            kind_before.update(dict.fromkeys(minus_before - minus_after, "negative"))
+            kind_after.update(dict.fromkeys(plus_after - plus_before, "positive"))
+            kind_after.update(dict.fromkeys(minus_after - minus_before, "negative"))
+
+        for edge_key in kind_before.keys() | kind_after.keys():
+            before, after = kind_before.get(edge_key), kind_after.get(edge_key)
+            if before != after:
+                changes.corrections[edge_key] = (before, after)
+
+        for supernode, nodes_before in recorder.supernodes.items():
+            nodes_after = self.members.get(supernode)
+            nodes_after = list(nodes_after) if nodes_after is not None else None
+            if nodes_before != nodes_after:
+                changes.supernodes[supernode] = (nodes_before, nodes_after)
+
+        changes.stats_after = self.current_stats()
+        return changes
+
+    def export_core(self) -> Dict:
+        """Return the mutable summary state (membership, superedges, corrections) as plain data."""
+
+        return {
+            "members": {supernode: list(nodes) for supernode, nodes in self.members.items()},
+            "node_to_super": dict(self.node_to_super),
+            "superedges": sorted(self.superedges),
+            "correction_plus": {pair: sorted(edges) for pair, edges in self.correction_plus.items() if edges},
+            "correction_minus": {pair: sorted(edges) for pair, edges in self.correction_minus.items() if edges},
+            "self_loops": self.self_loops,
+            "watermark": self.watermark,
+            "edge_times": [(edge[0], edge[1], ts) for edge, ts in self._edge_times.items()],
+            "admitted_nodes": sorted(self._admitted_nodes),
+            # Carried between maintain() calls: supernodes to inspect and re-merge seeds deferred by the work budget.
+            "touched": sorted(self._touched),
+            "pending_seeds": sorted(self._admitted),
+        }
+
+    def restore_core(self, core: Dict) -> None:
+        """Replace the mutable summary state with one produced by ``export_core``."""
+
+        self.members = {supernode: list(nodes) for supernode, nodes in core["members"].items()}
+        self.node_to_super = dict(core["node_to_super"])
+        self.superedges = {tuple(pair) for pair in core["superedges"]}  # type: ignore[misc]
+        self.correction_plus = {tuple(pair): {tuple(edge) for edge in edges} for pair, edges in core["correction_plus"].items()}  # type: ignore[misc]
+        self.correction_minus = {tuple(pair): {tuple(edge) for edge in edges} for pair, edges in core["correction_minus"].items()}  # type: ignore[misc]
+        self.self_loops = int(core.get("self_loops", self.self_loops))
+        self.restore_window(core.get("watermark"), core.get("edge_times", ()))
+        self._admitted_nodes = set(core.get("admitted_nodes", ()))
+        self._touched = set(core.get("touched", ()))
+        self._admitted = set(core.get("pending_seeds", ()))
+        # The core may come from a different base payload, so never reuse its nodes.
+        self._membership_changed = True
+        self._correction_totals = None
+        if self._pairs_by_super is not None:
+            self._pairs_by_super = {}
+            for pair_key in self.superedges | set(self.correction_plus) | set(self.correction_minus):
+                self._index_pair(pair_key)
+
+    def restore_window(self, watermark: Optional[float], edge_times: Iterable[Tuple[str, str, float]]) -> None:
+        """Replace the sliding-window clock and per-edge add times (as exported by ``export_core``)."""
+
+        self.watermark = watermark
+        self._edge_times = {(source, target): ts for source, target, ts in edge_times}
+        self._expiry = [(ts, edge) for edge, ts in self._edge_times.items()]
+        heapq.heapify(self._expiry)
+
+    def restore_images(
+        self,
+        pairs: Dict[PairKey, PairImage],
+        supernodes: Dict[str, Optional[List[str]]],
+    ) -> None:
+        """Reset the given pairs and supernodes to earlier images, e.g. to undo recorded changes.
+
+        Runs in time proportional to the images, not to the summary. Window
+        timestamps are not rewound: restored edges stay untimed, and expiry
+        of edges that the restore removed is a no-op.
+        """
+
+        for pair_key in pairs:
+            self._record_pair(pair_key)
+        for supernode in supernodes:
+            self._record_supernode(supernode)
+        dropped: Set[str] = set()
+        for supernode in supernodes:
+            for node in self.members.get(supernode, ()):
+                if self.node_to_super.get(node) == supernode:
+                    del self.node_to_super[node]
+                    dropped.add(node)
+        for supernode, nodes in supernodes.items():
+            if nodes is None:
+                self.members.pop(supernode, None)
+                continue
+            self.members[supernode] = list(nodes)
+            for node in nodes:
+                self.node_to_super[node] = supernode
+        if supernodes:
+            self._membership_changed = True
+            self._admitted_nodes.difference_update(node for node in dropped if node not in self.node_to_super)
+
+        for pair_key, (is_superedge, plus, minus) in pairs.items():
+            if is_superedge:
+                self.superedges.add(pair_key)
+            else:
+                self.superedges.discard(pair_key)
+            for index, edges in ((self.correction_plus, plus), (self.correction_minus, minus)):
+                if edges:
+                    index[pair_key] = set(edges)
+                else:
+                    index.pop(pair_key, None)
+            if is_superedge or plus or minus:
+                self._index_pair(pair_key)
+            else:
+                self._unindex_pair(pair_key)
+
+    @property
+    def base_version(self) -> int:
+        """``artifacts.version`` of the summary the state was built from."""
+
+        return int(self._base_payload.get("artifacts", {}).get("version", 0))
+
+    def current_stats(self) -> Dict:
+        positive_count, negative_count = self._totals()
+        return self._build_stats(self._base_payload["stats"], positive_count, negative_count)
+
+    def stats_for_counts(self, superedge_count: int, positive_count: int, negative_count: int) -> Dict:
+        """Stats for this membership with externally maintained pair counts (see ``sharded_updates``)."""
+
+        return self._build_stats(self._base_payload["stats"], positive_count, negative_count, superedge_count)
+
+    def pair_key_for(self, update: EdgeUpdate) -> Optional[PairKey]:
+        """Return the supernode pair ``update`` touches, or None when it is a no-op."""
+
+        resolved = self._resolve(update)
+        return None if resolved is None else resolved[0]
+
+    def retain_pairs(self, keep: Callable[[PairKey], bool]) -> None:
+        """Drop superedges and corrections of every pair for which ``keep`` is false.
+
+        Used to turn a full state into one shard of a pair-partitioned engine;
+        membership is left intact.
+        """
+
+        self.superedges = {pair_key for pair_key in self.superedges if keep(pair_key)}
+        self.correction_plus = {pair_key: edges for pair_key, edges in self.correction_plus.items() if keep(pair_key)}
+        self.correction_minus = {pair_key: edges for pair_key, edges in self.correction_minus.items() if keep(pair_key)}
+        self._correction_totals = None
+        if self._pairs_by_super is not None:
+            self._pairs_by_super = {}
+            for pair_key in self.superedges | set(self.correction_plus) | set(self.correction_minus):
+                self._index_pair(pair_key)
+
+    def maintain(self) -> None:
+        """Split overloaded supernodes touched since the last call and re-merge locally.
+
+        Only supernodes touched by updates are inspected, and re-merging is
+        limited to admitted or split-off supernodes and their two-hop
+        neighbourhood, so the cost tracks the size of the change rather than
+        the size of the summary.
+        """
+
+        if self.policy is None:
+            return
+
+        touched, self._touched = self._touched, set()
+        seeds, self._admitted = set(self._admitted), set()
+        self._dense_profiles, self._work = {}, 0
+        try:
+            for supernode in sorted(touched):
+                if supernode in self.members and self._should_split(supernode):
+                    seeds.update(self._split_supernode(supernode))
+            self._remerge_locally(seeds)
+        finally:
+            self._dense_profiles = {}
+
     def materialise(self) -> PoligrasOutput:
         payload = self._base_payload
         summary_graph = payload["graphs"]["summary"]
+        if self._membership_changed:
+            summary_graph["nodes"] = [
+                {"id": supernode, "size": len(nodes)}
+                for supernode, nodes in self.members.items()
+            ]
         summary_graph["edges"] = self._build_summary_edges()
         summary_graph["edge_count"] = len(summary_graph["edges"])
         summary_graph["node_count"] = len(summary_graph["nodes"])
@@ -191,13 +727,220 @@ class _SummaryDynamicState:
             "negative": self._serialise_edges(self.correction_minus.values()),
         }
         artifacts["self_loops"] = self.self_loops
+        if self.window is not None:
+            artifacts["window"] = {
+                "length": self.window,
+                "watermark": self.watermark,
+                "tracked_edges": len(self._edge_times),
+            }
 
         return payload
 
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
+    def _totals(self) -> List[int]:
+        # Correction counts are only summed once; collect_changes keeps them
+        # current from the per-pair deltas it already computes.
+        if self._correction_totals is None:
+            self._correction_totals = [
+                sum(len(edges) for edges in self.correction_plus.values()),
+                sum(len(edges) for edges in self.correction_minus.values()),
+            ]
+        return self._correction_totals
+
+    def _stamp_and_expire(self, updates: List[EdgeUpdate]) -> List[EdgeUpdate]:
+        # Validate first so a rejected batch leaves the window untouched.
+        for update in updates:
+            self.check(update)
+
+        watermark = self.watermark
+        # Presence of edges this batch has already added or removed, ahead of applying it.
+        present: Dict[EdgeKey, bool] = {}
+        for update in updates:
+            timestamp = update.timestamp if update.timestamp is not None else watermark
+            source, target = str(update.source), str(update.target)
+            edge_key = self._edge_key(source, target)
+            if update.operation == "add" and timestamp is not None:
+                pinned = edge_key not in self._edge_times and (
+                    present[edge_key] if edge_key in present else self._has_edge(source, target)
+                )
+                if not pinned:
+                    self._edge_times[edge_key] = timestamp
+                    heapq.heappush(self._expiry, (timestamp, edge_key))
+            else:
+                self._edge_times.pop(edge_key, None)
+            present[edge_key] = update.operation == "add"
+            if timestamp is not None and (watermark is None or timestamp > watermark):
+                watermark = timestamp
+        self.watermark = watermark
+
+        if len(self._expiry) > 2 * len(self._edge_times) + 1024:
+            self._expiry = [(ts, edge) for edge, ts in self._edge_times.items()]
+            heapq.heapify(self._expiry)
+        return updates + self._collect_expired()
+
+    def _collect_expired(self) -> List[EdgeUpdate]:
+        if self.window is None or self.watermark is None:
+            return []
+        cutoff = self.watermark - self.window
+        expired: List[EdgeUpdate] = []
+        while self._expiry and self._expiry[0][0] <= cutoff:
+            timestamp, edge_key = heapq.heappop(self._expiry)
+            if self._edge_times.get(edge_key) == timestamp:
+                del self._edge_times[edge_key]
+                expired.append(EdgeUpdate("remove", edge_key[0], edge_key[1], timestamp))
+        if expired:
+            logger.info("Expired %d edges older than %s", len(expired), cutoff)
+        return expired
+
+    def _has_edge(self, source: str, target: str) -> bool:
+        super_u, super_v = self.node_to_super.get(source), self.node_to_super.get(target)
+        if super_u is None or super_v is None:
+            return False
+        pair_key, edge_key = self._pair_key(super_u, super_v), self._edge_key(source, target)
+        if pair_key in self.superedges:
+            return edge_key not in self.correction_minus.get(pair_key, ())
+        return edge_key in self.correction_plus.get(pair_key, ())
+
+    def _has_live_edges(self, node: str, supernode: str) -> bool:
+        for pair_key in self._pairs_of(supernode):
+            if pair_key in self.superedges:
+                other = pair_key[1] if pair_key[0] == supernode else pair_key[0]
+                incident = len(self.members[supernode]) - 1 if other == supernode else len(self.members[other])
+                missing = sum(1 for edge_key in self.correction_minus.get(pair_key, ()) if node in edge_key)
+                if missing < incident:
+                    return True
+            elif any(node in edge_key for edge_key in self.correction_plus.get(pair_key, ())):
+                return True
+        return False
+
+    def _evict_isolated(self, updates: Iterable[EdgeUpdate]) -> None:
+        """Drop admitted nodes that ``updates``' removals left without edges, and supernodes left empty."""
+
+        if not self._admitted_nodes or self._pairs_by_super is None:
+            return
+        candidates = {
+            str(node) for update in updates if update.operation == "remove" for node in (update.source, update.target)
+        } & self._admitted_nodes
+        for node in sorted(candidates):
+            supernode = self.node_to_super.get(node)
+            if supernode is None:
+                self._admitted_nodes.discard(node)
+                continue
+            if self._has_live_edges(node, supernode):
+                continue
+            rest = [member for member in self.members[supernode] if member != node]
+            self._restructure([supernode], {supernode: rest} if rest else {})
+            del self.node_to_super[node]
+            self._admitted_nodes.discard(node)
+            self._log_change(f"Evicted node {node} without live edges from supernode {supernode}")
+
+    def _record_pair(self, pair_key: PairKey) -> None:
+        if self._recorder is None:
+            self._correction_totals = None
+            return
+        if pair_key not in self._recorder.pairs:
+            self._recorder.pairs[pair_key] = (
+                self._superedge_entry(pair_key),
+                frozenset(self.correction_plus.get(pair_key, ())),
+                frozenset(self.correction_minus.get(pair_key, ())),
+                pair_key in self.superedges,
+            )
+
+    def _record_supernode(self, supernode: str) -> None:
+        if self._recorder is None:
+            return
+        if supernode not in self._recorder.supernodes:
+            nodes = self.members.get(supernode)
+            self._recorder.supernodes[supernode] = list(nodes) if nodes is not None else None
+
+    def _resolve(self, update: EdgeUpdate) -> Optional[Tuple[PairKey, EdgeKey, str, str]]:
+        """Map an update onto its pair/edge keys, or None when it is a no-op.
+
+        Unknown nodes are rejected unless the maintenance policy admits them;
+        in that case additions create singleton supernodes and removals of
+        edges touching unknown nodes are ignored (such edges cannot exist).
+        """
+
+        source = str(update.source)
+        target = str(update.target)
+        if source == target:
+            raise UpdateStreamError("Self-loop updates are not supported in the dynamic summary model.")
+
+        admitting = self.policy is not None and self.policy.admit_new_nodes
+        for node in (source, target):
+            if node in self.node_to_super:
+                continue
+            if not admitting:
+                raise UpdateStreamError(f"Node '{node}' is not present in the summary membership map.")
+            if update.operation == "remove":
+                return None
+            self._admit_node(node)
+
+        super_u = self.node_to_super[source]
+        super_v = self.node_to_super[target]
+        if self.policy is not None:
+            self._touched.add(super_u)
+            self._touched.add(super_v)
+        return self._pair_key(super_u, super_v), self._edge_key(source, target), super_u, super_v
+
+    def _is_majority_encoded(self, pair_key: PairKey, super_u: str, super_v: str) -> bool:
+        """Return True when the pair is a superedge exactly when most of its edges exist.
+
+        Sequential updates preserve this invariant, which is what makes the
+        final encoding of such a pair depend only on its final edge set.
+        """
+
+        possible = self._possible_edges(super_u, super_v)
+        if pair_key in self.superedges:
+            return possible - len(self.correction_minus.get(pair_key, ())) > possible / 2
+        return len(self.correction_plus.get(pair_key, ())) <= possible / 2
+
+    def _apply_net_delta(
+        self,
+        pair_key: PairKey,
+        pair_ops: Dict[EdgeKey, Operation],
+        super_u: str,
+        super_v: str,
+    ) -> None:
+        self._record_pair(pair_key)
+        possible = self._possible_edges(super_u, super_v)
+        if pair_key in self.superedges:
+            neg_edges = self.correction_minus.pop(pair_key, set())
+            for edge_key, operation in pair_ops.items():
+                if operation == "add":
+                    neg_edges.discard(edge_key)
+                else:
+                    neg_edges.add(edge_key)
+            if neg_edges:
+                self.correction_minus[pair_key] = neg_edges
+            self._log_change(
+                f"Applied {len(pair_ops)} net updates to superedge {pair_key}; missing {len(neg_edges)} of {possible}"
+            )
+            if possible and possible - len(neg_edges) <= possible / 2:
+                self._demote_superedge(pair_key, super_u, super_v, neg_edges)
+            return
+
+        pos_edges = self.correction_plus.pop(pair_key, set())
+        for edge_key, operation in pair_ops.items():
+            if operation == "add":
+                pos_edges.add(edge_key)
+            else:
+                pos_edges.discard(edge_key)
+        if pos_edges:
+            self.correction_plus[pair_key] = pos_edges
+            self._index_pair(pair_key)
+        else:
+            self._unindex_pair(pair_key)
+        self._log_change(
+            f"Applied {len(pair_ops)} net updates to pair {pair_key}; total positives: {len(pos_edges)}"
+        )
+        if possible and len(pos_edges) > possible / 2:
+            self._promote_to_superedge(pair_key, super_u, super_v, pos_edges)
+
     def _apply_addition(self, pair_key: PairKey, edge_key: EdgeKey, super_u: str, super_v: str) -> None:
+        self._record_pair(pair_key)
         if pair_key in self.superedges:
             neg_edges = self.correction_minus.setdefault(pair_key, set())
             if edge_key in neg_edges:
@@ -214,6 +957,7 @@ class _SummaryDynamicState:
         if edge_key in pos_edges:
             return
         pos_edges.add(edge_key)
+        self._index_pair(pair_key)
         self._log_change(
             f"Recorded positive correction {edge_key} for pair {pair_key}; total positives: {len(pos_edges)}"
         )
@@ -223,6 +967,7 @@ class _SummaryDynamicState:
             self._promote_to_superedge(pair_key, super_u, super_v, pos_edges)
 
     def _apply_removal(self, pair_key: PairKey, edge_key: EdgeKey, super_u: str, super_v: str) -> None:
+        self._record_pair(pair_key)
         if pair_key in self.superedges:
             neg_edges = self.correction_minus.setdefault(pair_key, set())
             if edge_key in neg_edges:
@@ -251,6 +996,7 @@ class _SummaryDynamicState:
         )
         if not pos_edges:
             self.correction_plus.pop(pair_key, None)
+            self._unindex_pair(pair_key)
             self._log_change(f"Pair {pair_key} no longer tracked in positive corrections")
 
     def _promote_to_superedge(
@@ -272,11 +1018,9 @@ class _SummaryDynamicState:
         else:
             self.correction_minus.pop(pair_key, None)
         self.correction_plus.pop(pair_key, None)
-        total_corrections = sum(len(edges) for edges in self.correction_plus.values()) + \
-            sum(len(edges) for edges in self.correction_minus.values())
         self._log_change(
             f"Promoted {pair_key} to superedge; missing edges: {len(self.correction_minus.get(pair_key, set()))}. "
-            f"Totals -> superedges: {len(self.superedges)}, corrections: {total_corrections}"
+            f"Totals -> superedges: {len(self.superedges)}"
         )
 
     def _demote_superedge(
@@ -296,18 +1040,22 @@ class _SummaryDynamicState:
             self.correction_plus[pair_key] = positives
         else:
             self.correction_plus.pop(pair_key, None)
+            self._unindex_pair(pair_key)
         self.correction_minus.pop(pair_key, None)
-        total_corrections = sum(len(edges) for edges in self.correction_plus.values()) + \
-            sum(len(edges) for edges in self.correction_minus.values())
         self._log_change(
             f"Demoted {pair_key} to correction sets; positives retained: {len(self.correction_plus.get(pair_key, set()))}. "
-            f"Totals -> superedges: {len(self.superedges)}, corrections: {total_corrections}"
+            f"Totals -> superedges: {len(self.superedges)}"
         )
 
     def _possible_edges(self, super_u: str, super_v: str) -> int:
-        size_u = len(self.members[super_u])
-        size_v = len(self.members[super_v])
-        if super_u == super_v:
+        return self._possible_for_sizes(
+            len(self.members[super_u]),
+            len(self.members[super_v]),
+            super_u == super_v,
+        )
+
+    def _possible_for_sizes(self, size_u: int, size_v: int, same_supernode: bool) -> int:
+        if same_supernode:
             if size_u < 2:
                 return 0
             if self.directed:
@@ -330,38 +1078,356 @@ class _SummaryDynamicState:
                 for v in nodes_v:
                     yield (u, v)
 
+    # ------------------------------------------------------------------
+    # Structural maintenance
+    # ------------------------------------------------------------------
+    def _index_pair(self, pair_key: PairKey) -> None:
+        if self._pairs_by_super is None:
+            return
+        for supernode in pair_key:
+            self._pairs_by_super.setdefault(supernode, set()).add(pair_key)
+
+    def _unindex_pair(self, pair_key: PairKey) -> None:
+        if self._pairs_by_super is None:
+            return
+        for supernode in pair_key:
+            pairs = self._pairs_by_super.get(supernode)
+            if pairs is not None:
+                pairs.discard(pair_key)
+
+    def _pairs_of(self, supernode: str) -> Set[PairKey]:
+        assert self._pairs_by_super is not None
+        return self._pairs_by_super.get(supernode, set())
+
+    def _fresh_supernode_id(self, node: str) -> str:
+        candidate, suffix = node, 1
+        while candidate in self.members:
+            candidate = f"{node}~{suffix}"
+            suffix += 1
+        return candidate
+
+    def _admit_node(self, node: str) -> None:
+        supernode = self._fresh_supernode_id(node)
+        self._record_supernode(supernode)
+        self.members[supernode] = [node]
+        self.node_to_super[node] = supernode
+        self._admitted.add(supernode)
+        self._admitted_nodes.add(node)
+        self._membership_changed = True
+        self._log_change(f"Admitted new node {node} as singleton supernode {supernode}")
+
+    def _pair_edge_count(self, pair_key: PairKey) -> int:
+        if pair_key in self.superedges:
+            return self._possible_edges(*pair_key) - len(self.correction_minus.get(pair_key, ()))
+        return len(self.correction_plus.get(pair_key, ()))
+
+    def _pair_edges(self, pair_key: PairKey) -> Set[EdgeKey]:
+        if pair_key in self.superedges:
+            missing = self.correction_minus.get(pair_key, set())
+            return {
+                edge_key
+                for edge_key in (self._edge_key(*combo) for combo in self._iterate_pairs(*pair_key))
+                if edge_key not in missing
+            }
+        return set(self.correction_plus.get(pair_key, ()))
+
+    @staticmethod
+    def _encoding_cost(edge_count: int, possible: int) -> int:
+        """Superedge-plus-correction cost of a pair under the majority rule."""
+
+        if possible and edge_count > possible / 2:
+            return 1 + possible - edge_count
+        return edge_count
+
+    def _supernode_corrections(self, supernode: str) -> int:
+        return sum(
+            len(self.correction_plus.get(pair_key, ())) + len(self.correction_minus.get(pair_key, ()))
+            for pair_key in self._pairs_of(supernode)
+        )
+
+    def _should_split(self, supernode: str) -> bool:
+        assert self.policy is not None
+        size = len(self.members[supernode])
+        if size < 2:
+            return False
+        limit = max(self.policy.split_min_corrections, self.policy.split_corrections_per_member * size)
+        if self._supernode_corrections(supernode) <= limit:
+            return False
+        return self._split_reward(supernode) > 0
+
+    def _split_reward(self, supernode: str) -> int:
+        """Decrease in superedges plus corrections from splitting ``supernode`` into singletons.
+
+        Each pair with another supernode turns into one pair per member,
+        priced from that member's share of the pair's edges (read off the
+        correction sets, so dense pairs are not enumerated); every edge
+        inside ``supernode`` ends up in a singleton pair of its own.
+        """
+
+        members = self.members[supernode]
+        pairs = self._pairs_of(supernode)
+        reward = 0
+        for pair_key in pairs:
+            count = self._pair_edge_count(pair_key)
+            reward += self._encoding_cost(count, self._possible_edges(*pair_key))
+            if pair_key[0] == pair_key[1]:
+                reward -= count
+                continue
+            other_size = len(self.members[pair_key[1] if pair_key[0] == supernode else pair_key[0]])
+            dense = pair_key in self.superedges
+            corrections = self.correction_minus.get(pair_key, ()) if dense else self.correction_plus.get(pair_key, ())
+            per_member: Dict[str, int] = {}
+            for source, target in corrections:
+                end = source if self.node_to_super[source] == supernode else target
+                per_member[end] = per_member.get(end, 0) + 1
+            self._work += len(corrections)
+            if dense:
+                reward -= sum(self._encoding_cost(other_size - per_member.get(node, 0), other_size) for node in members)
+            else:
+                reward -= sum(self._encoding_cost(member_count, other_size) for member_count in per_member.values())
+        self._work += len(pairs)
+        return reward
+
+    def _restructure(self, old_supernodes: Sequence[str], new_groups: Dict[str, List[str]]) -> None:
+        """Replace ``old_supernodes`` with ``new_groups`` and re-encode every affected pair."""
+
+        affected: Set[PairKey] = set()
+        for supernode in old_supernodes:
+            affected.update(self._pairs_of(supernode))
+            self._record_supernode(supernode)
+        for supernode in new_groups:
+            self._record_supernode(supernode)
+
+        edges: Set[EdgeKey] = set()
+        for pair_key in affected:
+            for end in pair_key:
+                self._dense_profiles.pop(end, None)
+            self._record_pair(pair_key)
+            edges.update(self._pair_edges(pair_key))
+            self.superedges.discard(pair_key)
+            self.correction_plus.pop(pair_key, None)
+            self.correction_minus.pop(pair_key, None)
+            self._unindex_pair(pair_key)
+
+        for supernode in old_supernodes:
+            self.members.pop(supernode, None)
+            self._pairs_by_super.pop(supernode, None)  # type: ignore[union-attr]
+        for supernode, nodes in new_groups.items():
+            self.members[supernode] = nodes
+            for node in nodes:
+                self.node_to_super[node] = supernode
+        self._membership_changed = True
+
+        buckets: Dict[PairKey, Set[EdgeKey]] = {}
+        for source, target in edges:
+            pair_key = self._pair_key(self.node_to_super[source], self.node_to_super[target])
+            buckets.setdefault(pair_key, set()).add((source, target))
+
+        self._work += len(affected) + len(edges)
+        for pair_key, pair_edges in buckets.items():
+            for end in pair_key:
+                self._dense_profiles.pop(end, None)
+            self._record_pair(pair_key)
+            possible = self._possible_edges(*pair_key)
+            if possible and len(pair_edges) > possible / 2:
+                self.superedges.add(pair_key)
+                missing = {
+                    edge_key
+                    for edge_key in (self._edge_key(*combo) for combo in self._iterate_pairs(*pair_key))
+                    if edge_key not in pair_edges
+                }
+                if missing:
+                    self.correction_minus[pair_key] = missing
+            else:
+                self.correction_plus[pair_key] = pair_edges
+            self._index_pair(pair_key)
+
+    def _split_supernode(self, supernode: str) -> List[str]:
+        nodes = self.members[supernode]
+        corrections = self._supernode_corrections(supernode)
+        # Free the old id first so the member it was named after can keep it.
+        self.members.pop(supernode)
+        groups = {self._fresh_supernode_id(node): [node] for node in nodes}
+        self.members[supernode] = nodes
+        self._restructure([supernode], groups)
+        self._log_change(
+            f"Split supernode {supernode} ({len(nodes)} members, {corrections} corrections) into singletons"
+        )
+        return list(groups)
+
+    def _dense_profile(self, supernode: str) -> Dict[Tuple[int, int], int]:
+        """Majority-dense pairs of ``supernode`` with other supernodes, counted by (other size, edge count).
+
+        Growing ``supernode`` only changes the cost of these pairs, by an
+        amount that depends on nothing else, so merges into a hub are priced
+        without walking its pairs again. Profiles live for one ``maintain``
+        call; ``_restructure`` drops those of every supernode it re-encodes.
+        """
+
+        profile = self._dense_profiles.get(supernode)
+        if profile is None:
+            profile = {}
+            size = len(self.members[supernode])
+            pairs = self._pairs_of(supernode)
+            for pair_key in pairs:
+                super_u, super_v = pair_key
+                if super_u == super_v:
+                    continue
+                other_size = len(self.members[super_v if super_u == supernode else super_u])
+                count = self._pair_edge_count(pair_key)
+                if count > size * other_size / 2:
+                    profile[(other_size, count)] = profile.get((other_size, count), 0) + 1
+            self._work += len(pairs)
+            self._dense_profiles[supernode] = profile
+        return profile
+
+    @classmethod
+    def _growth_reward(cls, size: int, other_size: int, count: int, added: int) -> int:
+        """Cost change of a pair with ``count`` edges when its ``size`` end gains ``added`` members."""
+
+        return cls._encoding_cost(count, size * other_size) - cls._encoding_cost(count, (size + added) * other_size)
+
+    def _merge_reward(self, keep: str, absorb: str) -> int:
+        """Decrease in superedges plus corrections from merging ``absorb`` into ``keep``.
+
+        This is the quantity ``PoligrasRunner.update_graph`` scores merges by,
+        evaluated from pair edge counts instead of the training supergraph.
+        Only the end with fewer pairs is walked; the other end's pairs are
+        priced from its dense profile, since its sparse pairs cost the same
+        after the merge unless the walked end shares them.
+        """
+
+        if len(self._pairs_of(absorb)) > len(self._pairs_of(keep)):
+            keep, absorb = absorb, keep
+        size_k, size_a = len(self.members[keep]), len(self.members[absorb])
+        profile = self._dense_profile(keep)
+        reward = sum(
+            times * self._growth_reward(size_k, other_size, count, size_a)
+            for (other_size, count), times in profile.items()
+        )
+
+        pairs = self._pairs_of(absorb)
+        self._work += len(pairs) + len(profile)
+        for pair_key in pairs:
+            if keep in pair_key or pair_key[0] == pair_key[1]:
+                continue
+            other_size = len(self.members[pair_key[1] if pair_key[0] == absorb else pair_key[0]])
+            counterpart = self._pair_key(*(keep if end == absorb else end for end in pair_key))
+            count_a = self._pair_edge_count(pair_key)
+            count_k = self._pair_edge_count(counterpart)
+            reward += (
+                self._encoding_cost(count_a, size_a * other_size)
+                + self._encoding_cost(count_k, size_k * other_size)
+                - self._encoding_cost(count_a + count_k, (size_k + size_a) * other_size)
+            )
+            if count_k > size_k * other_size / 2:
+                # The profile already priced this pair as if ``absorb`` had no edges in it.
+                reward -= self._growth_reward(size_k, other_size, count_k, size_a)
+
+        # Pairs between and within the two collapse into the merged self pair.
+        inner_count = 0
+        for pair_key in {self._pair_key(end_u, end_v) for end_u in (keep, absorb) for end_v in (keep, absorb)}:
+            count = self._pair_edge_count(pair_key)
+            inner_count += count
+            reward += self._encoding_cost(count, self._possible_edges(*pair_key))
+            if pair_key[0] != pair_key[1] and count > size_k * size_a / 2:
+                reward -= self._growth_reward(size_k, size_a, count, size_a)
+        merged = size_k + size_a
+        return reward - self._encoding_cost(inner_count, self._possible_for_sizes(merged, merged, True))
+
+    def _merge_candidates(self, supernode: str) -> List[str]:
+        """Neighbouring supernodes ranked by how many neighbours they share with ``supernode``.
+
+        Neighbours are expanded lowest degree first until ``max_candidate_scan``
+        pairs have been walked: a hub neighbours everything, so it says the
+        least about ``supernode`` and costs the most to expand.
+        """
+
+        assert self.policy is not None
+        pairs = self._pairs_of(supernode)
+        neighbours = {end for pair_key in pairs for end in pair_key} - {supernode}
+        shared: Dict[str, int] = {neighbour: 1 for neighbour in neighbours}
+        budget = self.policy.max_candidate_scan
+        for neighbour in sorted(neighbours, key=lambda end: (len(self._pairs_of(end)), end)):
+            neighbour_pairs = self._pairs_of(neighbour)
+            if len(neighbour_pairs) > budget:
+                break
+            budget -= len(neighbour_pairs)
+            for pair_key in neighbour_pairs:
+                for end in pair_key:
+                    if end != supernode and end != neighbour:
+                        shared[end] = shared.get(end, 0) + 1
+        self._work += len(pairs) + self.policy.max_candidate_scan - budget
+        ranked = sorted(shared.items(), key=lambda item: (-item[1], item[0]))
+        return [candidate for candidate, _ in ranked[: self.policy.max_merge_candidates]]
+
+    def _remerge_locally(self, seeds: Set[str]) -> None:
+        assert self.policy is not None
+        queue = sorted(seeds, reverse=True)
+        merges = 0
+        while queue and merges < self.policy.max_merges:
+            if self._work >= self.policy.max_work_per_batch:
+                # Out of budget for this batch; the rest is picked up by the next call.
+                self._admitted.update(supernode for supernode in queue if supernode in self.members)
+                self._log_change(f"Deferred re-merging of {len(queue)} supernodes after {self._work} pair visits")
+                return
+            supernode = queue.pop()
+            if supernode not in self.members:
+                continue
+            best, best_reward = None, 0
+            for candidate in self._merge_candidates(supernode):
+                reward = self._merge_reward(candidate, supernode)
+                if reward > best_reward:
+                    best, best_reward = candidate, reward
+            if best is None:
+                continue
+            # Keep the larger supernode's id so existing references stay stable.
+            keep, absorb = (best, supernode) if len(self.members[best]) >= len(self.members[supernode]) else (supernode, best)
+            self._restructure([keep, absorb], {keep: self.members[keep] + self.members[absorb]})
+            merges += 1
+            self._log_change(f"Merged supernode {absorb} into {keep}; reward {best_reward}")
+            queue.append(keep)
+
     def _log_change(self, message: str) -> None:
         logger.info("[DynamicUpdates] %s", message)
 
     def _build_summary_edges(self) -> List[SummaryEdge]:
         edges: List[SummaryEdge] = []
         for pair in sorted(self.superedges):
-            super_u, super_v = pair
-            possible = self._possible_edges(super_u, super_v)
-            if possible == 0:
-                continue
-            missing = len(self.correction_minus.get(pair, set()))
-            actual = possible - missing
-            density = (actual / possible) if possible else 0.0
-            edges.append({
-                "source": super_u,
-                "target": super_v,
-                "weight": float(actual),
-                "density": float(density),
-            })
+            edge = self._superedge_entry(pair)
+            if edge is not None:
+                edges.append(edge)
         return edges
 
+    def _superedge_entry(self, pair: PairKey) -> Optional[SummaryEdge]:
+        if pair not in self.superedges:
+            return None
+        super_u, super_v = pair
+        possible = self._possible_edges(super_u, super_v)
+        if possible == 0:
+            return None
+        missing = len(self.correction_minus.get(pair, set()))
+        actual = possible - missing
+        density = (actual / possible) if possible else 0.0
+        return {
+            "source": super_u,
+            "target": super_v,
+            "weight": float(actual),
+            "density": float(density),
+        }
+
     def _build_stats(
         self,
         previous_stats: Dict,
         positive_count: Optional[int] = None,
         negative_count: Optional[int] = None,
+        superedge_count: Optional[int] = None,
     ) -> Dict:
         initial_stats = previous_stats.get("initial", {})
         initial_nodes = int(initial_stats.get("nodes", 0))
         initial_edges = int(initial_stats.get("edges", 0))
         summary_supernodes = len(self.members)
-        summary_superedges = len(self.superedges)
+        summary_superedges = len(self.superedges) if superedge_count is None else superedge_count
         if positive_count is None:
             positive_count = sum(len(edges) for edges in self.correction_plus.values())
         if negative_count is None:
@@ -390,15 +1456,17 @@ class _SummaryDynamicState:
             stats["avg_supernode_size"] = initial_nodes / summary_supernodes
         return stats
 
-    def _build_edge_index(self, edges: List[Dict[str, str]]) -> Dict[PairKey, Set[EdgeKey]]:
-        index: Dict[PairKey, Set[EdgeKey]] = {}
-        for entry in edges:
+    @staticmethod
+    def _endpoints(entries: List[Dict[str, str]]) -> Iterator[EdgeKey]:
+        for entry in entries:
             raw_source = entry.get("source")
             raw_target = entry.get("target")
-            if raw_source is None or raw_target is None:
-                continue
-            source = str(raw_source)
-            target = str(raw_target)
+            if raw_source is not None and raw_target is not None:
+                yield str(raw_source), str(raw_target)
+
+    def _build_edge_index(self, edges: Iterable[EdgeKey]) -> Dict[PairKey, Set[EdgeKey]]:
+        index: Dict[PairKey, Set[EdgeKey]] = {}
+        for source, target in edges:
             if source not in self.node_to_super or target not in self.node_to_super:
                 continue
             super_u = self.node_to_super[source]
@@ -407,15 +1475,9 @@ class _SummaryDynamicState:
             index.setdefault(pair_key, set()).add(self._edge_key(source, target))
         return index
 
-    def _build_superedge_set(self, summary_edges: List[Dict[str, str]]) -> Set[PairKey]:
+    def _build_superedge_set(self, summary_edges: Iterable[EdgeKey]) -> Set[PairKey]:
         pairs: Set[PairKey] = set()
-        for edge in summary_edges:
-            raw_source = edge.get("source")
-            raw_target = edge.get("target")
-            if raw_source is None or raw_target is None:
-                continue
-            source = str(raw_source)
-            target = str(raw_target)
+        for source, target in summary_edges:
             pairs.add(self._pair_key(source, target))
         return pairs
 
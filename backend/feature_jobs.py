@@ -0,0 +1,237 @@
+"""Dataset preparation (graph ingestion and node features) off the event loop.
+
+Uploads hand their edge lists and feature generation to a ``FeaturePool``,
+a bounded pool of worker processes, so neither competes with request
+handling for the GIL. Each dataset's readiness is kept in
+``<dataset>/.features.json`` (``pending`` -> ``ready`` or ``failed``),
+which is written before the upload returns. It is shared by every process,
+so ``run_poligras`` blocks in ``wait_for_features`` until the features a
+pending upload will produce exist, instead of failing on a missing
+``_feat`` file.
+
+Features are cached by graph content: ``ensure_features`` keys them by the
+CSR graph's digest and the generator options (feature mode and width, see
+``feature_options``), and links a cached
+``backend/dataset/.feature-cache/<key>`` into the dataset instead of
+generating again. The entries are hard links, like the run cache's.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing as mp
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence
+
+from backend.atomic_files import link_or_copy, write_json_atomic
+from backend.node_feature_generation import FEATURE_MODES, feature_options
+
+logger = logging.getLogger(__name__)
+
+FEATURE_STATE_NAME = ".features.json"
+FEATURE_CACHE_DIR_NAME = ".feature-cache"
+UPLOADS_DIR_NAME = ".uploads"
+# How long a run waits for features still being prepared.
+WAIT_TIMEOUT = 6 * 60 * 60
+
+
+class FeaturesUnavailableError(RuntimeError):
+    """Raised when a dataset's features failed, or will never become ready."""
+
+
+def features_path(dataset_dir: Path) -> Path:
+    return dataset_dir / f"{dataset_dir.name}_feat"
+
+
+def feature_key(dataset_dir: Path, options: Optional[Dict] = None) -> str:
+    """Cache key of the features ``feature_generator`` makes from the dataset's graph with ``options``."""
+
+    from backend.run_cache import graph_digest
+
+    material = {"graph": graph_digest(dataset_dir, dataset_dir.name), "options": options or {}}
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def ensure_features(dataset_dir: Path, options: Optional[Dict] = None) -> Path:
+    """Write the dataset's ``_feat`` file from the feature cache, generating and caching it on a miss.
+
+    ``options`` default to ``feature_options()`` (the configured feature mode).
+    """
+
+    from backend.node_feature_generation import feature_generator
+
+    options = options or feature_options()
+    cache = dataset_dir.parent / FEATURE_CACHE_DIR_NAME
+    entry = cache / feature_key(dataset_dir, options)
+    target = features_path(dataset_dir)
+    if entry.exists():
+        link_or_copy(entry, target)
+        logger.info("Reusing cached features %s for %s", entry.name, dataset_dir.name)
+        return target
+    feature_generator(dataset_dir.name, **options)
+    cache.mkdir(parents=True, exist_ok=True)
+    link_or_copy(target, entry)
+    return target
+
+
+def clear_feature_cache(datasets_root: Path) -> int:
+    """Remove every cached feature file; returns how many were removed."""
+
+    cache = datasets_root / FEATURE_CACHE_DIR_NAME
+    if not cache.exists():
+        return 0
+    entries = [entry for entry in cache.iterdir() if not entry.name.startswith(".")]
+    for entry in entries:
+        entry.unlink(missing_ok=True)
+    return len(entries)
+
+
+def read_state(dataset_dir: Path) -> Optional[Dict]:
+    """Readiness record of a dataset, or None if its features were never scheduled."""
+
+    try:
+        with (dataset_dir / FEATURE_STATE_NAME).open("r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_state(dataset_dir: Path, status: str, error: Optional[str] = None) -> None:
+    write_json_atomic(
+        dataset_dir / FEATURE_STATE_NAME,
+        {"status": status, "error": error, "pid": os.getpid(), "updated_at": time.time()},
+    )
+
+
+def _owner_alive(state: Dict) -> bool:
+    try:
+        os.kill(int(state["pid"]), 0)
+    except PermissionError:
+        return True
+    except (OSError, KeyError, TypeError, ValueError):
+        return False
+    return True
+
+
+def prepare_dataset(dataset_dir: Path, sources: Sequence[Path] = (), generate_features: bool = True) -> None:
+    """Worker target: ingest ``sources`` into the dataset's CSR graph, then make its features."""
+
+    from backend.csr_graph import csr_path_for
+    from backend.graph_ingest import ingest_edge_lists
+
+    try:
+        if sources:
+            ingest_edge_lists(list(sources), csr_path_for(dataset_dir, dataset_dir.name))
+            shutil.rmtree(dataset_dir / UPLOADS_DIR_NAME, ignore_errors=True)
+        if generate_features:
+            ensure_features(dataset_dir)
+    except BaseException as exc:
+        _write_state(dataset_dir, "failed", f"{type(exc).__name__}: {exc}")
+        raise
+    _write_state(dataset_dir, "ready")
+
+
+def wait_for_features(dataset_dir: Path, timeout: Optional[float] = WAIT_TIMEOUT, poll_interval: float = 0.25) -> Path:
+    """Block until the dataset's ``_feat`` file is ready and return its path.
+
+    Features that were never scheduled (datasets placed on disk by hand)
+    are generated here, through the cache. Raises
+    ``FeaturesUnavailableError`` if preparation failed, was interrupted
+    before the graph existed, or outlasted ``timeout`` seconds.
+    """
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    target = features_path(dataset_dir)
+    while True:
+        state = read_state(dataset_dir)
+        status = state["status"] if state else None
+        if status == "ready" or (status is None and target.exists()):
+            return target
+        if status == "failed":
+            raise FeaturesUnavailableError(f"Feature preparation failed for {dataset_dir.name}: {state['error']}")
+        if status is None or not _owner_alive(state):
+            # Nothing will produce them: the process that scheduled them is gone.
+            try:
+                return ensure_features(dataset_dir)
+            except FileNotFoundError as exc:
+                raise FeaturesUnavailableError(f"No graph to generate features from: {exc}") from None
+        if deadline is not None and time.monotonic() >= deadline:
+            raise FeaturesUnavailableError(f"Timed out waiting for the features of {dataset_dir.name}")
+        time.sleep(poll_interval)
+
+
+class FeaturePool:
+    """Bounded process pool preparing uploaded datasets; ``on_done(dataset)`` runs after each."""
+
+    def __init__(self, datasets_root: Path, max_workers: int = 1, on_done: Optional[Callable[[str], None]] = None):
+        self.datasets_root = datasets_root
+        self.max_workers = max_workers
+        self._on_done = on_done
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def submit(self, dataset: str, sources: Sequence[Path] = (), generate_features: bool = True) -> Future:
+        """Mark ``dataset`` pending and queue its preparation."""
+
+        dataset_dir = self.datasets_root / dataset
+        _write_state(dataset_dir, "pending")
+        with self._lock:
+            if self._executor is None:
+                # Started lazily, so importing the API spawns nothing.
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=mp.get_context("spawn"))
+            future = self._executor.submit(prepare_dataset, dataset_dir, list(sources), generate_features)
+        future.add_done_callback(lambda done: self._finished(dataset, done))
+        logger.info("Queued feature preparation for %s", dataset)
+        return future
+
+    def _finished(self, dataset: str, future: Future) -> None:
+        error = future.exception()
+        if error is not None:
+            logger.error("Feature preparation for %s failed: %s", dataset, error)
+            if isinstance(error, BrokenProcessPool):
+                # The worker died without recording the failure; the next submit starts a fresh pool.
+                _write_state(self.datasets_root / dataset, "failed", f"Worker process died: {error}")
+                with self._lock:
+                    self._executor = None
+        if self._on_done is not None:
+            self._on_done(dataset)
+
+    def status(self, dataset: str) -> Optional[Dict]:
+        state = read_state(self.datasets_root / dataset)
+        if state is not None:
+            state = {key: state[key] for key in ("status", "error", "updated_at")}
+        return state
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a dataset's node features through the feature cache.")
+    parser.add_argument("datasets", nargs="*", help="Dataset folders under backend/dataset")
+    parser.add_argument("--mode", choices=FEATURE_MODES, default=None, help="Feature mode (default: POLIGRAS_FEATURE_MODE or histogram)")
+    parser.add_argument("--dim", type=int, default=None, help="Width of hashed / projection features")
+    parser.add_argument("--clear", action="store_true", help="Remove all cached feature files")
+    args = parser.parse_args()
+
+    datasets_root = Path(__file__).resolve().parent / "dataset"
+    if args.clear:
+        print(f"Removed {clear_feature_cache(datasets_root)} cached feature files")
+    for dataset in args.datasets:
+        print(f"{dataset}: {ensure_features(datasets_root / dataset, feature_options(args.mode, args.dim))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,10 @@ Generate sample edge updates from output.json for testing the edge update pipeli
 """
 
 import json
-import random
 from pathlib import Path
 
+from backend.update_workload import WorkloadGenerator, WorkloadSpec
+
 def generate_edge_updates(output_path: str, num_updates: int = 20, insert_only: bool = False) -> dict:
     """
     Read output.json and generate a sample edge update file.
@@ -19,61 +20,18 @@ def generate_edge_updates(output_path: str, num_updates: int = 20, insert_only:
     """
     with open(output_path, 'r') as f:
         output = json.load(f)
-    
-    # Get initial graph info
-    initial_graph = output['graphs']['initial']
-    nodes = [n['id'] for n in initial_graph['nodes']]
-    existing_edges = set()
-    
-    # Build set of existing edges
-    for edge in initial_graph['edges']:
-        u, v = edge['source'], edge['target']
-        # Store as sorted tuple for undirected graph
-        existing_edges.add((min(u, v), max(u, v)))
-    
-    print(f"Graph has {len(nodes)} nodes and {len(existing_edges)} edges")
-    
-    updates = []
-    
-    # Generate a mix of insertions and deletions (or insert-only when requested)
-    if insert_only:
-        num_inserts = num_updates
-        num_deletes = 0
-    else:
-        num_inserts = num_updates // 2
-        num_deletes = num_updates - num_inserts
-    
-    # Generate INSERT updates (edges that don't exist)
-    insert_count = 0
-    attempts = 0
-    while insert_count < num_inserts and attempts < 1000:
-        u = random.choice(nodes)
-        v = random.choice(nodes)
-        if u != v:
-            edge_key = (min(u, v), max(u, v))
-            if edge_key not in existing_edges:
-                updates.append({
-                    "type": "insert",
-                    "u": u,
-                    "v": v
-                })
-                insert_count += 1
-        attempts += 1
-    
-    # Generate DELETE updates (edges that exist)
-    edge_list = list(existing_edges)
-    random.shuffle(edge_list)
-    for i in range(min(num_deletes, len(edge_list))):
-        u, v = edge_list[i]
-        updates.append({
-            "type": "delete",
-            "u": u,
-            "v": v
-        })
-    
-    # Shuffle to interleave inserts and deletes
-    random.shuffle(updates)
-    
+
+    # Nodes come from the supernode membership and deletions from the live
+    # edge pool, so there is no cap on insertion attempts. See
+    # update_workload.py for skewed mixes and multi-million update streams.
+    generator = WorkloadGenerator(output, WorkloadSpec(insert_ratio=1.0 if insert_only else 0.5))
+    print(f"Graph has {len(generator.nodes)} nodes and {len(generator.live)} edges")
+
+    updates = [
+        {"type": "insert" if update.operation == "add" else "delete", "u": update.source, "v": update.target}
+        for update in generator.take(num_updates)
+    ]
+
     print(f"Generated {len(updates)} updates:")
     print(f"  - Insertions: {sum(1 for u in updates if u['type'] == 'insert')}")
     print(f"  - Deletions: {sum(1 for u in updates if u['type'] == 'delete')}")
@@ -0,0 +1,299 @@
+"""Streaming ingestion of uploaded edge lists into CSR graphs.
+
+Accepted sources, recognised by file name:
+
+* SNAP-style edge lists (``.txt``, ``.edges``, ``.el``, ``.snap``,
+  ``.tsv``): one ``source target [...]`` pair per line, ``#``/``%``
+  comments, extra columns (weights, timestamps) ignored;
+* CSV (``.csv``): the first two columns, with ``,``, ``;`` or tab
+  delimiters and an optional header row;
+* ``graph-txt`` adjacency lists: line ``i`` lists the neighbours of node
+  ``i`` (the format read by ``networkx_graph_generation.py``);
+* archives (``.zip``, ``.tar``, ``.tar.gz``, ``.tgz``) and single ``.gz``
+  files holding any of the above.
+
+Sources are read line by line and edges are spilled to disk in fixed-size
+chunks while node ids are mapped to dense rows, so memory stays bounded by
+the node map and one chunk until the CSR is built. Counts for the stats
+are taken during the same pass. Nothing is unpickled.
+
+Uploads are untrusted, so an archive bomb must not fill the disk or the
+memory: ingestion stops with ``GraphFormatError`` once the decompressed
+bytes read exceed ``MAX_DECOMPRESSED_BYTES`` (``POLIGRAS_MAX_GRAPH_BYTES``)
+or the edges read exceed ``MAX_EDGES`` (``POLIGRAS_MAX_GRAPH_EDGES``).
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import gzip
+import io
+import itertools
+import logging
+import os
+import shutil
+import tarfile
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path, PurePosixPath
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.csr_graph import CSRGraph, NodeIds, build_csr, write_csr
+
+logger = logging.getLogger(__name__)
+
+EDGE_LIST_SUFFIXES = (".txt", ".edges", ".el", ".snap", ".tsv", ".csv", ".graph-txt")
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".gz")
+CHUNK_EDGES = 1 << 20
+MAX_DECOMPRESSED_BYTES = int(os.environ.get("POLIGRAS_MAX_GRAPH_BYTES", 16 << 30))
+MAX_EDGES = int(os.environ.get("POLIGRAS_MAX_GRAPH_EDGES", 200_000_000))
+
+_CSV_HEADERS = {"source", "target", "src", "dst", "from", "to", "u", "v", "node1", "node2", "id1", "id2"}
+
+
+class GraphFormatError(ValueError):
+    """Raised when an upload holds no readable edges."""
+
+
+def _suffix(name: str) -> str:
+    lowered = name.lower()
+    for suffix in ARCHIVE_SUFFIXES + EDGE_LIST_SUFFIXES:
+        if lowered.endswith(suffix):
+            return suffix
+    return ""
+
+
+def is_graph_source(name: str) -> bool:
+    """Whether ``name`` is an edge list or archive this module can ingest."""
+
+    return _suffix(name) != ""
+
+
+def _edge_format(name: str) -> Optional[str]:
+    suffix = _suffix(name)
+    if suffix == ".graph-txt":
+        return "graph-txt"
+    if suffix == ".csv":
+        return "csv"
+    if suffix in EDGE_LIST_SUFFIXES:
+        return "edges"
+    return None
+
+
+@contextmanager
+def _opened(path: Path) -> Iterator[Iterator[Tuple[str, IO[bytes]]]]:
+    """The edge-list streams of one source as ``(name, binary stream)`` pairs."""
+
+    suffix = _suffix(path.name)
+    if suffix == ".zip":
+        with zipfile.ZipFile(path) as archive:
+            yield (
+                (info.filename, archive.open(info))
+                for info in archive.infolist()
+                if not info.is_dir() and not info.filename.startswith("__MACOSX/")
+            )
+    elif suffix in (".tar", ".tar.gz", ".tgz"):
+        with tarfile.open(path, "r:*") as archive:
+            # Members are read straight from the archive; nothing is extracted to disk.
+            yield ((member.name, archive.extractfile(member)) for member in archive if member.isfile())
+    elif suffix == ".gz":
+        with gzip.open(path, "rb") as stream:
+            yield iter([(path.name[: -len(".gz")], stream)])
+    else:
+        with path.open("rb") as stream:
+            yield iter([(path.name, stream)])
+
+
+class _BoundedReader(io.RawIOBase):
+    """Binary stream that raises ``GraphFormatError`` once a shared byte budget is used up."""
+
+    def __init__(self, stream: IO[bytes], budget: Dict):
+        self._stream = stream
+        self._budget = budget
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._stream.read(len(buffer))
+        self._budget["remaining"] -= len(data)
+        if self._budget["remaining"] < 0:
+            raise GraphFormatError(
+                f"Uploaded graph exceeds {self._budget['limit']} bytes once decompressed"
+            )
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def _edges_lines(lines: Iterable[str], counts: Dict) -> Iterator[Tuple[str, str]]:
+    for line in lines:
+        counts["lines"] += 1
+        fields = line.split()
+        if not fields or fields[0][0] in "#%":
+            continue
+        if len(fields) < 2:
+            counts["skipped_lines"] += 1
+            continue
+        yield fields[0], fields[1]
+
+
+def _csv_lines(lines: Iterable[str], counts: Dict) -> Iterator[Tuple[str, str]]:
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return
+    delimiter = max((",", ";", "\t"), key=first.count)
+    for position, row in enumerate(csv.reader(itertools.chain([first], lines), delimiter=delimiter)):
+        counts["lines"] += 1
+        if not row or row[0].lstrip().startswith("#"):
+            continue
+        if len(row) < 2:
+            counts["skipped_lines"] += 1
+            continue
+        source, target = row[0].strip(), row[1].strip()
+        if position == 0 and {source.lower(), target.lower()} <= _CSV_HEADERS:
+            continue
+        yield source, target
+
+
+def _graph_txt_lines(lines: Iterable[str], counts: Dict) -> Iterator[Tuple[str, str]]:
+    for node, line in enumerate(lines):
+        counts["lines"] += 1
+        source = str(node)
+        for neighbour in line.split():
+            yield source, neighbour
+
+
+_READERS = {"edges": _edges_lines, "csv": _csv_lines, "graph-txt": _graph_txt_lines}
+
+
+class _EdgeSpill:
+    """Dense row numbering of node ids, with edges appended to a raw int64 file."""
+
+    def __init__(self, path: Path, max_edges: int = MAX_EDGES):
+        self.path = path
+        self.max_edges = max_edges
+        self.rows: Dict = {}
+        self.edges = 0
+        self._buffer: List[int] = []
+        self._handle = path.open("wb")
+
+    def _row(self, token: str) -> int:
+        try:
+            key = int(token)
+        except ValueError:
+            key = token
+        row = self.rows.get(key)
+        if row is None:
+            row = self.rows[key] = len(self.rows)
+        return row
+
+    def add(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        added = 0
+        buffer = self._buffer
+        room = self.max_edges - self.edges
+        try:
+            for source, target in pairs:
+                if added == room:
+                    raise GraphFormatError(f"Uploaded graph has more than {self.max_edges} edges")
+                buffer.append(self._row(source))
+                buffer.append(self._row(target))
+                added += 1
+                if len(buffer) >= 2 * CHUNK_EDGES:
+                    self.flush()
+        finally:
+            self.edges += added
+        return added
+
+    def flush(self) -> None:
+        if self._buffer:
+            np.asarray(self._buffer, dtype=np.int64).tofile(self._handle)
+            self._buffer.clear()
+
+    def close(self) -> np.ndarray:
+        self.flush()
+        self._handle.close()
+        if self.edges == 0:
+            return np.zeros((0, 2), dtype=np.int64)
+        return np.memmap(self.path, dtype=np.int64, mode="r").reshape(-1, 2)
+
+    def node_ids(self) -> NodeIds:
+        keys = list(self.rows)
+        if all(isinstance(key, int) for key in keys):
+            return np.asarray(keys, dtype=np.int64)
+        return [str(key) for key in keys]
+
+
+def ingest_edge_lists(
+    sources: Sequence[Path],
+    target: Path,
+    max_bytes: int = MAX_DECOMPRESSED_BYTES,
+    max_edges: int = MAX_EDGES,
+) -> CSRGraph:
+    """Parse ``sources`` into one undirected CSR graph published at ``target``.
+
+    Raises ``GraphFormatError`` if no source yields an edge, or if the
+    sources decompress to more than ``max_bytes`` or hold more than
+    ``max_edges`` edges.
+    """
+
+    scratch = target.with_name(f".{target.name}.ingest")
+    shutil.rmtree(scratch, ignore_errors=True)
+    scratch.mkdir(parents=True)
+    try:
+        spill = _EdgeSpill(scratch / "edges.bin", max_edges)
+        budget = {"limit": max_bytes, "remaining": max_bytes}
+        counts = {"lines": 0, "skipped_lines": 0}
+        read: List[Dict] = []
+        try:
+            for source in sources:
+                with _opened(source) as streams:
+                    for name, stream in streams:
+                        edge_format = _edge_format(PurePosixPath(name).name)
+                        if edge_format is None:
+                            logger.info("Skipping %s in %s: not an edge list", name, source.name)
+                            continue
+                        bounded = io.BufferedReader(_BoundedReader(stream, budget), 1 << 16)
+                        text = io.TextIOWrapper(bounded, encoding="utf-8", errors="replace", newline=None)
+                        edges = spill.add(_READERS[edge_format](text, counts))
+                        read.append({"name": name, "format": edge_format, "edges": edges})
+        finally:
+            pairs = spill.close()
+
+        if spill.edges == 0:
+            raise GraphFormatError("No edges found in the uploaded files")
+        built = build_csr(pairs, len(spill.rows))
+        del pairs
+        return write_csr(
+            target,
+            built["indptr"],
+            built["indices"],
+            spill.node_ids(),
+            {
+                **counts,
+                "edges_read": spill.edges,
+                "self_loops": built["self_loops"],
+                "duplicate_edges": built["duplicate_edges"],
+                "sources": read,
+            },
+            self_loop_rows=built["self_loop_rows"],
+        )
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert edge lists or archives into a CSR graph directory.")
+    parser.add_argument("sources", nargs="+", type=Path)
+    parser.add_argument("--output", type=Path, required=True, help="CSR directory to write")
+    args = parser.parse_args()
+
+    graph = ingest_edge_lists(args.sources, args.output)
+    print(f"{graph.num_nodes} nodes, {graph.num_edges} edges written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
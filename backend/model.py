@@ -1,15 +1,17 @@
-import glob
-import os
 import torch
 import random
 import copy
 import pickle
+import shutil
+import tempfile
 import numpy as np
-import networkx as nx
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Tuple
 
+from backend.atomic_files import atomic_write
+from backend.csr_graph import open_dataset_graph
+from backend.supergraph import SuperGraph
 from backend.output_types import (
     Meta,
     PoligrasOutput,
@@ -74,15 +76,20 @@ class PoligrasRunner(object):
                 f"Dataset assets for '{self.args.dataset}' not found at {self.dataset_dir.resolve()}"
             )
 
-        ## load graph structure
-        graph_path = self.dataset_dir / f"{self.args.dataset}_graph"
-        with graph_path.open('rb') as g_file:
-            loaded_graph = pickle.load(g_file)
-        self.init_graph = loaded_graph['G']
-
-        # cache initial counts and initialize per-merge timeline container
-        self.initial_node_count = self.init_graph.number_of_nodes()
-        self.initial_edge_count = self.init_graph.number_of_edges()
+        ## load graph structure: the initial graph stays a memory-mapped CSR graph (see csr_graph.py), read-only;
+        ## the supergraph being merged only holds the rows merges changed (see supergraph.py)
+        self.graph = open_dataset_graph(self.dataset_dir, self.args.dataset)
+        self.directed = self.graph.directed
+        ## initial node ids; graphs with non-integer ids are run on their row numbers
+        node_ids = self.graph.node_ids
+        self.node_ids = node_ids if isinstance(node_ids, np.ndarray) else np.arange(self.graph.num_nodes)
+        initial_nodes = self.node_ids.tolist()
+
+        # cache initial counts and initialize per-merge timeline container;
+        # self-loops are kept out of the CSR rows (see csr_graph.py), so they are counted from the graph's stats
+        self.self_loop_count = int(self.graph.stats.get('self_loops', 0))
+        self.initial_node_count = self.graph.num_nodes
+        self.initial_edge_count = self.graph.num_edges + self.self_loop_count
         self.timeline: List[Dict] = []
 
         ## load node features
@@ -96,54 +103,141 @@ class PoligrasRunner(object):
 
         init_superNodes_dict = {} ## each initial node belongs to the supernode of its own
         self.node_belonging = {} ## to record which supernode one specific initial node belongs to
-        for node in self.init_graph.nodes():
+        for node in initial_nodes:
             init_superNodes_dict[node] = [node] ## initially each supernode only has one initial node
             self.node_belonging[node] = node
 
 
-        ij = 0
-        self.init_nd_idx = {} ## to record the index of initial nodes
-        for nd in self.init_graph.nodes():
-            self.init_nd_idx[nd] = ij
-            ij += 1
+        self.init_nd_idx = {nd: ij for ij, nd in enumerate(initial_nodes)} ## to record the index (CSR row) of initial nodes
+        self.neighbour_sets = {}
+        self.initial_nodes = initial_nodes
+
+        ## optionally start from an earlier partition ("warm_start": {supernode: [initial nodes]}) instead of singletons
+        init_supergraph = self.new_supergraph()
+        if getattr(self.args, 'warm_start', None):
+            init_superNodes_dict, warm_changes = self.warm_start_supergraph(self.args.warm_start)
+            init_supergraph.restore(warm_changes)
 
         ## compute the initial group partitioning(index)
-        self.num_partitions = self.init_graph.number_of_nodes()//self.args.group_size
+        self.num_partitions = len(init_superNodes_dict)//self.args.group_size
+        init_groupIndex = self.partition_groups(init_superNodes_dict) ## to store the initial nodes indices contained in each group
+
+        # print('index size: ', len(init_groupIndex))
+        self.best_superNodes_dict = init_superNodes_dict
+        
+        ## store the data for the following use: checkpoints go to a private directory under the dataset dir, and hold the
+        ## membership and the supergraph's changes over the initial graph
+        self.checkpoint_dir = Path(tempfile.mkdtemp(prefix='.best_temp-', dir=self.dataset_dir))
+        self.save_checkpoint(0, init_supergraph, init_groupIndex, init_superNodes_dict)
+
+
+    def new_supergraph(self):
+        ## the initial graph as a supergraph: every initial node its own supernode, every edge a superedge of weight 1
+        return SuperGraph(self.graph, self.initial_nodes, self.init_nd_idx)
+
+
+    def checkpoint_path(self, count):
+        return self.checkpoint_dir / '{}_{}_.best_temp'.format(self.args.dataset, count)
 
-        h_function = list(range(self.init_graph.number_of_nodes()))
-        random.shuffle(h_function)
 
+    def save_checkpoint(self, count, supergraph, group_index, superNodes_dict):
+        with atomic_write(self.checkpoint_path(count), 'wb') as f:
+            pickle.dump({'changes':supergraph.changes(), 'group_index':group_index, 'superNodes_dict':superNodes_dict}, f)
 
-        F_A_dict = {}
-        for A in init_superNodes_dict:
-            F_A = self.init_graph.number_of_nodes()
-            for v in init_superNodes_dict[A]:
-                f_v = self.init_graph.number_of_nodes()
-                for u in list(self.init_graph[v]) + [v]:
-                    if(h_function[self.init_nd_idx[int(u)]] < f_v):
-                        f_v = h_function[self.init_nd_idx[int(u)]]
 
-                if(f_v < F_A):
-                    F_A = f_v
+    def load_checkpoint(self, count):
+        with self.checkpoint_path(count).open('rb') as g_file:
+            loaded_compre = pickle.load(g_file)
+        supergraph = self.new_supergraph()
+        supergraph.restore(loaded_compre['changes'])
+        return supergraph, loaded_compre['group_index'], loaded_compre['superNodes_dict']
 
-            F_A_dict[A] = F_A
+
+    def neighbours(self, node):
+        ## initial-graph neighbours (successors if directed) of an initial node, read from the CSR graph
+        return self.node_ids[self.graph.neighbours(self.init_nd_idx[node])].tolist()
+
+
+    def neighbour_set(self, node):
+        ## neighbours as a set for pair lookups; kept once built, since every merge's timeline snapshot revisits them
+        neighbours = self.neighbour_sets.get(node)
+        if neighbours is None:
+            neighbours = self.neighbour_sets[node] = set(self.neighbours(node))
+        return neighbours
+
+
+    def partition_groups(self, superNodes_dict):
+        ## group partitioning by min-hashing: supernodes are ordered by the smallest hash over their members' closed
+        ## neighbourhoods and cut into "num_partitions" groups of consecutive supernodes
+        h_function = list(range(self.graph.num_nodes))
+        random.shuffle(h_function)
+        h_function = np.asarray(h_function)
+
+        ## f_v of every initial node (by row): min hash over the node itself and its neighbours
+        indptr, indices = self.graph.indptr, self.graph.indices
+        f_v = h_function.copy()
+        has_neighbours = np.diff(indptr) > 0
+        if has_neighbours.any():
+            f_v[has_neighbours] = np.minimum(f_v[has_neighbours], np.minimum.reduceat(h_function[indices], indptr[:-1][has_neighbours]))
+        f_v = f_v.tolist()
+
+        F_A_dict = {A: min(f_v[self.init_nd_idx[v]] for v in members) for A, members in superNodes_dict.items()}
         F_A_list = sorted(F_A_dict.items(), key=lambda item:item[1])
 
-        init_groupIndex = [] ## to store the initial nodes indices contained in each group
+        groupIndex = []
         for i in range(self.num_partitions):
             curr_idx = []
             for j in F_A_list[int(i*len(F_A_list)/self.num_partitions): int((i+1)*len(F_A_list)/self.num_partitions)]:
                 curr_idx.append(j[0])
-            
-            init_groupIndex.append(np.array(curr_idx))
 
-        # print('index size: ', len(init_groupIndex))
-        self.best_superNodes_dict = init_superNodes_dict
-        
-        ## store the data for the following use
-        f = open('./{}_{}_.best_temp'.format(self.args.dataset, 0), 'wb')
-        pickle.dump({'g':self.init_graph, 'group_index':init_groupIndex, 'superNodes_dict':init_superNodes_dict}, f)
-        f.close()
+            groupIndex.append(np.array(curr_idx))
+        return groupIndex
+
+
+    def warm_start_supergraph(self, membership):
+        ## to contract the initial graph by a given partition: every group becomes a supernode named after its first member,
+        ## with the same edge weights, "if_true" flags and summed features that merging its members one by one would produce;
+        ## initial nodes missing from the partition stay singletons
+
+        initial_nodes = self.node_ids.tolist()
+        lookup = {str(nd): nd for nd in initial_nodes}
+        superNodes_dict = {nd: [nd] for nd in initial_nodes}
+        assigned = set()
+        for group in membership.values():
+            members = list(dict.fromkeys(lookup[str(nd)] for nd in group if str(nd) in lookup and lookup[str(nd)] not in assigned))
+            assigned.update(members)
+            if(len(members) < 2):
+                continue
+            for nd in members[1:]:
+                superNodes_dict.pop(nd)
+                self.node_belonging[nd] = members[0]
+            superNodes_dict[members[0]] = members
+
+            rows = [self.init_nd_idx[nd] for nd in members]
+            self.node_feat[rows[0]] = self.node_feat[rows].sum(dim=0)
+
+        weights = {}
+        for u, v in self.node_ids[self.graph.edge_rows()].tolist():
+            A, B = self.node_belonging[u], self.node_belonging[v]
+            if(not self.directed and self.init_nd_idx[B] < self.init_nd_idx[A]):
+                A, B = B, A
+            weights[(A, B)] = weights.get((A, B), 0) + 1
+
+        ## only the rows of grouped supernodes and of their neighbours differ from the initial graph
+        held = {A for A, members in superNodes_dict.items() if len(members) > 1}
+        held.update([end for pair in weights if pair[0] in held or pair[1] in held for end in pair])
+        edges = []
+        for (A, B), weight in weights.items():
+            if(A not in held and B not in held):
+                continue
+            if(A == B):
+                if_true = weight > len(superNodes_dict[A])*(len(superNodes_dict[A])-1)/4
+            else:
+                if_true = weight > len(superNodes_dict[A])*len(superNodes_dict[B])/2
+            edges.append((A, B, weight, if_true))
+        removed = [nd for nd in initial_nodes if self.node_belonging[nd] != nd]
+
+        return superNodes_dict, {'held': list(held), 'removed': removed, 'edges': edges, 'num_edges': len(weights)}
  
  
     def select_action(self, curr_feat):
@@ -432,6 +526,7 @@ class PoligrasRunner(object):
         self.model.rewards.append(curr_reward)
         if(curr_reward > 0):
             ## modify current intermediate supergraph
+            self.curr_graph.materialise_merge(n1, n2)
             for pair in graph_modify_dict['weight']:
                 self.curr_graph[pair[0]][pair[1]]['weight'] = graph_modify_dict['weight'][pair]
             for pair in graph_modify_dict['if_true']:
@@ -458,12 +553,10 @@ class PoligrasRunner(object):
             finished_pair = set()
             snapshot_superedge_count = 0
             for A, membersA in self.superNodes_dict.items():
-                iterative_superNode = []
-                for init_n in membersA:
-                    for nei_n in self.init_graph[init_n]:
-                        iterative_superNode.append(self.node_belonging[nei_n])
+                adjacency = {init_n: self.neighbour_set(init_n) for init_n in membersA}
+                iterative_superNode = {self.node_belonging[nei_n] for neighbours in adjacency.values() for nei_n in neighbours}
 
-                for B in set(iterative_superNode):
+                for B in iterative_superNode:
                     if A == B:
                         continue
                     pair_key = tuple(sorted((A, B)))
@@ -475,7 +568,7 @@ class PoligrasRunner(object):
                     edge_weight = 0
                     for nodeA in membersA:
                         for nodeB in membersB:
-                            if self.init_graph.has_edge(nodeA, nodeB):
+                            if nodeB in adjacency[nodeA]:
                                 edge_weight += 1
 
                     possible_edges = len(membersA) * len(membersB)
@@ -488,7 +581,7 @@ class PoligrasRunner(object):
                 for i_idx in range(len(members)):
                     inner_n1 = members[i_idx]
                     for inner_n2 in members[i_idx + 1:]:
-                        if self.init_graph.has_edge(inner_n1, inner_n2):
+                        if inner_n2 in adjacency[inner_n1]:
                             edge_AA += 1
 
                 possible_AA = len(members) * (len(members) - 1) / 2
@@ -503,7 +596,7 @@ class PoligrasRunner(object):
 
             avg_degree = 0.0
             if supernode_count > 0:
-                if self.init_graph.is_directed():
+                if self.directed:
                     avg_degree = snapshot_superedge_count / float(supernode_count)
                 else:
                     avg_degree = 2.0 * snapshot_superedge_count / float(supernode_count)
@@ -543,18 +636,21 @@ class PoligrasRunner(object):
         self.max_reward_by_inner_iter = 0## "max_reward_by_inner_iter" is to help judge and execute the group re-partitioning
         self.model.train()
         # init_time = time.time()
+        progress = getattr(self.args, 'progress', None) ## optional callback receiving a progress dict after every iteration
+        try:
+            self.run_counts(progress)
+        finally:
+            shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+
+
+    def run_counts(self, progress):
         for count in range(self.args.counts):
             best, bad_counter = -1000000, 0
+            iteration = 0
 
             while(True):
                 # start_time = time.time()
-                g_file = open('./{}_{}_.best_temp'.format(self.args.dataset, count), 'rb')
-                loaded_compre = pickle.load(g_file)
-                g_file.close()
-
-                self.curr_graph = loaded_compre['g']
-                self.group_index =  loaded_compre['group_index']
-                self.superNodes_dict = loaded_compre['superNodes_dict']
+                self.curr_graph, self.group_index, self.superNodes_dict = self.load_checkpoint(count)
                 self.curr_feat = copy.deepcopy(self.node_feat)
 
                 count_reward, batch_id = 0, 0
@@ -601,6 +697,18 @@ class PoligrasRunner(object):
                 else:
                     bad_counter += 1
 
+                iteration += 1
+                if(progress is not None):
+                    progress({
+                        'count': count,
+                        'counts': self.args.counts,
+                        'iteration': iteration,
+                        'reward': float(count_reward),
+                        'best_reward': float(best),
+                        ## intermediate supergraph size relative to the initial graph
+                        'compression': (self.curr_graph.number_of_nodes() + self.curr_graph.number_of_edges()) / float(max(self.initial_node_count + self.initial_edge_count, 1)),
+                    })
+
                 if(bad_counter == self.args.bad_counter):
                     # total_rewards += best
                     break
@@ -614,49 +722,13 @@ class PoligrasRunner(object):
                 assert(self.best_graph.number_of_nodes() == len(self.best_superNodes_dict))
 
                 self.num_partitions = self.best_graph.number_of_nodes()//self.args.group_size
-
-                h_function = list(range(self.init_graph.number_of_nodes()))
-                random.shuffle(h_function)
-
-                F_A_dict = {}
-                for A in self.best_superNodes_dict:
-                    F_A = self.init_graph.number_of_nodes()
-                    for v in self.best_superNodes_dict[A]:
-                        f_v = self.init_graph.number_of_nodes()
-                        for u in list(self.init_graph[v]) + [v]:
-                            if(h_function[self.init_nd_idx[int(u)]] < f_v):
-                                f_v = h_function[self.init_nd_idx[int(u)]]
-
-                        if(f_v < F_A):
-                            F_A = f_v
-
-                    F_A_dict[A] = F_A
-                F_A_list = sorted(F_A_dict.items(), key=lambda item:item[1])
-
-                self.best_groupIndex = []
-                for i in range(self.num_partitions):
-                    curr_idx = []
-                    for j in F_A_list[int(i*len(F_A_list)/self.num_partitions): int((i+1)*len(F_A_list)/self.num_partitions)]:
-                        curr_idx.append(j[0])
-                    
-                    self.best_groupIndex.append(np.array(curr_idx))
+                self.best_groupIndex = self.partition_groups(self.best_superNodes_dict)
 
 
             self.node_feat = self.best_currFeat
-            f = open('./{}_{}_.best_temp'.format(self.args.dataset, count+1), 'wb')
-            pickle.dump({'g':self.best_graph, 'group_index':self.best_groupIndex, 'superNodes_dict':self.best_superNodes_dict}, f)
-            f.close()
-
-            files = glob.glob('./{}_{}_.best_temp'.format(self.args.dataset, count))
-            for fil in files:
-                os.remove(fil)
+            self.save_checkpoint(count+1, self.best_graph, self.best_groupIndex, self.best_superNodes_dict)
+            self.checkpoint_path(count).unlink(missing_ok=True)
             print('------\n')
-                
-
-
-        files = glob.glob('./{}_*_.best_temp'.format(self.args.dataset))
-        for fil in files:
-            os.remove(fil)
 
 
 #---------------------------------------------------------------------------------------------------------------------------------
@@ -664,7 +736,8 @@ class PoligrasRunner(object):
         ## encode superedges after finishing the graph summarization iterations
         print("\n-------Model encoding---------.\n")
 
-        self.superEdges, self_edge = [], []  ## to store the superedges and the initial self-loop edges on initial nodes
+        self.superEdges = []  ## to store the superedges
+        self_edge = self.node_ids[self.graph.self_loop_rows()].tolist()  ## the initial nodes having the self-loop edge (kept apart from the CSR rows)
         self.correctionSet_plus, self.correctionSet_minus = [], [] ## to store the correction set edges to add and to delete from the supergraph when restoring the initial graph
         summary_edge_payload: Dict[Tuple[int, int], SummaryEdge] = {}
 
@@ -672,10 +745,13 @@ class PoligrasRunner(object):
         self.superNodes_dict = self.best_superNodes_dict
         for A in self.superNodes_dict:
             iterative_superNode = []
+            adjacency = {} ## initial-graph neighbours of A's members, as sets for the pair lookups below
             # print('{}th supernode'.format(i_dx))
             for init_n in self.superNodes_dict[A]:
-                for nei_n in self.init_graph[init_n]:
+                neighbours = self.neighbours(init_n)
+                for nei_n in neighbours:
                     iterative_superNode.append(self.node_belonging[nei_n])
+                adjacency[init_n] = set(neighbours)
 
             for B in set(iterative_superNode):
                 if(A == B):
@@ -691,7 +767,7 @@ class PoligrasRunner(object):
                 Pi_E_AB = []
                 for n1 in self.superNodes_dict[A]:
                     for n2 in self.superNodes_dict[B]:
-                        if((n1, n2) in self.init_graph.edges()):
+                        if(n2 in adjacency[n1]):
                             Edge_AB.append((n1, n2))
                         else:
                             Pi_E_AB.append((n1, n2))
@@ -717,13 +793,10 @@ class PoligrasRunner(object):
             for n1 in self.superNodes_dict[A]:
                 for n2 in self.superNodes_dict[A]:
                     if(n1<n2):
-                        if((n1, n2) in self.init_graph.edges()):
+                        if(n2 in adjacency[n1]):
                             Edge_AA.append((n1, n2))# += 1
                         else:
                             Pi_E_AA.append((n1, n2))
-                ## to store the initial nodes having the self-loop edge 
-                if((n1, n1) in self.init_graph.edges()): 
-                    self_edge.append(n1)
 
 
 
@@ -749,11 +822,11 @@ class PoligrasRunner(object):
 
         print('#super edge: ', len(self.superEdges))
         print('correction set size: ', len(self.correctionSet_plus) + len(self.correctionSet_minus))
-        print("\n-------SuperNode encoding ended, total reward is {}---------.\n".format(self.init_graph.number_of_edges() - len(self_edge) - len(self.superEdges) - len(self.correctionSet_plus) - len(self.correctionSet_minus)))
+        print("\n-------SuperNode encoding ended, total reward is {}---------.\n".format(self.initial_edge_count - self.self_loop_count - len(self.superEdges) - len(self.correctionSet_plus) - len(self.correctionSet_minus)))
 
 
         summary_path = self.dataset_dir / f"{self.args.dataset}_graph_summary"
-        with summary_path.open('wb') as f:
+        with atomic_write(summary_path, 'wb') as f:
             pickle.dump(
                 {
                     'superNodes_dict': self.superNodes_dict,
@@ -777,13 +850,13 @@ class PoligrasRunner(object):
         initial_graph_payload = self._build_initial_snapshot()
         stats_payload = self._build_stats(
             summary_graph_payload,
-            len(self_edge),
+            self.self_loop_count,
             correction_edge_count,
             positive_corrections,
             negative_corrections,
         )
         meta_payload = self._build_meta()
-        artifacts_payload = self._build_artifacts(len(self_edge))
+        artifacts_payload = self._build_artifacts(self.self_loop_count)
 
         # Append a final timeline snapshot that reflects the encoded summary
         # This ensures the timeline's last entry matches the summary counts
@@ -791,15 +864,15 @@ class PoligrasRunner(object):
             final_step_index = len(self.timeline)
             final_supernode_count = summary_graph_payload['node_count']
             final_superedge_count = summary_graph_payload['edge_count']
-            final_node_count = self.init_graph.number_of_nodes()
-            denom = float(final_node_count + self.init_graph.number_of_edges())
+            final_node_count = self.initial_node_count
+            denom = float(final_node_count + self.initial_edge_count)
             final_summarisation_ratio = 0.0
             if denom:
                 final_summarisation_ratio = (final_supernode_count + final_superedge_count) / denom
 
             final_avg_degree = 0.0
             if final_supernode_count > 0:
-                if self.init_graph.is_directed():
+                if self.directed:
                     final_avg_degree = final_superedge_count / float(final_supernode_count)
                 else:
                     final_avg_degree = 2.0 * final_superedge_count / float(final_supernode_count)
@@ -813,7 +886,7 @@ class PoligrasRunner(object):
                     'summarisation_ratio': float(final_summarisation_ratio),
                     'node_count': int(final_node_count),
                     'edge_count': int(final_superedge_count),
-                    'raw_edge_count': int(self.init_graph.number_of_edges()),
+                    'raw_edge_count': int(self.initial_edge_count),
                     'supernode_count': int(final_supernode_count),
                     'superedge_count': int(final_superedge_count),
                     'avg_degree': float(final_avg_degree),
@@ -855,7 +928,7 @@ class PoligrasRunner(object):
         correction_edge_count: int,
     ) -> SummaryGraph:
         return {
-            'directed': self.init_graph.is_directed(),
+            'directed': self.directed,
             'sampled': False,
             'node_count': len(summary_nodes),
             'edge_count': len(summary_edge_payload),
@@ -906,40 +979,46 @@ class PoligrasRunner(object):
 
 
     def _build_initial_snapshot(self, max_nodes: int = MAX_INITIAL_SNAPSHOT_NODES) -> InitialGraph:
-        ordered_nodes = list(self.init_graph.nodes())
-        
+        node_count = self.graph.num_nodes
+
         # If max_nodes is None or >= total nodes, use all nodes (no sampling)
-        if max_nodes is None or max_nodes >= len(ordered_nodes):
-            sampled_nodes = ordered_nodes
+        if max_nodes is None or max_nodes >= node_count:
+            sampled_count = node_count
             sampled = False
         else:
-            sampled_nodes = ordered_nodes[:max_nodes]
+            sampled_count = max_nodes
             sampled = True
-        
-        induced_subgraph = self.init_graph.subgraph(sampled_nodes).copy()
 
+        # The sample is the induced subgraph on the first rows; ids are exported like the members'
+        exported_ids = [self._coerce_node_id(node) for node in self.node_ids[:sampled_count].tolist()]
         nodes_payload = [
             {
-                'id': self._coerce_node_id(node),
-                'degree': int(self.init_graph.degree(node)),
+                'id': exported_ids[row],
+                'degree': int(degree),
             }
-            for node in induced_subgraph.nodes()
+            for row, degree in enumerate(self.graph.degrees()[:sampled_count].tolist())
         ]
 
-        edges_payload = []
-        for source, target, data in induced_subgraph.edges(data=True):
-            weight = float(data.get('weight', 1.0))
-            edges_payload.append({
-                'source': self._coerce_node_id(source),
-                'target': self._coerce_node_id(target),
-                'weight': weight,
-            })
+        edges = self.graph.edge_rows()
+        looped = self.graph.self_loop_rows()
+        if sampled:
+            edges = edges[(edges < sampled_count).all(axis=1)]
+            looped = looped[looped < sampled_count]
+        edges = np.concatenate((edges, np.repeat(looped, 2).reshape(-1, 2))) if len(looped) else edges
+        edges_payload = [
+            {
+                'source': exported_ids[source],
+                'target': exported_ids[target],
+                'weight': 1.0,
+            }
+            for source, target in edges.tolist()
+        ]
 
         return {
-            'directed': self.init_graph.is_directed(),
+            'directed': self.directed,
             'sampled': sampled,
-            'node_count': induced_subgraph.number_of_nodes(),
-            'edge_count': induced_subgraph.number_of_edges(),
+            'node_count': len(nodes_payload),
+            'edge_count': len(edges_payload),
             'nodes': nodes_payload,
             'edges': edges_payload,
         }
@@ -953,14 +1032,14 @@ class PoligrasRunner(object):
         positive_corrections: int,
         negative_corrections: int,
     ) -> Stats:
-        initial_nodes = self.init_graph.number_of_nodes()
-        initial_edges = self.init_graph.number_of_edges()
+        initial_nodes = self.initial_node_count
+        initial_edges = self.initial_edge_count
         summary_supernodes = summary_graph['node_count']
         summary_superedges = summary_graph['edge_count']
         numerator = summary_supernodes + summary_superedges
         denominator = initial_nodes + initial_edges
         compression_ratio = (numerator / denominator) if denominator else 0.0
-        total_reward = self.init_graph.number_of_edges() - self_loop_edges - len(self.superEdges) - correction_edge_count
+        total_reward = self.initial_edge_count - self_loop_edges - len(self.superEdges) - correction_edge_count
 
         stats: Stats = {
             'initial': {
@@ -1,50 +1,90 @@
 import os
-import torch
 import pickle
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from backend.atomic_files import atomic_write
+from backend.csr_graph import open_dataset_graph
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-def feature_generator(folder_name, interval_size=1000):
-    graph_path = os.path.join(
-        BASE_DIR,
-        "dataset",
-        folder_name,
-        f"{folder_name}_graph"
-    )
+## "histogram" features are as wide as num_node / interval_size; "hashed" and
+## "projection" ones have a fixed width, so the model's input layer does not grow with the graph
+FEATURE_MODES = ("histogram", "hashed", "projection")
+DEFAULT_FEATURE_DIM = 128
+PROJECTION_NONZEROS = 4
 
-    if not os.path.exists(graph_path):
-        raise FileNotFoundError(f"Graph file not found: {graph_path}")
+_MASK64 = (1 << 64) - 1
 
-    with open(graph_path, "rb") as g_file:
-        loaded_graph = pickle.load(g_file)
 
-    g = loaded_graph["G"]
+def feature_options(mode=None, dim=None):
+    """Resolved `feature_generator` options; defaults come from POLIGRAS_FEATURE_MODE and POLIGRAS_FEATURE_DIM."""
+    mode = mode or os.environ.get("POLIGRAS_FEATURE_MODE", "histogram")
+    if mode not in FEATURE_MODES:
+        raise ValueError(f"Unknown feature mode '{mode}' (expected one of {', '.join(FEATURE_MODES)})")
+    if mode == "histogram":
+        return {"mode": mode, "interval_size": 1000}
+    dim = int(dim or os.environ.get("POLIGRAS_FEATURE_DIM", DEFAULT_FEATURE_DIM))
+    if dim < 1:
+        raise ValueError("Feature dimension must be positive")
+    return {"mode": mode, "dim": dim}
 
-    num_node = g.number_of_nodes()
-    print("# nodes:", num_node)
-    print("# edges:", g.number_of_edges())
 
-    node_dict = {nd: idx for idx, nd in enumerate(g.nodes())}
-    feat_size = num_node // interval_size + 1
+def _mix(values, seed):
+    """splitmix64 finaliser of `values`, salted with `seed`: a fixed hash of node rows."""
+    x = values.astype(np.uint64) + np.uint64((seed * 0x9E3779B97F4A7C15) & _MASK64)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def feature_generator(folder_name, interval_size=1000, mode="histogram", dim=DEFAULT_FEATURE_DIM):
+    """Node features computed from the CSR rows, a block of rows at a time.
+
+    * "histogram": a node's neighbour count in each block of `interval_size` rows;
+    * "hashed": signed feature hashing of neighbour rows into `dim` buckets;
+    * "projection": sparse random projection of the adjacency row onto `dim`
+      columns, each neighbour contributing +-1/sqrt(k) to k = PROJECTION_NONZEROS of them.
+    """
+    if mode not in FEATURE_MODES:
+        raise ValueError(f"Unknown feature mode '{mode}'")
+    dataset_dir = Path(BASE_DIR) / "dataset" / folder_name
+    g = open_dataset_graph(dataset_dir, folder_name)
+
+    num_node = g.num_nodes
+    print("# nodes:", num_node)
+    print("# edges:", g.num_edges)
 
-    feat_list = []
-    for nd in g.nodes():
-        curr_feat = [0.0] * feat_size
-        for nei in g[nd]:
-            curr_feat[node_dict[nei] // interval_size] += 1.0
-        feat_list.append(curr_feat)
+    feat_size = num_node // interval_size + 1 if mode == "histogram" else dim
+    nonzeros = PROJECTION_NONZEROS if mode == "projection" else 1
 
-    node_feat = torch.FloatTensor(feat_list)
+    node_feat = torch.zeros((num_node, feat_size), dtype=torch.float32)
+    indptr, indices = g.indptr, g.indices
+    block = max(1, (1 << 22) // feat_size)
+    for start in range(0, num_node, block):
+        stop = min(start + block, num_node)
+        rows = np.repeat(np.arange(stop - start), np.diff(indptr[start:stop + 1]))
+        cols = indices[indptr[start]:indptr[stop]]
+        if mode == "histogram":
+            cells, weights = rows * feat_size + cols // interval_size, None
+        else:
+            ## k independent (bucket, sign) hashes of every neighbour row
+            cells = np.empty(nonzeros * len(cols), dtype=np.int64)
+            weights = np.empty(nonzeros * len(cols), dtype=np.float64)
+            for k in range(nonzeros):
+                hashed = _mix(cols, k)
+                part = slice(k * len(cols), (k + 1) * len(cols))
+                cells[part] = rows * feat_size + (hashed % np.uint64(feat_size)).astype(np.int64)
+                weights[part] = np.where(hashed >> np.uint64(63), -1.0, 1.0) / np.sqrt(nonzeros)
+        counts = np.bincount(cells, weights=weights, minlength=(stop - start) * feat_size)
+        node_feat[start:stop] = torch.from_numpy(counts.reshape(stop - start, feat_size).astype(np.float32))
 
-    out_path = os.path.join(
-        BASE_DIR,
-        "dataset",
-        folder_name,
-        f"{folder_name}_feat"
-    )
+    out_path = dataset_dir / f"{folder_name}_feat"
 
-    with open(out_path, "wb") as f:
+    with atomic_write(out_path, "wb") as f:
         pickle.dump({"feat": node_feat}, f)
 
     print("Saved features to:", out_path)
-    return node_feat
\ No newline at end of file
+    return node_feat
@@ -126,6 +126,7 @@ class SummaryArtifacts(TypedDict, total=False):
     supernodes: SupernodeMembership
     corrections: CorrectionSets
     self_loops: int
+    version: int
 
 
 class MergeStepStats(TypedDict):
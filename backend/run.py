@@ -1,22 +1,53 @@
 import argparse
-import json
+import random
 from pathlib import Path
 
+import numpy as np
+import torch
+
+from backend.artifact_bundle import write_output_bundle
+from backend.atomic_files import gzip_copy, write_json_atomic
+from backend.dataset_catalog import DatasetCatalog
+from backend.feature_jobs import wait_for_features
 from backend.model import PoligrasRunner
+from backend.run_cache import RunCache
 
 
 def run_poligras(args):
-    """Train Poligras and serialize a structured summary payload."""
-    executer = PoligrasRunner(args)
-    executer.fit()
-    result = executer.encode()
+    """Train Poligras and serialize a structured summary payload.
 
+    A run with the same graph, features, parameters and seed as an earlier
+    one reuses that run's summary instead of training again. Features an
+    upload is still preparing are waited for first.
+    """
     backend_root = Path(__file__).resolve().parent
     output_dir = backend_root / "dataset" / args.dataset
+    wait_for_features(output_dir)
+    run_cache = RunCache(output_dir.parent)
+    cache_key = run_cache.run_key(args.dataset, vars(args))
+    result = run_cache.restore(cache_key, args.dataset)
+    if result is None:
+        seed = getattr(args, "seed", None)
+        if seed is not None:
+            random.seed(seed)
+            np.random.seed(seed)
+            torch.manual_seed(seed)
+        executer = PoligrasRunner(args)
+        executer.fit()
+        result = executer.encode()
+    else:
+        print(f"Reusing cached Poligras run {cache_key}")
+
     output_dir.mkdir(parents=True, exist_ok=True)
     output_path = output_dir / "output.json"
-    with output_path.open('w', encoding='utf-8') as outfile:
-        json.dump(result, outfile, indent=2)
+    # Published with a rename so concurrent readers never see a partial file.
+    write_json_atomic(output_path, result, indent=2)
+    # Precompressed copy served to clients that accept gzip.
+    gzip_copy(output_path)
+    # Columnar copy that the API and dynamic summaries load instead of the JSON.
+    write_output_bundle(output_path, result)
+    DatasetCatalog(output_dir.parent).record(args.dataset, meta=result["meta"])
+    run_cache.store(cache_key, args.dataset)
 
     print(f"Poligras artifacts written to {output_path.resolve()}")
     return result
@@ -33,6 +64,7 @@ def parse_args():
     parser.add_argument("--dropout", type=float, default=0.0)
     parser.add_argument("--weight-decay", type=float, default=0.0)
     parser.add_argument("--bad_counter", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=None)
     return parser.parse_args()
 
 
@@ -0,0 +1,154 @@
+"""Content-addressed cache of completed summarisation runs.
+
+A run is keyed by the SHA-256 of its inputs (the dataset's CSR graph and
+``_feat`` file) together with the run parameters, including the seed.
+Uploading the same graph again under a new dataset id therefore hits the
+cache, and the stored summary is linked (or copied, across filesystems)
+into the new dataset directory instead of fitting the model again.
+
+Entries live in ``backend/dataset/.run-cache/<key>/`` and hold the run's
+``output.json`` and pickled ``_graph_summary``. They are hard links to the
+files the run published, so an entry costs no extra space while its
+dataset exists. Entries are published with a rename and never modified.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from backend.atomic_files import link_or_copy
+from backend.csr_graph import open_dataset_graph
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_NAME = ".run-cache"
+OUTPUT_NAME = "output.json"
+SUMMARY_NAME = "graph_summary"
+
+# Arguments of ``run_poligras`` that influence its result.
+RUN_PARAMETERS = (
+    "counts",
+    "group_size",
+    "hidden_size1",
+    "hidden_size2",
+    "lr",
+    "dropout",
+    "weight_decay",
+    "bad_counter",
+    "seed",
+    "warm_start",
+)
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def graph_digest(dataset_dir: Path, dataset: str) -> str:
+    """Digest of the dataset's CSR graph (arrays and direction; ingestion stats are not part of it)."""
+
+    graph = open_dataset_graph(dataset_dir, dataset)
+    digest = hashlib.sha256(json.dumps([graph.directed, graph.manifest["node_ids"]]).encode("utf-8"))
+    for path in sorted(graph.path.glob("*.npy")) + sorted(graph.path.glob("nodes.json")):
+        digest.update(path.name.encode("utf-8"))
+        digest.update(file_digest(path).encode("ascii"))
+    return digest.hexdigest()
+
+
+class RunCache:
+    """Completed runs under ``<datasets_root>/.run-cache``, addressed by ``run_key``."""
+
+    def __init__(self, datasets_root: Path):
+        self.root = datasets_root / CACHE_DIR_NAME
+
+    def run_key(self, dataset: str, parameters: Dict) -> str:
+        """Key of a run of ``dataset`` with ``parameters`` (extra entries are ignored)."""
+
+        dataset_dir = self.root.parent / dataset
+        material = {
+            "graph": graph_digest(dataset_dir, dataset),
+            "features": file_digest(dataset_dir / f"{dataset}_feat"),
+            "parameters": {name: parameters.get(name) for name in RUN_PARAMETERS},
+        }
+        encoded = json.dumps(material, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def restore(self, key: str, dataset: str) -> Optional[Dict]:
+        """Link a cached run into ``dataset`` and return its output, or None on a miss.
+
+        The output's ``meta.dataset`` is set to ``dataset``; publishing the
+        returned payload is left to the caller.
+        """
+
+        entry = self.root / key
+        try:
+            with (entry / OUTPUT_NAME).open("r", encoding="utf-8") as handle:
+                result = json.load(handle)
+        except FileNotFoundError:
+            return None
+        link_or_copy(entry / SUMMARY_NAME, self.root.parent / dataset / f"{dataset}_{SUMMARY_NAME}")
+        result["meta"]["dataset"] = dataset
+        logger.info("Reusing cached run %s for %s", key, dataset)
+        return result
+
+    def store(self, key: str, dataset: str) -> None:
+        """Record the run ``dataset`` just published under ``key``."""
+
+        entry = self.root / key
+        if entry.exists():
+            return
+        dataset_dir = self.root.parent / dataset
+        staging = self.root / f".{key}.{uuid.uuid4().hex}"
+        staging.mkdir(parents=True)
+        try:
+            link_or_copy(dataset_dir / OUTPUT_NAME, staging / OUTPUT_NAME)
+            link_or_copy(dataset_dir / f"{dataset}_{SUMMARY_NAME}", staging / SUMMARY_NAME)
+            try:
+                staging.rename(entry)
+            except OSError:
+                # Another worker stored the same run first.
+                if not entry.exists():
+                    raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def keys(self) -> List[str]:
+        if not self.root.exists():
+            return []
+        return sorted(entry.name for entry in self.root.iterdir() if entry.is_dir() and not entry.name.startswith("."))
+
+    def clear(self) -> int:
+        """Remove every entry; returns how many were removed."""
+
+        keys = self.keys()
+        for key in keys:
+            shutil.rmtree(self.root / key, ignore_errors=True)
+        return len(keys)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect or clear the summarisation run cache.")
+    parser.add_argument("--clear", action="store_true", help="Remove all cached runs")
+    args = parser.parse_args()
+
+    cache = RunCache(Path(__file__).resolve().parent / "dataset")
+    if args.clear:
+        print(f"Removed {cache.clear()} cached runs")
+        return
+    for key in cache.keys():
+        print(key)
+
+
+if __name__ == "__main__":
+    main()
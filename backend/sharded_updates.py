@@ -0,0 +1,362 @@
+"""Multi-process application of edge updates, partitioned by supernode pair.
+
+With fixed membership, updates to different supernode pairs are independent:
+a pair's superedge flag and correction sets depend only on that pair's own
+edges. ``ShardedDynamicEngine`` hash-partitions pair keys across worker
+processes. Each worker owns only its slice of ``superedges`` /
+``correction_plus`` / ``correction_minus`` and applies its share of every
+batch with the regular coalescing ``apply_batch``.
+
+The parent process keeps the membership map. It validates and routes
+updates, so a batch with an unknown node is rejected before any shard sees
+it. Routing is done for the whole batch at once: a pair's shard depends on
+its supernodes only through the sum of their hashes, so the parent keeps a
+per-node hash table and finds every update's shard with one vectorised
+modulo, leaving the per-pair work to the shards. It also sums the per-shard
+counters for stats and merges the slices back into one state on
+``materialise``/``export_core``.
+
+Workers are started with the ``spawn`` method, like the other process
+pools here, so they never inherit a forked copy of a threaded server. The
+membership is pickled once and sent to every worker with its slice of the
+pairs.
+
+The engine stands in for a dynamic state wherever one is kept alive: it
+records ``SummaryChanges`` (each shard reports the pairs it touched),
+restores rollback images and cores, so a ``VersionedSummary`` can hold one
+for its whole lifetime instead of starting workers per batch.
+
+Structural maintenance (node admission, splits, re-merging) and window
+expiry change membership or need per-edge clocks across every shard at
+once and are not available here; callers that need them load the
+materialised result with a policy afterwards.
+"""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+import operator
+import os
+import pickle
+import zlib
+from multiprocessing.connection import Connection
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.dynamic_updates import EdgeUpdate, PairImage, PairKey, SummaryChanges, load_dynamic_state
+from backend.output_types import PoligrasOutput
+
+# Operations, sources and targets of a shard's updates; plain lists keep the per-batch pickles small.
+_WireBatch = Tuple[List[str], List[str], List[str]]
+_ShardCounts = Tuple[int, int, int]
+# A shard's counts after a command, plus its changes when recording.
+_ShardReply = Tuple[_ShardCounts, Optional[SummaryChanges]]
+
+
+def _supernode_hash(supernode: str) -> int:
+    return zlib.crc32(supernode.encode("utf-8"))
+
+
+def shard_of(pair_key: PairKey, shards: int) -> int:
+    """Stable shard index for a pair (independent of ``PYTHONHASHSEED``).
+
+    Only the sum of the two supernode hashes matters, which is what lets
+    ``ShardedDynamicEngine`` route a batch from per-node hashes.
+    """
+
+    return (_supernode_hash(pair_key[0]) + _supernode_hash(pair_key[1])) % shards
+
+
+def _shard_counts(state) -> _ShardCounts:
+    breakdown = state.current_stats()["correction_breakdown"]
+    return len(state.superedges), breakdown["positive"], breakdown["negative"]
+
+
+def _partition_core(core: Dict, shards: int) -> List[Dict]:
+    """Split the pairs of an ``export_core`` dict into one slice per shard.
+
+    Slices hold only ``superedges`` and the correction maps; merge one into
+    a core (``{**core, **slice}``) to get that shard's full core.
+    """
+
+    slices: List[Dict] = [
+        {"superedges": [], "correction_plus": {}, "correction_minus": {}}
+        for _ in range(shards)
+    ]
+    for pair in core["superedges"]:
+        slices[shard_of(pair, shards)]["superedges"].append(pair)
+    for field in ("correction_plus", "correction_minus"):
+        for pair, edges in core[field].items():
+            slices[shard_of(pair, shards)][field][pair] = edges
+    return slices
+
+
+def _shard_worker(conn: Connection) -> None:
+    # The parent's state without pairs, then this shard's pairs.
+    state = pickle.loads(conn.recv_bytes())
+    state.restore_core({**state.export_core(), **conn.recv()})
+    conn.send(("ready", _shard_counts(state)))
+
+    def _recorded(record: bool, change) -> _ShardReply:
+        if record:
+            state.begin_changes()
+        change()
+        # collect_changes brings the correction totals up to date, so it runs before counting.
+        changes = state.collect_changes() if record else None
+        return _shard_counts(state), changes
+
+    while True:
+        command, argument = conn.recv()
+        try:
+            if command == "apply":
+                (operations, sources, targets), record = argument
+                conn.send(("ok", _recorded(record, lambda: state.apply_batch(
+                    map(EdgeUpdate, operations, sources, targets)  # type: ignore[arg-type]
+                ))))
+            elif command == "images":
+                pairs, supernodes, record = argument
+                conn.send(("ok", _recorded(record, lambda: state.restore_images(pairs, supernodes))))
+            elif command == "restore":
+                state.restore_core(argument)
+                conn.send(("ok", _shard_counts(state)))
+            elif command == "export":
+                conn.send(("ok", state.export_core()))
+            elif command == "close":
+                conn.send(("ok", None))
+                return
+            else:
+                conn.send(("error", f"Unknown shard command '{command}'"))
+        except Exception as exc:  # reported to the parent, which raises it
+            conn.send(("error", f"{type(exc).__name__}: {exc}"))
+
+
+class ShardedDynamicEngine:
+    """Dynamic summary state split across ``workers`` processes by pair hash."""
+
+    # Sharding needs fixed membership and no per-edge clocks (see the module docstring).
+    policy = None
+    window = None
+
+    def __init__(self, payload: PoligrasOutput, workers: Optional[int] = None):
+        self._start(load_dynamic_state(payload), workers)
+
+    @classmethod
+    def from_state(cls, state, workers: Optional[int] = None) -> "ShardedDynamicEngine":
+        """Shard an existing dynamic state built without a policy or window; the engine takes it over."""
+
+        if state.policy is not None or state.window is not None:
+            raise ValueError("Only states without a maintenance policy or window can be sharded")
+        engine = cls.__new__(cls)
+        engine._start(state, workers)
+        return engine
+
+    def _start(self, state, workers: Optional[int]) -> None:
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self._state = state
+        # (shard changes, stats before) between begin_changes and collect_changes.
+        self._recording: Optional[Tuple[List[SummaryChanges], Dict]] = None
+
+        context = mp.get_context("spawn")
+        self._connections: List[Connection] = []
+        self._processes = []
+        for shard in range(self.workers):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(target=_shard_worker, args=(child_conn,), name=f"summary-shard-{shard}", daemon=True)
+            process.start()
+            child_conn.close()
+            self._connections.append(parent_conn)
+            self._processes.append(process)
+
+        slices = _partition_core(
+            {"superedges": state.superedges, "correction_plus": state.correction_plus, "correction_minus": state.correction_minus},
+            self.workers,
+        )
+        # The parent keeps membership only; that part is pickled once for every shard.
+        self._state.retain_pairs(lambda pair_key: False)
+        skeleton = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        for conn, pairs in zip(self._connections, slices):
+            conn.send_bytes(skeleton)
+            conn.send(pairs)
+        self._index_nodes()
+        self._counts: List[_ShardCounts] = [self._receive(conn) for conn in self._connections]
+
+    def __enter__(self) -> "ShardedDynamicEngine":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @staticmethod
+    def _receive(conn: Connection):
+        status, result = conn.recv()
+        if status != "ok" and status != "ready":
+            raise RuntimeError(f"Summary shard failed: {result}")
+        return result
+
+    def _broadcast(self, command: str, arguments: Iterable) -> List:
+        for conn, argument in zip(self._connections, arguments):
+            conn.send((command, argument))
+        # Collect every reply even if one shard failed, so the pipes stay in step.
+        replies = [conn.recv() for conn in self._connections]
+        for status, result in replies:
+            if status != "ok":
+                raise RuntimeError(f"Summary shard failed: {result}")
+        return [result for _, result in replies]
+
+    @property
+    def directed(self) -> bool:
+        return self._state.directed
+
+    @property
+    def base_version(self) -> int:
+        return self._state.base_version
+
+    def check(self, update: EdgeUpdate) -> None:
+        self._state.check(update)
+
+    def _index_nodes(self, nodes: Optional[Iterable[str]] = None) -> None:
+        """Refresh the routing hash (that of its supernode) of ``nodes``, or of every node."""
+
+        node_to_super = self._state.node_to_super
+        if nodes is None:
+            supernode_hashes = {supernode: _supernode_hash(supernode) for supernode in self._state.members}
+            self._node_hashes = {node: supernode_hashes[supernode] for node, supernode in node_to_super.items()}
+            return
+        for node in nodes:
+            supernode = node_to_super.get(node)
+            if supernode is None:
+                self._node_hashes.pop(node, None)
+            else:
+                self._node_hashes[node] = _supernode_hash(supernode)
+
+    def _route(self, updates: Sequence[EdgeUpdate], sources: List[str], targets: List[str]) -> np.ndarray:
+        """Shard of every update; raises ``UpdateStreamError`` for a batch the state would reject."""
+
+        count = len(updates)
+        try:
+            if not any(map(operator.eq, sources, targets)):
+                lookup = self._node_hashes.__getitem__
+                hashes = np.fromiter(map(lookup, sources), np.int64, count) + np.fromiter(map(lookup, targets), np.int64, count)
+                return hashes % self.workers
+        except KeyError:
+            pass
+        # A self-loop or an unknown node: resolving update by update raises the state's own error.
+        return np.fromiter(
+            (shard_of(self._state.pair_key_for(update), self.workers) for update in updates),  # type: ignore[arg-type]
+            np.int64,
+            count,
+        )
+
+    def apply_batch(self, updates: Iterable[EdgeUpdate]) -> None:
+        """Route a batch to the shards and apply the slices in parallel.
+
+        The whole batch is validated first, so an ``UpdateStreamError``
+        leaves every shard untouched. Per-pair update order is preserved,
+        so the result matches a single-process ``apply_batch``.
+        """
+
+        updates = list(updates)
+        operations = np.array([update.operation for update in updates], dtype=object)
+        sources = [str(update.source) for update in updates]
+        targets = [str(update.target) for update in updates]
+        shards = self._route(updates, sources, targets)
+        # A stable sort keeps each shard's updates in batch order.
+        order = np.argsort(shards, kind="stable")
+        bounds = np.searchsorted(shards[order], np.arange(self.workers + 1)).tolist()
+        columns = [operations[order], np.array(sources, dtype=object)[order], np.array(targets, dtype=object)[order]]
+        routed: List[_WireBatch] = [
+            tuple(column[start:end].tolist() for column in columns)  # type: ignore[misc]
+            for start, end in zip(bounds, bounds[1:])
+        ]
+        record = self._recording is not None
+        self._absorb(self._broadcast("apply", [(wire, record) for wire in routed]))
+
+    apply_updates = apply_batch
+
+    def restore_images(self, pairs: Dict[PairKey, PairImage], supernodes: Dict[str, Optional[List[str]]]) -> None:
+        """Reset pairs and supernodes to earlier images (see ``_SummaryDynamicState.restore_images``)."""
+
+        # Membership is replicated: the parent and every shard take the supernode images.
+        moved = {node for supernode in supernodes for node in self._state.members.get(supernode, ())}
+        self._state.restore_images({}, supernodes)
+        self._index_nodes(moved.union(*(nodes for nodes in supernodes.values() if nodes)))
+        routed: List[Dict[PairKey, PairImage]] = [{} for _ in range(self.workers)]
+        for pair_key, image in pairs.items():
+            routed[shard_of(pair_key, self.workers)][pair_key] = image
+        record = self._recording is not None
+        self._absorb(self._broadcast("images", [(images, supernodes, record) for images in routed]))
+
+    def _absorb(self, replies: List[_ShardReply]) -> None:
+        self._counts = [counts for counts, _ in replies]
+        if self._recording is not None:
+            self._recording[0].extend(changes for _, changes in replies if changes is not None)
+
+    def begin_changes(self) -> None:
+        """Start recording; shards report the pairs they change with every command until ``collect_changes``."""
+
+        self._recording = ([], self.current_stats())
+        self._state.begin_changes()
+
+    def collect_changes(self) -> SummaryChanges:
+        """Combine the shards' changes; pairs (and so edges) never span shards, so they do not overlap."""
+
+        if self._recording is None:
+            raise RuntimeError("collect_changes() called without begin_changes()")
+        shard_changes, stats_before = self._recording
+        self._recording = None
+        # Supernode images come from the parent's membership.
+        changes = self._state.collect_changes()
+        for shard_change in shard_changes:
+            changes.superedges.update(shard_change.superedges)
+            changes.corrections.update(shard_change.corrections)
+            changes.undo.update(shard_change.undo)
+        changes.stats_before = stats_before
+        changes.stats_after = self.current_stats()
+        return changes
+
+    def current_stats(self) -> Dict:
+        superedges, positive_count, negative_count = (sum(column) for column in zip(*self._counts))
+        return self._state.stats_for_counts(superedges, positive_count, negative_count)
+
+    def export_core(self) -> Dict:
+        """Merge the shards' slices into one ``export_core``-compatible dict."""
+
+        core = self._state.export_core()
+        for shard_core in self._broadcast("export", [None] * self.workers):
+            core["superedges"].extend(shard_core["superedges"])
+            core["correction_plus"].update(shard_core["correction_plus"])
+            core["correction_minus"].update(shard_core["correction_minus"])
+        core["superedges"].sort()
+        return core
+
+    def restore_core(self, core: Dict) -> None:
+        """Replace the whole state with an ``export_core`` dict, split across the shards."""
+
+        self._state.restore_core(core)
+        self._state.retain_pairs(lambda pair_key: False)
+        self._index_nodes()
+        self._counts = self._broadcast("restore", [{**core, **pairs} for pairs in _partition_core(core, self.workers)])
+
+    def materialise(self) -> PoligrasOutput:
+        """Serialise the merged summary; feed it to ``load_dynamic_state`` to continue with maintenance."""
+
+        self._state.restore_core(self.export_core())
+        try:
+            return self._state.materialise()
+        finally:
+            self._state.retain_pairs(lambda pair_key: False)
+
+    def close(self) -> None:
+        for conn in self._connections:
+            try:
+                conn.send(("close", None))
+                conn.recv()
+            except (EOFError, OSError):
+                pass
+            conn.close()
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._connections, self._processes = [], []
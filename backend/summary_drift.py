@@ -0,0 +1,351 @@
+"""Compression-drift monitoring and background re-summarisation.
+
+Edge updates keep a dynamic summary exact, but with mostly fixed membership
+its compression degrades: correction sets grow and the total reward falls
+compared with the full Poligras run the summary started from.
+``DriftMonitor`` watches every session opened through a ``SummaryRegistry``.
+When its ``DriftPolicy`` trips, it re-runs Poligras on the current graph in a
+separate process, warm-started from the current supernode membership.
+
+The result becomes the dataset's re-summarised base
+(``output_resummarized.json``; the original ``output.json`` is left alone)
+and is swapped in with ``VersionedSummary.rebase``, which replays the batches
+that arrived during the run. Serving never waits for the run. Only forking
+the core and the final swap take the session lock.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import multiprocessing as mp
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from itertools import combinations, product
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, List, Optional
+
+from backend.artifact_bundle import write_output_bundle
+from backend.dynamic_updates import EdgeKey, load_dynamic_state
+from backend.output_types import PoligrasOutput
+from backend.summary_versions import REBASED_OUTPUT_NAME, SummaryRegistry, VersionedSummary
+
+logger = logging.getLogger(__name__)
+
+# Matches the defaults of run.parse_args and the /poligras endpoint.
+DEFAULT_RUN_PARAMETERS = {
+    "counts": 100,
+    "group_size": 200,
+    "hidden_size1": 64,
+    "hidden_size2": 32,
+    "lr": 0.001,
+    "dropout": 0.0,
+    "weight_decay": 0.0,
+    "bad_counter": 0,
+}
+
+
+@dataclass(frozen=True)
+class DriftPolicy:
+    """When to re-summarise, measured against the last full run.
+
+    * ``max_correction_growth`` - trip once correction edges exceed the
+      baseline count by this fraction (0.5 means 50% more)
+    * ``min_reward_ratio`` - trip once the total reward falls below this
+      fraction of the baseline reward
+
+    Either check is disabled with None. ``cooldown`` is the minimum number
+    of seconds between two runs for one dataset. ``counts`` overrides the
+    number of Poligras iterations of the re-run; a warm start usually needs
+    fewer than the original run.
+    """
+
+    max_correction_growth: Optional[float] = 0.5
+    min_reward_ratio: Optional[float] = 0.8
+    cooldown: float = 600.0
+    counts: Optional[int] = None
+
+    def reason(self, drift: Dict[str, Optional[float]]) -> Optional[str]:
+        """Why the policy trips for ``drift`` (see ``measure_drift``), or None."""
+
+        growth = drift.get("correction_growth")
+        if self.max_correction_growth is not None and growth is not None and growth > self.max_correction_growth:
+            return f"correction growth {growth:.2f} > {self.max_correction_growth}"
+        ratio = drift.get("reward_ratio")
+        if self.min_reward_ratio is not None and ratio is not None and ratio < self.min_reward_ratio:
+            return f"reward ratio {ratio:.2f} < {self.min_reward_ratio}"
+        return None
+
+
+def measure_drift(baseline: Dict, current: Dict) -> Dict[str, Optional[float]]:
+    """Correction growth and reward ratio of ``current`` stats relative to ``baseline``."""
+
+    base_corrections = int(baseline.get("summary", {}).get("correction_edges", 0))
+    corrections = int(current.get("summary", {}).get("correction_edges", 0))
+    base_reward = float(baseline.get("total_reward", 0))
+    reward = float(current.get("total_reward", 0))
+    return {
+        "correction_growth": (corrections - base_corrections) / max(base_corrections, 1),
+        "reward_ratio": reward / base_reward if base_reward > 0 else None,
+    }
+
+
+@dataclass
+class DriftJob:
+    dataset_id: str
+    reason: str
+    status: str = "queued"  # queued | running | swapped | discarded | failed
+    fork_version: Optional[int] = None
+    swapped_version: Optional[int] = None
+    queued_at: float = 0.0
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+# ----------------------------------------------------------------------
+# Worker process
+# ----------------------------------------------------------------------
+def core_edges(core: Dict, directed: bool) -> Iterator[EdgeKey]:
+    """Decode the edges of the graph a dynamic state core (``export_core``) summarises."""
+
+    members = core["members"]
+    for pair in core["superedges"]:
+        super_u, super_v = pair
+        missing = set(map(tuple, core["correction_minus"].get(tuple(pair), ())))
+        if super_u == super_v:
+            candidates = combinations(members[super_u], 2)
+        else:
+            candidates = product(members[super_u], members[super_v])
+        for source, target in candidates:
+            edge = (source, target) if directed or source <= target else (target, source)
+            if edge not in missing:
+                yield edge
+    for edges in core["correction_plus"].values():
+        for source, target in edges:
+            yield source, target
+
+
+def resummarize_core(dataset_id: str, core: Dict, directed: bool, parameters: Dict) -> PoligrasOutput:
+    """Run Poligras on the graph encoded by ``core``, warm-started from its membership.
+
+    Runs in a worker process. The graph is staged as a hidden dataset folder
+    (``.resummarize-<id>``) because the runner and feature generator read
+    from ``backend/dataset``; the folder is removed afterwards.
+    """
+
+    import numpy as np
+
+    from backend.csr_graph import build_csr, csr_path_for, write_csr
+    from backend.node_feature_generation import feature_generator, feature_options
+    from backend.run import run_poligras
+
+    labels: List[str] = list(core["node_to_super"])
+    if all(label.lstrip("-").isdigit() for label in labels):
+        labels.sort(key=int)
+    else:
+        labels.sort()
+    index = {label: position for position, label in enumerate(labels)}
+
+    pairs = np.fromiter(
+        (index[node] for edge in core_edges(core, directed) for node in edge),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    graph = build_csr(pairs, len(labels), directed=directed)
+
+    staging_name = f".resummarize-{dataset_id}"
+    staging_dir = Path(__file__).resolve().parent / "dataset" / staging_name
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        write_csr(
+            csr_path_for(staging_dir, staging_name),
+            graph["indptr"],
+            graph["indices"],
+            np.arange(len(labels), dtype=np.int64),
+            directed=directed,
+            self_loop_rows=graph["self_loop_rows"],
+        )
+        feature_generator(staging_name, **feature_options())
+        args = SimpleNamespace(
+            dataset=staging_name,
+            warm_start={supernode: [index[node] for node in nodes] for supernode, nodes in core["members"].items()},
+            **parameters,
+        )
+        result = run_poligras(args)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    # The runner names nodes by position; map them back unless that is the identity.
+    if any(label != str(position) for position, label in enumerate(labels)):
+        _relabel_payload(result, labels)
+    result["meta"]["dataset"] = dataset_id
+    return result
+
+
+def _relabel_payload(payload: PoligrasOutput, labels: List[str]) -> None:
+    def label(value) -> str:
+        return labels[int(value)]
+
+    def relabel_edges(edges: List[Dict]) -> None:
+        for edge in edges:
+            edge["source"], edge["target"] = label(edge["source"]), label(edge["target"])
+
+    for graph in payload["graphs"].values():
+        for node in graph["nodes"]:
+            node["id"] = label(node["id"])
+        relabel_edges(graph["edges"])
+
+    artifacts = payload["artifacts"]
+    membership = artifacts["supernodes"]
+    membership["members"] = {
+        label(supernode): [label(node) for node in nodes] for supernode, nodes in membership["members"].items()
+    }
+    membership["node_to_supernode"] = {
+        label(node): label(supernode) for node, supernode in membership["node_to_supernode"].items()
+    }
+    for kind in ("positive", "negative"):
+        relabel_edges(artifacts["corrections"][kind])
+
+    for step in payload.get("timeline", []):
+        for key in ("n1", "n2"):
+            if step.get(key):
+                step[key] = label(step[key])
+
+
+# ----------------------------------------------------------------------
+# Monitor
+# ----------------------------------------------------------------------
+Summarizer = Callable[[str, Dict, bool, Dict], PoligrasOutput]
+
+
+class DriftMonitor:
+    """Re-summarises drifted datasets of a ``SummaryRegistry`` in the background.
+
+    At most ``max_concurrent`` runs execute at a time, each in its own
+    process so training never competes with request handling for the GIL.
+    """
+
+    def __init__(
+        self,
+        registry: SummaryRegistry,
+        policy: Optional[DriftPolicy] = None,
+        summarize: Summarizer = resummarize_core,
+        max_concurrent: int = 1,
+    ):
+        self.registry = registry
+        self.policy = policy or DriftPolicy()
+        self._summarize = summarize
+        self._slots = threading.Semaphore(max_concurrent)
+        self._jobs: Dict[str, DriftJob] = {}
+        self._lock = threading.Lock()
+        registry.add_open_hook(self.watch)
+
+    def watch(self, dataset_id: str, session: VersionedSummary) -> None:
+        session.add_listener(lambda version: self._on_version(dataset_id, session))
+
+    def _on_version(self, dataset_id: str, session: VersionedSummary) -> None:
+        # Runs on the applying thread: stats are O(1) here, and an active
+        # or cooling-down job makes this a dictionary lookup.
+        job = self._jobs.get(dataset_id)
+        if job is not None and (job.active or self._cooling_down(job)):
+            return
+        reason = self.policy.reason(measure_drift(session.baseline_stats, session.current_stats()))
+        if reason is not None:
+            self._schedule(dataset_id, session, reason, force=False)
+
+    def _cooling_down(self, job: DriftJob) -> bool:
+        return job.finished_at is not None and time.time() - job.finished_at < self.policy.cooldown
+
+    def trigger(self, dataset_id: str, reason: str = "manual", force: bool = False) -> Optional[DriftJob]:
+        """Schedule a re-summarisation unless one is active (or, without ``force``, cooling down).
+
+        Returns the new job, or None when nothing was scheduled. Raises
+        ``FileNotFoundError`` when the dataset has no summary.
+        """
+
+        return self._schedule(dataset_id, self.registry.get(dataset_id), reason, force)
+
+    def _schedule(self, dataset_id: str, session: VersionedSummary, reason: str, force: bool) -> Optional[DriftJob]:
+        with self._lock:
+            previous = self._jobs.get(dataset_id)
+            if previous is not None and (previous.active or (not force and self._cooling_down(previous))):
+                return None
+            job = DriftJob(dataset_id=dataset_id, reason=reason, queued_at=time.time())
+            self._jobs[dataset_id] = job
+
+        logger.info("Scheduling re-summarisation of %s: %s", dataset_id, reason)
+        threading.Thread(
+            target=self._run,
+            args=(job, session),
+            name=f"resummarize-{dataset_id}",
+            daemon=True,
+        ).start()
+        return job
+
+    def status(self, dataset_id: str) -> Dict:
+        session = self.registry.get(dataset_id)
+        baseline, current = session.baseline_stats, session.current_stats()
+        drift = measure_drift(baseline, current)
+        job = self._jobs.get(dataset_id)
+        return {
+            "dataset_id": dataset_id,
+            "version": session.version,
+            "policy": asdict(self.policy),
+            "baseline": {"correction_edges": baseline["summary"]["correction_edges"], "total_reward": baseline["total_reward"]},
+            "current": {"correction_edges": current["summary"]["correction_edges"], "total_reward": current["total_reward"]},
+            "drift": drift,
+            "tripped": self.policy.reason(drift),
+            "job": job.as_dict() if job is not None else None,
+        }
+
+    def _run(self, job: DriftJob, session: VersionedSummary) -> None:
+        base_path = self.registry.datasets_root / job.dataset_id / REBASED_OUTPUT_NAME
+        tmp_path = base_path.with_name(base_path.name + ".tmp")
+        with self._slots:
+            job.status = "running"
+            try:
+                job.fork_version, core = session.fork()
+                parameters = self._run_parameters(job.dataset_id)
+                with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+                    payload = pool.submit(self._summarize, job.dataset_id, core, session.state.directed, parameters).result()
+                payload.setdefault("artifacts", {})["version"] = job.fork_version
+
+                # Written before the swap and renamed under the session lock.
+                with tmp_path.open("w", encoding="utf-8") as f:
+                    json.dump(payload, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                state = load_dynamic_state(payload, policy=session.policy, window=session.state.window)
+                state.restore_window(core.get("watermark"), core.get("edge_times", ()))
+                job.swapped_version = session.rebase(state, job.fork_version, on_commit=lambda: os.replace(tmp_path, base_path))
+                job.status = "swapped" if job.swapped_version is not None else "discarded"
+                if job.swapped_version is not None:
+                    write_output_bundle(base_path, payload)
+            except Exception as exc:
+                session.abandon_fork()
+                job.status, job.error = "failed", str(exc)
+                logger.exception("Re-summarisation of %s failed", job.dataset_id)
+            finally:
+                job.finished_at = time.time()
+                tmp_path.unlink(missing_ok=True)
+
+    def _run_parameters(self, dataset_id: str) -> Dict:
+        # Reuse the parameters of the run the current base came from.
+        with self.registry.base_path(dataset_id).open("r", encoding="utf-8") as f:
+            previous = (json.load(f).get("meta") or {}).get("parameters") or {}
+        parameters = {key: previous.get(key, default) for key, default in DEFAULT_RUN_PARAMETERS.items()}
+        if self.policy.counts is not None:
+            parameters["counts"] = self.policy.counts
+        return parameters
@@ -0,0 +1,118 @@
+"""Server-sent event stream of dynamic summary changes.
+
+A subscriber never queues one event per batch. ``VersionedSummary`` only
+flips a per-subscriber flag when a version is applied, and the stream
+renders a single composed diff from the last version it delivered to the
+current one. A slow client therefore gets fewer, larger events instead of an
+ever-growing backlog: the response only pulls the next event once the
+previous one has been written, and everything applied in between is folded
+into that next event. Memory stays bounded per subscriber.
+
+A client that falls behind the retained history gets a ``reset`` event and
+should refetch ``/dynamic-output``.
+
+Listeners only fire for batches applied in this process. When other
+processes (API workers, ``update_ingest``) write to the same dataset, the
+stream also polls the session's update log every ``poll_interval`` seconds
+(``VersionedSummary.refresh``) and catches up on what they logged.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import AsyncIterator, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from backend.summary_versions import VersionedSummary, VersionUnavailableError
+
+DEFAULT_HEARTBEAT = 15.0
+DEFAULT_MIN_INTERVAL = 0.25
+DEFAULT_POLL_INTERVAL = 1.0
+
+
+def compact_event(diff: Dict, include_corrections: bool = False) -> Dict:
+    """Reduce a rendered diff to what live dashboards need.
+
+    Superedge promotions/demotions, supernode changes, stats and version
+    numbers are kept. Correction lists are replaced by counts unless
+    requested, since they dominate the size of a diff.
+    """
+
+    event = {key: value for key, value in diff.items() if key != "corrections"}
+    if include_corrections:
+        event["corrections"] = diff["corrections"]
+    else:
+        event["corrections"] = {
+            kind: {change: len(edges) for change, edges in changes.items()}
+            for kind, changes in diff["corrections"].items()
+        }
+    return event
+
+
+def _format_sse(event: str, data: Dict, event_id: Optional[int] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def summary_event_stream(
+    session: VersionedSummary,
+    since: Optional[int] = None,
+    include_corrections: bool = False,
+    heartbeat: float = DEFAULT_HEARTBEAT,
+    min_interval: float = DEFAULT_MIN_INTERVAL,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+) -> AsyncIterator[str]:
+    """Yield SSE frames for every change after ``since`` (the current version by default).
+
+    At most one event is emitted per ``min_interval``; updates landing in
+    between are coalesced into the next event. Versions written by other
+    processes are noticed within ``poll_interval``.
+    """
+
+    loop = asyncio.get_running_loop()
+    pending = asyncio.Event()
+
+    def _on_version(_version: int) -> None:
+        loop.call_soon_threadsafe(pending.set)
+
+    session.add_listener(_on_version)
+    try:
+        delivered = session.version if since is None else since
+        # The id is what the client has been sent, not the current version:
+        # reconnecting with it as Last-Event-ID must not skip undelivered changes.
+        yield _format_sse("hello", {"version": session.version, "since": delivered}, delivered)
+        last_sent = loop.time()
+
+        while True:
+            current = session.version
+            if current > delivered:
+                try:
+                    diff = await run_in_threadpool(session.diff, delivered, current)
+                except VersionUnavailableError:
+                    yield _format_sse("reset", {"from_version": delivered, "version": current}, current)
+                else:
+                    yield _format_sse("change", compact_event(diff, include_corrections), current)
+                delivered = current
+                last_sent = loop.time()
+                await asyncio.sleep(min_interval)
+                continue
+
+            pending.clear()
+            if session.version > delivered:
+                continue
+            try:
+                await asyncio.wait_for(pending.wait(), timeout=min(poll_interval, heartbeat))
+            except asyncio.TimeoutError:
+                if await run_in_threadpool(session.refresh) > delivered:
+                    continue
+                if loop.time() - last_sent >= heartbeat:
+                    yield ": keepalive\n\n"
+                    last_sent = loop.time()
+    finally:
+        session.remove_listener(_on_version)
@@ -0,0 +1,251 @@
+"""Background summarisation jobs.
+
+A ``JobManager`` runs Poligras fits in worker processes so HTTP handlers
+never train on the event loop or hold a connection open for a whole fit.
+Each job gets its own process and a private scratch directory as working
+directory. The runner keeps its checkpoints in a private directory under the
+dataset directory, and results are written to the dataset directory by
+``run_poligras`` as usual.
+
+The worker streams progress reports from ``PoligrasRunner.fit`` back over a
+pipe. A job can be cancelled while queued or running; a running job's
+process is terminated. At most ``max_workers`` fits run at once; further
+jobs stay queued until a slot frees up.
+
+Runs of one dataset are single-flight across processes: a job holds the
+dataset's ``.poligras-run.lock`` for the whole fit, so a second uvicorn
+worker queues behind it instead of racing on ``output.json``. Jobs
+submitted with ``only_if_missing`` join an active job of the same process,
+or reuse the output another process published while they waited.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+from backend.atomic_files import FileLock
+
+logger = logging.getLogger(__name__)
+
+JobTarget = Callable[[Dict, Callable[[Dict], None]], None]
+
+_FINISHED = ("succeeded", "failed", "cancelled")
+RUN_LOCK_NAME = ".poligras-run.lock"
+
+
+def run_summarization(parameters: Dict, report: Callable[[Dict], None]) -> None:
+    """Default job target: ``run_poligras`` with progress reporting."""
+
+    from backend.run import run_poligras
+
+    run_poligras(SimpleNamespace(**parameters, progress=report))
+
+
+def _job_process(conn: Connection, target: JobTarget, parameters: Dict, workdir: str) -> None:
+    os.chdir(workdir)
+    try:
+        target(parameters, lambda progress: conn.send(("progress", progress)))
+        conn.send(("done", None))
+    except BaseException as exc:
+        conn.send(("error", f"{type(exc).__name__}: {exc}"))
+    finally:
+        conn.close()
+
+
+@dataclass
+class SummaryJob:
+    id: str
+    dataset: str
+    parameters: Dict
+    only_if_missing: bool = False
+    status: str = "queued"  # queued | running | succeeded | failed | cancelled
+    reused_output: bool = False
+    progress: Optional[Dict] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def __post_init__(self) -> None:
+        self._done = threading.Event()
+        self._cancel_requested = False
+        self._process: Optional[mp.process.BaseProcess] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in _FINISHED
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job has finished; returns False on timeout."""
+
+        return self._done.wait(timeout)
+
+    def as_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "dataset": self.dataset,
+            "status": self.status,
+            "parameters": self.parameters,
+            "progress": self.progress,
+            "reused_output": self.reused_output,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Queue of summarisation jobs executed in separate processes."""
+
+    def __init__(
+        self,
+        datasets_root: Path,
+        max_workers: int = 2,
+        target: JobTarget = run_summarization,
+        keep_finished: int = 256,
+    ):
+        self.datasets_root = datasets_root
+        self.max_workers = max_workers
+        self._target = target
+        self._keep_finished = keep_finished
+        self._slots = threading.Semaphore(max_workers)
+        self._jobs: Dict[str, SummaryJob] = {}
+        self._lock = threading.Lock()
+        self._context = mp.get_context("spawn")
+
+    def submit(self, dataset: str, parameters: Dict, only_if_missing: bool = False) -> SummaryJob:
+        """Queue a fit of ``dataset``; ``parameters`` are the ``run_poligras`` arguments besides the dataset.
+
+        With ``only_if_missing`` an active job for the dataset is returned
+        instead of a new one, and the fit is skipped if ``output.json``
+        exists by the time the dataset lock is acquired.
+        """
+
+        with self._lock:
+            if only_if_missing:
+                for active in self._jobs.values():
+                    if active.dataset == dataset and not active.finished:
+                        return active
+            job = SummaryJob(
+                id=uuid.uuid4().hex,
+                dataset=dataset,
+                parameters={**parameters, "dataset": dataset},
+                only_if_missing=only_if_missing,
+            )
+            self._jobs[job.id] = job
+            self._prune()
+        threading.Thread(target=self._run, args=(job,), name=f"job-{job.id[:8]}", daemon=True).start()
+        logger.info("Queued summarisation job %s for %s", job.id, dataset)
+        return job
+
+    def get(self, job_id: str) -> Optional[SummaryJob]:
+        return self._jobs.get(job_id)
+
+    def jobs(self, dataset: Optional[str] = None) -> List[SummaryJob]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job for job in jobs if dataset is None or job.dataset == dataset]
+
+    def cancel(self, job_id: str) -> Optional[SummaryJob]:
+        """Cancel a queued or running job; finished jobs are returned unchanged."""
+
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        with self._lock:
+            job._cancel_requested = True
+            process = job._process
+        if process is not None and process.is_alive():
+            process.terminate()
+        return job
+
+    def _prune(self) -> None:
+        finished = [job for job in self._jobs.values() if job.finished]
+        for job in finished[: max(0, len(finished) - self._keep_finished)]:
+            del self._jobs[job.id]
+
+    def _finish(self, job: SummaryJob, status: str, error: Optional[str] = None) -> None:
+        job.status, job.error, job.finished_at = status, error, time.time()
+        job._done.set()
+        logger.info("Summarisation job %s for %s %s%s", job.id, job.dataset, status, f": {error}" if error else "")
+
+    def _run(self, job: SummaryJob) -> None:
+        dataset_dir = self.datasets_root / job.dataset
+        lock = FileLock(dataset_dir / RUN_LOCK_NAME)
+        try:
+            # Polled so a cancellation is noticed while another process runs the dataset.
+            if not lock.acquire(cancelled=lambda: job._cancel_requested):
+                self._finish(job, "cancelled")
+                return
+        except Exception as exc:
+            logger.exception("Summarisation job %s could not lock %s", job.id, dataset_dir)
+            self._finish(job, "failed", str(exc))
+            return
+        try:
+            if job.only_if_missing and (dataset_dir / "output.json").exists():
+                job.reused_output = True
+                self._finish(job, "succeeded")
+                return
+            self._execute(job)
+        finally:
+            lock.release()
+
+    def _execute(self, job: SummaryJob) -> None:
+        with self._slots:
+            workdir = tempfile.mkdtemp(prefix=f"poligras-job-{job.id[:8]}-")
+            try:
+                with self._lock:
+                    if job._cancel_requested:
+                        self._finish(job, "cancelled")
+                        return
+                    receiver, sender = self._context.Pipe(duplex=False)
+                    job._process = self._context.Process(
+                        target=_job_process,
+                        args=(sender, self._target, job.parameters, workdir),
+                        name=f"poligras-job-{job.id[:8]}",
+                        daemon=True,
+                    )
+                    job._process.start()
+                    job.status, job.started_at = "running", time.time()
+                sender.close()
+
+                outcome: Optional[str] = None
+                error: Optional[str] = None
+                while True:
+                    try:
+                        kind, payload = receiver.recv()
+                    except EOFError:
+                        break
+                    if kind == "progress":
+                        job.progress = payload
+                    elif kind == "done":
+                        outcome = "succeeded"
+                    else:
+                        outcome, error = "failed", payload
+                receiver.close()
+                job._process.join()
+
+                if outcome is None:
+                    if job._cancel_requested:
+                        outcome = "cancelled"
+                    else:
+                        outcome, error = "failed", f"Worker exited with code {job._process.exitcode}"
+                self._finish(job, outcome, error)
+            except Exception as exc:
+                logger.exception("Summarisation job %s could not be run", job.id)
+                self._finish(job, "failed", str(exc))
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,670 @@
+"""Versioned dynamic summaries with compact diffs between versions.
+
+Every batch applied through a ``VersionedSummary`` bumps its version by one
+and keeps the batch's ``SummaryChanges``. A client holding version N can ask
+for the diff to any later retained version instead of re-downloading the
+whole ``PoligrasOutput``; version 0 is the summary the session started from.
+
+Any retained version can be read back (``snapshot_at``) or restored with
+``rollback``. A rollback is itself a new version: it restores the pair and
+supernode images recorded in the history, so it costs time proportional to
+the changes undone. Readers that arrive while a batch is being applied are
+served the last published version instead of waiting.
+
+Sessions opened through ``SummaryRegistry`` are durable: every batch is
+written to the dataset's ``UpdateLog`` before it is applied, and the session
+is recovered from the log's snapshot plus replay when it is first loaded.
+The log records the session's engine configuration and refuses sessions
+configured differently, and a logged batch that fails to replay is an
+``UpdateLogError`` rather than being skipped; batches are validated before
+they are logged.
+When several processes serve the same dataset, each write holds the log's
+file lock and first replays what the others logged since, so versions stay
+one sequence across processes. A session that finds a snapshot newer than
+its own version (another process compacted or rebased past it) reloads
+from that snapshot; its history restarts there. The base summary is read
+from its binary bundle (see ``artifact_bundle``) when an up-to-date one
+exists.
+
+A session can also be rebased onto a freshly re-summarised state (see
+``summary_drift``): ``fork`` hands out the current core and starts queueing
+incoming batches, and ``rebase`` replays them onto the new state and swaps
+it in as a new version. History does not span the swap.
+
+A session without a maintenance policy or window can keep its state in a
+``ShardedDynamicEngine`` (``shards`` > 1): the worker processes are started
+once, after recovery, and every later batch is applied by them in parallel.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from collections import deque
+from contextlib import nullcontext
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple, Union
+
+from backend.artifact_bundle import ArtifactBundle
+from backend.dynamic_updates import (
+    EdgeUpdate,
+    MaintenancePolicy,
+    SummaryChanges,
+    UpdateStreamError,
+    load_dynamic_state,
+)
+from backend.output_types import PoligrasOutput
+from backend.sharded_updates import ShardedDynamicEngine
+from backend.update_log import LogEntry, RollbackRecord, UpdateLog, UpdateLogError
+
+# A parsed output, or its binary bundle when an up-to-date one exists.
+BaseSummary = Union[PoligrasOutput, ArtifactBundle]
+
+DEFAULT_HISTORY_LIMIT = 256
+REBASED_OUTPUT_NAME = "output_resummarized.json"
+# A rebase swaps once no more than this many batches are left to replay.
+_REBASE_CATCH_UP_BATCHES = 4
+logger = logging.getLogger(__name__)
+
+
+class VersionUnavailableError(LookupError):
+    """Raised when a requested version range is no longer (or not yet) retained."""
+
+
+class VersionedSummary:
+    """Thread-safe dynamic state for one dataset plus its recent change history."""
+
+    def __init__(
+        self,
+        payload: BaseSummary,
+        policy: Optional[MaintenancePolicy] = None,
+        history_limit: int = DEFAULT_HISTORY_LIMIT,
+        log: Optional[UpdateLog] = None,
+        base_loader: Optional[Callable[[], BaseSummary]] = None,
+        window: Optional[float] = None,
+        shards: int = 1,
+    ):
+        if shards > 1 and (policy is not None or window is not None):
+            raise ValueError("A sharded session cannot use a maintenance policy or window")
+        self.shards = shards
+        self.state = load_dynamic_state(payload, policy=policy, window=window)
+        self.version = self.state.base_version
+        self.base_version = self.version
+        self._history: Deque[Tuple[int, SummaryChanges]] = deque(maxlen=history_limit)
+        self._lock = threading.RLock()
+        self.log = log
+        self._base_loader = base_loader
+        self._listeners: List[Callable[[int], None]] = []
+        self._published: Optional[Tuple[int, str]] = None
+        # Batches applied since ``fork``, kept for replay by ``rebase``.
+        self._forked: Optional[List[Tuple[int, LogEntry]]] = None
+        self._fork_version: Optional[int] = None
+        # Stats of the full run the session is based on, for drift checks.
+        self.baseline_stats: Dict = self.state.current_stats()
+        if log is not None:
+            log.claim(self.engine_config())
+            self._recover()
+        if shards > 1:
+            self.state = ShardedDynamicEngine.from_state(self.state, shards)
+
+    def _recover(self) -> None:
+        assert self.log is not None
+        with self.log.exclusive():
+            snapshot = self.log.changed_snapshot()
+            if snapshot is not None:
+                self.base_version, core = snapshot
+                self.version = self.base_version
+                self.state.restore_core(core)
+            replayed = 0
+            for version, entry in self.log.tail(self.version):
+                self._apply(entry, version)
+                replayed += 1
+        if snapshot is not None or replayed:
+            logger.info(
+                "Recovered %s at v%d (snapshot v%d + %d logged batches)",
+                self.log.dataset_dir.name, self.version, self.base_version, replayed,
+            )
+
+    @property
+    def policy(self) -> Optional[MaintenancePolicy]:
+        return self.state.policy
+
+    def engine_config(self) -> Dict:
+        """Engine settings the log is written under; recorded in its headers (see ``UpdateLog.claim``)."""
+
+        policy = self.policy
+        return {
+            "policy": asdict(policy) if policy is not None else None,
+            "window": self.state.window,
+            "shards": self.shards,
+        }
+
+    @property
+    def oldest_version(self) -> int:
+        """Oldest version a diff can start from."""
+
+        with self._lock:
+            if len(self._history) == self._history.maxlen:
+                return self._history[0][0] - 1
+            return self.base_version
+
+    def check(self, update: EdgeUpdate) -> None:
+        self.state.check(update)
+
+    def apply_updates(self, updates: Iterable[EdgeUpdate]) -> int:
+        """Apply one batch as a new version and return the version number.
+
+        With a log attached the batch is validated and made durable before
+        it is applied, and a background compaction is scheduled once the log
+        is large.
+        """
+
+        updates = list(updates)
+        with self._lock, self._log_lock():
+            self._catch_up()
+            version = self.version + 1
+            if self.log is not None:
+                # A logged batch must replay, so reject it before it reaches the log.
+                for update in updates:
+                    self.state.check(update)
+                self.log.append(version, updates)
+            self._apply(updates, version)
+            if self._forked is not None:
+                self._forked.append((version, updates))
+
+        self._notify(version)
+        if self.log is not None and self._base_loader is not None and self.log.should_compact():
+            self.log.compact_in_background(self._fresh_state)
+        return version
+
+    def rollback(self, to_version: int) -> int:
+        """Make the state of ``to_version`` current again, as a new version.
+
+        Raises ``VersionUnavailableError`` when ``to_version`` is not retained.
+        """
+
+        with self._lock, self._log_lock():
+            self._catch_up()
+            changes = self.changes_between(to_version, self.version)
+            record = RollbackRecord(
+                to_version=to_version,
+                pairs=dict(changes.undo),
+                supernodes={supernode: before for supernode, (before, _) in changes.supernodes.items()},
+            )
+            version = self.version + 1
+            if self.log is not None:
+                self.log.append_rollback(version, record)
+            self._apply(record, version)
+            if self._forked is not None:
+                self._forked.append((version, record))
+        logger.info("Rolled back to v%d as v%d", to_version, version)
+        self._notify(version)
+        return version
+
+    def refresh(self) -> int:
+        """Pick up versions other processes logged since this session last looked; returns the current version.
+
+        Cheap when nothing changed, so long-lived readers (``summary_events``)
+        can poll it; listeners are notified when the version moved.
+        """
+
+        if self.log is None or not self.log.changed_since_read():
+            return self.version
+        with self._lock, self._log_lock():
+            before = self.version
+            self._catch_up()
+            version = self.version
+        if version != before:
+            self._notify(version)
+        return version
+
+    def _log_lock(self):
+        return self.log.exclusive() if self.log is not None else nullcontext()
+
+    def _catch_up(self) -> None:
+        """Apply what other processes logged since this one last read the log; the log lock must be held."""
+
+        if self.log is None:
+            return
+        snapshot = self.log.changed_snapshot()
+        if snapshot is not None and snapshot[0] > self.version:
+            self._reload(*snapshot)
+        for version, entry in self.log.tail(self.version):
+            self._apply(entry, version)
+            if self._forked is not None:
+                self._forked.append((version, entry))
+
+    def _reload(self, version: int, core: Dict) -> None:
+        """Replace the state by a snapshot another process wrote past this session's version."""
+
+        assert self.log is not None
+        logger.info(
+            "Reloading %s from snapshot v%d written by another process (was v%d)",
+            self.log.dataset_dir.name, version, self.version,
+        )
+        if self._base_loader is not None:
+            # The other process may have rebased onto a new base file.
+            state = self._fresh_state()
+            self.baseline_stats = state.current_stats()
+            state.restore_core(core)
+            self._swap_state(state)
+        else:
+            self.state.restore_core(core)
+        self.version = self.base_version = version
+        self._history.clear()
+        self._forked = None
+
+    def _swap_state(self, state) -> None:
+        """Make ``state`` live, sharding it like the state it replaces."""
+
+        previous = self.state
+        self.state = ShardedDynamicEngine.from_state(state, self.shards) if self.shards > 1 else state
+        if isinstance(previous, ShardedDynamicEngine):
+            previous.close()
+
+    def close(self) -> None:
+        """Stop the session's shard processes, if any."""
+
+        with self._lock:
+            if isinstance(self.state, ShardedDynamicEngine):
+                self.state.close()
+
+    def current_stats(self) -> Dict:
+        with self._lock:
+            return self.state.current_stats()
+
+    def fork(self) -> Tuple[int, Dict]:
+        """Return the current version and core, and queue later batches for ``rebase``."""
+
+        with self._lock:
+            self._forked = []
+            self._fork_version = self.version
+            return self.version, self.state.export_core()
+
+    def abandon_fork(self) -> None:
+        with self._lock:
+            self._forked = None
+
+    def rebase(self, state, fork_version: int, on_commit: Optional[Callable[[], None]] = None) -> Optional[int]:
+        """Swap in ``state``, a new summary of the graph as of ``fork_version``.
+
+        Batches applied since ``fork`` are replayed onto ``state``, mostly
+        without holding the session lock; only the last few are applied
+        under it, right before the swap. ``on_commit`` runs under the lock
+        just before the swap (e.g. to move the new base file into place).
+        The swap is a new version with no diff to earlier ones. Returns
+        that version, or None when the fork was abandoned or a rollback
+        happened meanwhile (its images do not apply to the new membership).
+        """
+
+        baseline = state.current_stats()
+        replayed = 0
+        while True:
+            with self._lock:
+                if self._forked is None or self._fork_version != fork_version:
+                    return None
+                backlog = self._forked[replayed:]
+                if len(backlog) <= _REBASE_CATCH_UP_BATCHES:
+                    # The swap version and its snapshot must not race another process's append.
+                    with self._log_lock():
+                        self._catch_up()
+                        if self._forked is None:
+                            return None
+                        if not self._replay_onto(state, self._forked[replayed:]):
+                            self._forked = None
+                            return None
+                        if on_commit is not None:
+                            on_commit()
+                        version = self.version + 1
+                        core = state.export_core() if self.log is not None else None
+                        self._swap_state(state)
+                        self.version = self.base_version = version
+                        self._history.clear()
+                        self._forked = None
+                        self.baseline_stats = baseline
+                        if core is not None:
+                            self.log.rebase(version, core)
+                    break
+            if not self._replay_onto(state, backlog):
+                self.abandon_fork()
+                return None
+            replayed += len(backlog)
+
+        logger.info("Rebased onto a re-summarised state from v%d as v%d", fork_version, version)
+        self._notify(version)
+        return version
+
+    @staticmethod
+    def _replay_onto(state, entries: List[Tuple[int, LogEntry]]) -> bool:
+        for version, entry in entries:
+            if isinstance(entry, RollbackRecord):
+                logger.info("Rollback v%d happened during re-summarisation; discarding the result", version)
+                return False
+            try:
+                state.apply_updates(entry)
+            except UpdateStreamError as exc:
+                logger.warning("Batch v%d could not be replayed onto the rebased state; discarding it: %s", version, exc)
+                return False
+        return True
+
+    def _notify(self, version: int) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(version)
+            except Exception:
+                logger.exception("Version listener failed")
+
+    def add_listener(self, listener: Callable[[int], None]) -> None:
+        """Call ``listener(version)`` after every applied batch.
+
+        Listeners run on the applying thread and must return quickly.
+        """
+
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[int], None]) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _apply(self, entry: LogEntry, version: int) -> None:
+        self.state.begin_changes()
+        try:
+            if isinstance(entry, RollbackRecord):
+                entry.apply_to(self.state)
+            else:
+                self.state.apply_updates(entry)
+        except UpdateStreamError as exc:
+            if self.log is None:
+                raise
+            raise UpdateLogError(f"Logged batch v{version} could not be applied: {exc}") from exc
+        finally:
+            changes = self.state.collect_changes()
+        self.version = version
+        self._history.append((version, changes))
+
+    def _fresh_state(self):
+        assert self._base_loader is not None
+        return load_dynamic_state(self._base_loader(), policy=self.policy, window=self.state.window)
+
+    def changes_between(self, from_version: int, to_version: Optional[int] = None) -> SummaryChanges:
+        with self._lock:
+            to_version = self.version if to_version is None else to_version
+            if from_version > to_version or to_version > self.version:
+                raise VersionUnavailableError(
+                    f"Invalid version range {from_version}..{to_version} (current version is {self.version})"
+                )
+            if from_version < self.oldest_version:
+                raise VersionUnavailableError(
+                    f"Version {from_version} is older than the retained history (oldest {self.oldest_version})"
+                )
+
+            composed = SummaryChanges()
+            for version, changes in self._history:
+                if from_version < version <= to_version:
+                    composed = composed.then(changes)
+            return composed
+
+    def diff(self, from_version: int, to_version: Optional[int] = None) -> Dict:
+        with self._lock:
+            to_version = self.version if to_version is None else to_version
+            changes = self.changes_between(from_version, to_version)
+            if not changes.stats_after:
+                changes.stats_before = changes.stats_after = self._stats_at(to_version)
+            return render_diff(changes, from_version, to_version)
+
+    def _stats_at(self, version: int) -> Dict:
+        for recorded_version, changes in self._history:
+            if recorded_version == version:
+                return changes.stats_after
+        if self._history and self._history[0][0] == version + 1:
+            return self._history[0][1].stats_before
+        return self.state.current_stats()
+
+    def snapshot(self) -> PoligrasOutput:
+        """Materialise the current version; the result must not be mutated."""
+
+        with self._lock:
+            payload = self.state.materialise()
+            payload.setdefault("artifacts", {})["version"] = self.version
+            return payload
+
+    def snapshot_json(self) -> str:
+        """Serialise the current version; cached per version.
+
+        While another thread is applying a batch, the last published version
+        is returned instead of blocking, so readers always see a complete
+        version.
+        """
+
+        return self.published_snapshot()[1]
+
+    def published_snapshot(self) -> Tuple[int, str]:
+        """``(version, json)`` of the version ``snapshot_json`` would return."""
+
+        if not self._lock.acquire(blocking=False):
+            published = self._published
+            if published is not None:
+                return published
+            self._lock.acquire()
+        try:
+            if self._published is None or self._published[0] != self.version:
+                self._published = (self.version, json.dumps(self.snapshot()))
+            return self._published
+        finally:
+            self._lock.release()
+
+    def snapshot_at(self, version: int) -> PoligrasOutput:
+        """Full summary as of a retained ``version``.
+
+        Built from the current snapshot by reverting the composed changes, so
+        the live state is never touched.
+        """
+
+        with self._lock:
+            changes = self.changes_between(version, self.version)
+            payload = json.loads(self.snapshot_json())
+        if version != payload["artifacts"]["version"]:
+            _revert_payload(payload, changes)
+            payload["artifacts"]["version"] = version
+        return payload
+
+
+def render_diff(changes: SummaryChanges, from_version: int, to_version: int) -> Dict:
+    """Turn composed ``SummaryChanges`` into the JSON diff served to clients."""
+
+    superedges: Dict[str, List[Dict]] = {"added": [], "removed": [], "changed": []}
+    for (source, target), (before, after) in sorted(changes.superedges.items()):
+        if before is None:
+            superedges["added"].append(after)
+        elif after is None:
+            superedges["removed"].append({"source": source, "target": target})
+        else:
+            superedges["changed"].append(after)
+
+    corrections: Dict[str, Dict[str, List[Dict[str, str]]]] = {
+        "positive": {"added": [], "removed": []},
+        "negative": {"added": [], "removed": []},
+    }
+    for (source, target), (before, after) in sorted(changes.corrections.items()):
+        edge = {"source": source, "target": target}
+        if before is not None:
+            corrections[before]["removed"].append(edge)
+        if after is not None:
+            corrections[after]["added"].append(edge)
+
+    supernodes: Dict[str, List] = {"upserted": [], "removed": []}
+    for supernode, (_, after) in sorted(changes.supernodes.items()):
+        if after is None:
+            supernodes["removed"].append(supernode)
+        else:
+            supernodes["upserted"].append({"id": supernode, "size": len(after), "members": after})
+
+    return {
+        "from_version": from_version,
+        "to_version": to_version,
+        "superedges": superedges,
+        "corrections": corrections,
+        "supernodes": supernodes,
+        "stats": changes.stats_after,
+        "stats_delta": _numeric_delta(changes.stats_before, changes.stats_after),
+    }
+
+
+def _revert_payload(payload: PoligrasOutput, changes: SummaryChanges) -> None:
+    """Undo ``changes`` on a materialised payload in place (output-level counterpart of ``restore_images``)."""
+
+    summary_graph = payload["graphs"]["summary"]
+    artifacts = payload["artifacts"]
+
+    edges = {(edge["source"], edge["target"]): edge for edge in summary_graph["edges"]}
+    for pair, (before, _) in changes.superedges.items():
+        edges.pop(pair, None)
+        if before is not None:
+            edges[pair] = before
+    summary_graph["edges"] = list(edges.values())
+
+    corrections = {
+        kind: {(edge["source"], edge["target"]) for edge in artifacts["corrections"][kind]}
+        for kind in ("positive", "negative")
+    }
+    for edge_key, (before, after) in changes.corrections.items():
+        if after is not None:
+            corrections[after].discard(edge_key)
+        if before is not None:
+            corrections[before].add(edge_key)
+    artifacts["corrections"] = {
+        kind: [{"source": source, "target": target} for source, target in sorted(edge_set)]
+        for kind, edge_set in corrections.items()
+    }
+
+    if changes.supernodes:
+        members = artifacts["supernodes"]["members"]
+        node_to_supernode = artifacts["supernodes"]["node_to_supernode"]
+        for supernode, (_, after) in changes.supernodes.items():
+            for node in after or ():
+                if node_to_supernode.get(node) == supernode:
+                    del node_to_supernode[node]
+            members.pop(supernode, None)
+        for supernode, (before, _) in changes.supernodes.items():
+            if before is not None:
+                members[supernode] = before
+                for node in before:
+                    node_to_supernode[node] = supernode
+        summary_graph["nodes"] = [{"id": supernode, "size": len(nodes)} for supernode, nodes in members.items()]
+
+    summary_graph["edge_count"] = len(summary_graph["edges"])
+    summary_graph["node_count"] = len(summary_graph["nodes"])
+    summary_graph["correction_edge_count"] = sum(len(edge_set) for edge_set in corrections.values())
+    if changes.stats_before:
+        payload["stats"] = changes.stats_before
+
+
+def _numeric_delta(before: Dict, after: Dict) -> Dict:
+    delta: Dict = {}
+    for key, value in after.items():
+        previous = before.get(key)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            nested = _numeric_delta(previous, value)
+            if nested:
+                delta[key] = nested
+        elif isinstance(value, (int, float)) and isinstance(previous, (int, float)) and value != previous:
+            delta[key] = value - previous
+    return delta
+
+
+class SummaryRegistry:
+    """Process-wide cache of ``VersionedSummary`` objects keyed by dataset id."""
+
+    def __init__(
+        self,
+        datasets_root: Path,
+        policy: Optional[MaintenancePolicy] = None,
+        window: Optional[float] = None,
+        shards: int = 1,
+    ):
+        self.datasets_root = datasets_root
+        self.policy = policy
+        self.window = window
+        self.shards = shards
+        self._sessions: Dict[str, VersionedSummary] = {}
+        self._open_hooks: List[Callable[[str, VersionedSummary], None]] = []
+        self._lock = threading.Lock()
+
+    def add_open_hook(self, hook: Callable[[str, VersionedSummary], None]) -> None:
+        """Call ``hook(dataset_id, session)`` whenever a session is first loaded."""
+
+        self._open_hooks.append(hook)
+
+    def base_path(self, dataset_id: str) -> Path:
+        """File the dataset's dynamic summary is based on.
+
+        A re-summarised base (``output_resummarized.json``) takes precedence
+        over the original ``output.json``, which is left untouched.
+        """
+
+        dataset_dir = self.datasets_root / dataset_id
+        for name in (REBASED_OUTPUT_NAME, "output.json"):
+            if (dataset_dir / name).exists():
+                return dataset_dir / name
+        return dataset_dir / "output_dynamic.json"
+
+    def get(self, dataset_id: str) -> VersionedSummary:
+        """Return the session for ``dataset_id``, recovering it from disk on first use.
+
+        The base is ``base_path``; the dataset's update log is replayed on
+        top. A pre-existing ``output_dynamic.json`` without a log is migrated
+        into an initial snapshot. Raises ``FileNotFoundError`` when the
+        dataset has no summary yet.
+        """
+
+        with self._lock:
+            session = self._sessions.get(dataset_id)
+            if session is None:
+                session = self._open(self.datasets_root / dataset_id)
+                self._sessions[dataset_id] = session
+                for hook in self._open_hooks:
+                    hook(dataset_id, session)
+            return session
+
+    def _open(self, dataset_dir: Path) -> VersionedSummary:
+        dynamic_path = dataset_dir / "output_dynamic.json"
+        base_path = self.base_path(dataset_dir.name)
+        if not base_path.exists():
+            raise FileNotFoundError(f"No summary found for dataset '{dataset_dir.name}'")
+
+        def _load_base() -> BaseSummary:
+            # Resolved on every call: a rebase may have replaced the base.
+            path = self.base_path(dataset_dir.name)
+            bundle = ArtifactBundle.for_output(path)
+            if bundle is not None:
+                return bundle
+            with path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+
+        log = UpdateLog(dataset_dir)
+        migrate = not log.exists() and dynamic_path.exists() and base_path != dynamic_path
+        if migrate:
+            with dynamic_path.open("r", encoding="utf-8") as f:
+                payload = json.load(f)
+        else:
+            payload = _load_base()
+
+        session = VersionedSummary(
+            payload, policy=self.policy, log=log, base_loader=_load_base, window=self.window, shards=self.shards
+        )
+        if migrate:
+            with log.exclusive():
+                # Another process may have migrated (and logged) first.
+                if not log.exists():
+                    log.write_snapshot(session.version, session.state.export_core())
+        return session
+
+    def discard(self, dataset_id: str) -> None:
+        with self._lock:
+            session = self._sessions.pop(dataset_id, None)
+        if session is not None:
+            session.close()
@@ -0,0 +1,164 @@
+"""The supergraph a Poligras fit merges, kept as changes over the CSR graph.
+
+A fit starts from the initial graph, every edge a superedge of weight 1
+with ``if_true`` set, and rewrites it one merge at a time. ``SuperGraph``
+reads rows nothing has touched straight from the memory-mapped
+``CSRGraph`` and only holds the rows merges have changed (the merged
+supernodes and their neighbours), so a fit never copies the whole graph
+into networkx and its checkpoints are the changes alone.
+
+It implements the part of the networkx graph API ``PoligrasRunner`` uses:
+``graph[node]`` maps a node's neighbours (successors if directed) to their
+``{'weight', 'if_true'}`` edge attribute dicts, shared by both ends as in
+networkx, plus ``add_edge``, ``remove_node``, ``number_of_nodes`` and
+``number_of_edges``. Rows are read-only until ``materialise`` has been
+called for their nodes.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Hashable, Iterable, List, Sequence, Set, Tuple
+
+from backend.csr_graph import CSRGraph
+
+Node = Hashable
+Attributes = Dict[str, object]
+# (source, target, weight, if_true) of one changed edge.
+EdgeRecord = Tuple[Node, Node, object, bool]
+# Unchanged rows built from the CSR that are kept for repeated lookups; scoring a merge reads two rows many times.
+VIEW_CACHE_SIZE = 4
+
+
+class SuperGraph:
+    """Initial graph plus the rows changed by merges; see the module docstring."""
+
+    def __init__(self, graph: CSRGraph, node_ids: Sequence[Node], row_of: Dict[Node, int]):
+        self.graph = graph
+        self.directed = graph.directed
+        self._ids = node_ids
+        self._row_of = row_of
+        self._succ: Dict[Node, Dict[Node, Attributes]] = {}
+        # Rows of incoming edges; an undirected graph's are its rows.
+        self._pred: Dict[Node, Dict[Node, Attributes]] = {} if self.directed else self._succ
+        self._removed: Set[Node] = set()
+        self._views: Dict[Node, Dict[Node, Attributes]] = {}
+        self._edges = graph.num_edges
+
+    # ------------------------------------------------------------------
+    # networkx-style access
+    # ------------------------------------------------------------------
+    def __getitem__(self, node: Node) -> Dict[Node, Attributes]:
+        row = self._succ.get(node)
+        if row is not None:
+            return row
+        if node in self._removed or node not in self._row_of:
+            raise KeyError(node)
+        row = self._views.get(node)
+        if row is None:
+            if len(self._views) >= VIEW_CACHE_SIZE:
+                self._views.pop(next(iter(self._views)))
+            row = self._views[node] = {
+                self._ids[col]: {'weight': 1, 'if_true': True} for col in self.graph.neighbours(self._row_of[node]).tolist()
+            }
+        return row
+
+    def number_of_nodes(self) -> int:
+        return self.graph.num_nodes - len(self._removed)
+
+    def number_of_edges(self) -> int:
+        return self._edges
+
+    def add_edge(self, source: Node, target: Node, **attributes) -> None:
+        self.materialise((source, target))
+        existing = self._succ[source].get(target)
+        if existing is not None:
+            existing.update(attributes)
+            return
+        self._succ[source][target] = self._pred[target][source] = dict(attributes)
+        self._edges += 1
+
+    def remove_node(self, node: Node) -> None:
+        self.materialise(self._closed_neighbourhood(node))
+        successors, predecessors = self._succ.pop(node), self._pred.pop(node, {})
+        for target in successors:
+            if target != node:
+                del self._pred[target][node]
+        if self.directed:
+            for source in predecessors:
+                if source != node:
+                    del self._succ[source][node]
+            self._edges -= len(successors) + len(predecessors) - (node in successors)
+        else:
+            self._edges -= len(successors)
+        self._removed.add(node)
+
+    # ------------------------------------------------------------------
+    # Changed rows
+    # ------------------------------------------------------------------
+    def materialise(self, nodes: Iterable[Node]) -> None:
+        """Make the rows of ``nodes`` writable, sharing edge attributes with rows already held."""
+
+        for node in nodes:
+            if node in self._succ:
+                continue
+            if node in self._removed or node not in self._row_of:
+                raise KeyError(node)
+            self._views.pop(node, None)
+            row = self._row_of[node]
+            self._succ[node] = {
+                target: self._pred[target][node] if target in self._succ else {'weight': 1, 'if_true': True}
+                for target in (self._ids[col] for col in self.graph.neighbours(row).tolist())
+            }
+            if self.directed:
+                self._pred[node] = {
+                    source: self._succ[source][node] if source in self._succ else {'weight': 1, 'if_true': True}
+                    for source in (self._ids[col] for col in self.graph.predecessors(row).tolist())
+                }
+
+    def materialise_merge(self, keep: Node, absorb: Node) -> None:
+        """Make writable every row merging ``absorb`` into ``keep`` rewrites."""
+
+        self.materialise(self._closed_neighbourhood(keep) | self._closed_neighbourhood(absorb))
+
+    def _closed_neighbourhood(self, node: Node) -> Set[Node]:
+        nodes = {node, *self[node]}
+        if self.directed:
+            row = self._pred.get(node)
+            nodes.update(row if row is not None else (self._ids[col] for col in self.graph.predecessors(self._row_of[node]).tolist()))
+        return nodes
+
+    def changes(self) -> Dict:
+        """What differs from the initial graph: the held rows with their edges, and the removed nodes."""
+
+        edges: List[EdgeRecord] = []
+        seen: Set[int] = set()
+        for node, row in self._succ.items():
+            for target, attributes in row.items():
+                if id(attributes) not in seen:
+                    seen.add(id(attributes))
+                    edges.append((node, target, attributes['weight'], attributes['if_true']))
+        if self.directed:
+            for node, row in self._pred.items():
+                for source, attributes in row.items():
+                    if id(attributes) not in seen:
+                        seen.add(id(attributes))
+                        edges.append((source, node, attributes['weight'], attributes['if_true']))
+        return {'held': list(self._succ), 'removed': list(self._removed), 'edges': edges, 'num_edges': self._edges}
+
+    def restore(self, changes: Dict) -> None:
+        """Reset to the initial graph with ``changes`` (as returned by ``changes()``) applied."""
+
+        self._succ.clear()
+        self._pred.clear()
+        self._views.clear()
+        for node in changes['held']:
+            self._succ[node] = {}
+            self._pred[node] = {}
+        for source, target, weight, if_true in changes['edges']:
+            attributes = {'weight': weight, 'if_true': if_true}
+            if source in self._succ:
+                self._succ[source][target] = attributes
+            if target in self._pred:
+                self._pred[target][source] = attributes
+        self._removed = set(changes['removed'])
+        self._edges = changes['num_edges']
@@ -0,0 +1,225 @@
+"""Per-supernode indexes for drilling into a stored summary.
+
+A ``SupernodeIndex`` is built once from an ``ArtifactBundle``. It keeps
+CSR tables from each supernode to its incident superedges and to the
+corrections touching it, plus a node -> supernode array. With these, the
+members of one supernode, the original edges inside it and the original
+edges between it and a neighbour are reconstructed without touching the
+rest of the summary.
+
+Original edges follow the summary encoding: a superedge between A and B
+stands for every node pair across A and B (every pair inside A for a
+self-loop), minus the negative corrections on that pair. Pairs without a
+superedge only have their positive corrections.
+"""
+
+from __future__ import annotations
+
+import math
+from itertools import combinations, islice, permutations, product
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from backend.artifact_bundle import ArtifactBundle
+
+DEFAULT_EDGE_LIMIT = 10_000
+
+EdgeKey = Tuple[str, str]
+
+
+def _csr(owner: np.ndarray, item: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(owner, kind="stable")
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owner, minlength=size), out=offsets[1:])
+    return offsets, item[order]
+
+
+def _incidence(rows: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR from supernode row to the (k, 2) entries whose endpoints lie in it."""
+
+    if len(rows) == 0:
+        return np.zeros(size + 1, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    entries = np.arange(len(rows))
+    cross = rows[:, 0] != rows[:, 1]
+    return _csr(np.concatenate([rows[:, 0], rows[cross, 1]]), np.concatenate([entries, entries[cross]]), size)
+
+
+class SupernodeIndex:
+    """Read-only drill-down index over one bundle."""
+
+    def __init__(self, bundle: ArtifactBundle):
+        self.bundle = bundle
+        self.directed = bundle.directed
+        label_count = len(bundle.column("labels.offsets")) - 1
+
+        self._supernodes = bundle.column("members.supernode")
+        self._member_offsets = bundle.column("members.offsets")
+        self._member_nodes = bundle.column("members.node")
+        count = len(self._supernodes)
+        self._row_of: Dict[str, int] = {bundle.label(int(label)): row for row, label in enumerate(self._supernodes.tolist())}
+
+        super_row = np.full(label_count, -1, dtype=np.int64)
+        super_row[self._supernodes] = np.arange(count)
+        node_super = np.full(label_count, -1, dtype=np.int64)
+        node_super[self._member_nodes] = np.repeat(np.arange(count), np.diff(self._member_offsets))
+
+        # Superedges and corrections whose endpoints are not in the membership are dropped.
+        self._superedge_rows = super_row[bundle.column("summary.edges")].reshape(-1, 2)
+        keep = (self._superedge_rows >= 0).all(axis=1)
+        self._superedges = np.flatnonzero(keep)
+        self._superedge_csr = _incidence(self._superedge_rows[keep], count)
+
+        self._corrections: Dict[str, Tuple[np.ndarray, np.ndarray, Tuple[np.ndarray, np.ndarray]]] = {}
+        for kind in ("positive", "negative"):
+            pairs = bundle.column(f"corrections.{kind}")
+            rows = node_super[pairs].reshape(-1, 2)
+            keep = (rows >= 0).all(axis=1)
+            self._corrections[kind] = (np.flatnonzero(keep), rows[keep], _incidence(rows[keep], count))
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate heap held by the index (memory-mapped columns excluded)."""
+
+        arrays = [self._superedge_rows, self._superedges, *self._superedge_csr]
+        for positions, rows, csr in self._corrections.values():
+            arrays.extend((positions, rows, *csr))
+        # Roughly 100 bytes per supernode id string and dict slot.
+        return sum(array.nbytes for array in arrays) + 100 * len(self._row_of)
+
+    def __contains__(self, supernode: str) -> bool:
+        return supernode in self._row_of
+
+    def members(self, supernode: str) -> List[str]:
+        row = self._row_of[supernode]
+        start, end = self._member_offsets[row], self._member_offsets[row + 1]
+        return [self.bundle.label(int(node)) for node in self._member_nodes[start:end].tolist()]
+
+    def _matches(self, rows: np.ndarray, a: int, b: int) -> bool:
+        if self.directed:
+            return rows[0] == a and rows[1] == b
+        return {int(rows[0]), int(rows[1])} == {a, b}
+
+    def _superedge(self, a: int, b: int) -> Optional[int]:
+        offsets, entries = self._superedge_csr
+        for entry in entries[offsets[a]:offsets[a + 1]].tolist():
+            if self._matches(self._superedge_rows[self._superedges[entry]], a, b):
+                return int(self._superedges[entry])
+        return None
+
+    def _correction_pairs(self, kind: str, a: int, b: int) -> List[EdgeKey]:
+        positions, rows, (offsets, entries) = self._corrections[kind]
+        column = self.bundle.column(f"corrections.{kind}")
+        pairs = []
+        for entry in entries[offsets[a]:offsets[a + 1]].tolist():
+            if self._matches(rows[entry], a, b):
+                source, target = column[positions[entry]].tolist()
+                pairs.append((self.bundle.label(source), self.bundle.label(target)))
+        return pairs
+
+    def _key(self, source: str, target: str) -> EdgeKey:
+        if self.directed or source <= target:
+            return (source, target)
+        return (target, source)
+
+    def _edges(self, a: int, b: int, superedge: bool, removed: Set[EdgeKey], added: List[EdgeKey]) -> Iterator[Dict]:
+        if superedge:
+            members_a = self.members(self._label(a))
+            if a == b:
+                candidates = permutations(members_a, 2) if self.directed else combinations(members_a, 2)
+            else:
+                candidates = product(members_a, self.members(self._label(b)))
+            for source, target in candidates:
+                if self._key(source, target) not in removed:
+                    yield {"source": source, "target": target, "via": "superedge"}
+        for source, target in added:
+            yield {"source": source, "target": target, "via": "correction"}
+
+    def _label(self, row: int) -> str:
+        return self.bundle.label(int(self._supernodes[row]))
+
+    def edges_between(self, supernode: str, other: str, limit: int = DEFAULT_EDGE_LIMIT) -> Dict:
+        """Original edges between two supernodes (inside one when they are equal).
+
+        For directed summaries both directions are included. At most
+        ``limit`` edges are listed; ``truncated`` tells whether more exist.
+        """
+
+        a, b = self._row_of[supernode], self._row_of[other]
+        directions = [(a, b)] if not self.directed or a == b else [(a, b), (b, a)]
+        superedges, edges = [], []
+        total = 0
+        for u, v in directions:
+            position = self._superedge(u, v)
+            removed = {self._key(s, t) for s, t in self._correction_pairs("negative", u, v)}
+            added = self._correction_pairs("positive", u, v)
+            if position is not None:
+                superedges.append(self._superedge_entry(position))
+            total += len(added) + (self._pair_count(u, v) - len(removed) if position is not None else 0)
+            edges.extend(islice(self._edges(u, v, position is not None, removed, added), max(limit - len(edges), 0)))
+        return {
+            "source": supernode,
+            "target": other,
+            "superedges": superedges,
+            "edge_count": total,
+            "edges": edges,
+            "truncated": total > len(edges),
+        }
+
+    def _pair_count(self, a: int, b: int) -> int:
+        size_a = int(self._member_offsets[a + 1] - self._member_offsets[a])
+        if a == b:
+            return size_a * (size_a - 1) // (1 if self.directed else 2)
+        return size_a * int(self._member_offsets[b + 1] - self._member_offsets[b])
+
+    def _superedge_entry(self, position: int) -> Dict:
+        source, target = self.bundle.column("summary.edges")[position].tolist()
+        entry = {
+            "source": self.bundle.label(source),
+            "target": self.bundle.label(target),
+            "weight": float(self.bundle.column("summary.weight")[position]),
+        }
+        density = float(self.bundle.column("summary.density")[position])
+        if not math.isnan(density):
+            entry["density"] = density
+        return entry
+
+    def neighbours(self, supernode: str) -> List[Dict]:
+        """Supernodes linked to ``supernode`` by a superedge or a positive correction."""
+
+        row = self._row_of[supernode]
+        found: Dict[int, Dict] = {}
+
+        def neighbour(rows: np.ndarray) -> Optional[int]:
+            other = int(rows[1]) if int(rows[0]) == row else int(rows[0])
+            return None if other == row else other
+
+        offsets, entries = self._superedge_csr
+        for entry in entries[offsets[row]:offsets[row + 1]].tolist():
+            other = neighbour(self._superedge_rows[self._superedges[entry]])
+            if other is not None:
+                item = found.setdefault(other, {"id": self._label(other), "superedges": [], "positive_corrections": 0})
+                item["superedges"].append(self._superedge_entry(int(self._superedges[entry])))
+        _, rows, (offsets, entries) = self._corrections["positive"]
+        for entry in entries[offsets[row]:offsets[row + 1]].tolist():
+            other = neighbour(rows[entry])
+            if other is not None:
+                item = found.setdefault(other, {"id": self._label(other), "superedges": [], "positive_corrections": 0})
+                item["positive_corrections"] += 1
+        return list(found.values())
+
+    def describe(self, supernode: str, limit: int = DEFAULT_EDGE_LIMIT) -> Dict:
+        """Members, internal edges and neighbours of one supernode."""
+
+        members = self.members(supernode)
+        internal = self.edges_between(supernode, supernode, limit=limit)
+        return {
+            "id": supernode,
+            "size": len(members),
+            "members": members,
+            "self_loop": internal["superedges"][0] if internal["superedges"] else None,
+            "internal_edge_count": internal["edge_count"],
+            "internal_edges": internal["edges"],
+            "truncated": internal["truncated"],
+            "neighbours": self.neighbours(supernode),
+        }
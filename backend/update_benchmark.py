@@ -0,0 +1,308 @@
+"""Benchmark harness for dynamic summary updates.
+
+Drives a synthetic workload (see ``update_workload``) through one of three
+targets and reports throughput, batch latency, memory and how the summary's
+compression drifts as updates accumulate:
+
+* ``state``    - one long-lived dynamic state (``load_dynamic_state`` +
+  ``apply_updates``), the path used by the API sessions; with ``workers`` > 1
+  and no policy, a long-lived ``ShardedDynamicEngine`` as used by sharded sessions
+* ``function`` - stateless ``apply_edge_updates`` per batch, feeding each
+  result into the next call
+* ``api``      - ``POST /datasets/{id}/apply-updates`` on a running server.
+  This permanently advances that dataset's dynamic summary.
+
+``verify_recovery`` (``--verify-recovery``) instead checks durability: it
+applies the workload through a logged session, compacts part-way and
+compares the live state with a session recovered from the log.
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import tempfile
+import time
+import urllib.request
+import uuid
+from dataclasses import asdict, dataclass, field, replace
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterator, List, Literal, Optional
+
+from backend.dynamic_updates import EdgeUpdate, MaintenancePolicy, apply_edge_updates, load_dynamic_state
+from backend.output_types import PoligrasOutput
+from backend.update_workload import WORKLOAD_MIXES, WorkloadGenerator, WorkloadSpec
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None  # type: ignore[assignment]
+
+BenchmarkTarget = Literal["state", "function", "api"]
+
+
+@dataclass
+class BenchmarkReport:
+    target: str
+    mix: str
+    batch_size: int
+    updates: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    updates_per_second: float = 0.0
+    latency_p50_ms: float = 0.0
+    latency_p99_ms: float = 0.0
+    peak_rss_mb: Optional[float] = None
+    samples: List[Dict] = field(default_factory=list)
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    # ru_maxrss is reported in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _batches(updates: Iterator[EdgeUpdate], batch_size: int) -> Iterator[List[EdgeUpdate]]:
+    while True:
+        batch = list(islice(updates, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class _StateTarget:
+    def __init__(self, summary_output: PoligrasOutput, policy: Optional[MaintenancePolicy], workers: int):
+        self.state = load_dynamic_state(summary_output, policy=policy)
+        if workers > 1 and policy is None:
+            from backend.sharded_updates import ShardedDynamicEngine
+
+            self.state = ShardedDynamicEngine.from_state(self.state, workers)
+
+    def apply(self, batch: List[EdgeUpdate]) -> Dict:
+        self.state.apply_updates(batch)
+        return self.state.current_stats()
+
+
+class _FunctionTarget:
+    def __init__(self, summary_output: PoligrasOutput, policy: Optional[MaintenancePolicy], workers: int):
+        self.payload = summary_output
+        self.policy = policy
+        self.workers = workers
+
+    def apply(self, batch: List[EdgeUpdate]) -> Dict:
+        self.payload = apply_edge_updates(self.payload, batch, policy=self.policy, workers=self.workers)
+        return self.payload["stats"]
+
+
+class _ApiTarget:
+    def __init__(self, api_url: str, dataset_id: str):
+        self.url = f"{api_url.rstrip('/')}/datasets/{dataset_id}/apply-updates"
+
+    def apply(self, batch: List[EdgeUpdate]) -> Dict:
+        body = json.dumps({
+            "updates": [{"type": u.operation, "source": u.source, "target": u.target} for u in batch]
+        }).encode("utf-8")
+        boundary = uuid.uuid4().hex
+        data = b"".join([
+            f"--{boundary}\r\n".encode(),
+            b'Content-Disposition: form-data; name="updates_file"; filename="updates.json"\r\n',
+            b"Content-Type: application/json\r\n\r\n",
+            body,
+            f"\r\n--{boundary}--\r\n".encode(),
+        ])
+        request = urllib.request.Request(
+            self.url,
+            data=data,
+            method="POST",
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        )
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())["stats"]
+
+
+def run_benchmark(
+    summary_output: PoligrasOutput,
+    spec: WorkloadSpec,
+    total_updates: int,
+    batch_size: int = 10_000,
+    target: BenchmarkTarget = "state",
+    policy: Optional[MaintenancePolicy] = None,
+    workers: int = 1,
+    sample_every: int = 1,
+    api_url: str = "http://localhost:8000",
+    dataset_id: Optional[str] = None,
+) -> BenchmarkReport:
+    """Apply ``total_updates`` generated updates in batches and measure each batch.
+
+    Workload generation happens before the timer starts for each batch, so
+    only the target's work is measured. Every ``sample_every`` batches the
+    stats returned by the target are recorded, including compression drift
+    relative to the starting summary.
+    """
+
+    generator = WorkloadGenerator(summary_output, spec)
+    if target == "state":
+        runner = _StateTarget(summary_output, policy, workers)
+    elif target == "function":
+        runner = _FunctionTarget(summary_output, policy, workers)
+    elif target == "api":
+        if not dataset_id:
+            raise ValueError("dataset_id is required for the api target")
+        runner = _ApiTarget(api_url, dataset_id)
+    else:
+        raise ValueError(f"Unknown benchmark target '{target}'")
+
+    initial_ratio = float(summary_output.get("stats", {}).get("compression_ratio", 0.0))
+    report = BenchmarkReport(target=target, mix=spec.mix, batch_size=batch_size)
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for batch in _batches(generator.take(total_updates), batch_size):
+        batch_started = time.perf_counter()
+        stats = runner.apply(batch)
+        latencies.append(time.perf_counter() - batch_started)
+        report.updates += len(batch)
+        report.batches += 1
+
+        if report.batches % sample_every == 0:
+            summary = stats.get("summary", {})
+            ratio = float(stats.get("compression_ratio", 0.0))
+            report.samples.append({
+                "batch": report.batches,
+                "updates": report.updates,
+                "elapsed_s": round(time.perf_counter() - started, 3),
+                "supernodes": summary.get("supernodes"),
+                "superedges": summary.get("superedges"),
+                "correction_edges": summary.get("correction_edges"),
+                "compression_ratio": ratio,
+                "compression_drift": ratio - initial_ratio,
+            })
+
+    busy = sum(latencies)
+    report.seconds = round(time.perf_counter() - started, 3)
+    report.updates_per_second = report.updates / busy if busy else 0.0
+    report.latency_p50_ms = _percentile(latencies, 0.50) * 1000
+    report.latency_p99_ms = _percentile(latencies, 0.99) * 1000
+    report.peak_rss_mb = _peak_rss_mb()
+    return report
+
+
+def verify_recovery(
+    summary_output: PoligrasOutput,
+    spec: WorkloadSpec,
+    total_updates: int,
+    batch_size: int = 10_000,
+    policy: Optional[MaintenancePolicy] = None,
+    compact_after: int = 5,
+) -> Dict:
+    """Check that a session recovered from its log equals the live one at the same version.
+
+    The workload is applied batch by batch through a ``VersionedSummary``
+    logging to a scratch directory, and the log is compacted into a
+    snapshot after ``compact_after`` batches. Returns the version, whether
+    the two states' cores are equal, and the core fields that differ.
+    """
+
+    from backend.summary_versions import VersionedSummary
+    from backend.update_log import UpdateLog
+
+    def _load_base() -> PoligrasOutput:
+        return copy.deepcopy(summary_output)
+
+    generator = WorkloadGenerator(summary_output, spec)
+    with tempfile.TemporaryDirectory(prefix="poligras-recovery-") as scratch:
+        live = VersionedSummary(_load_base(), policy=policy, log=UpdateLog(Path(scratch)), base_loader=_load_base)
+        for batches, batch in enumerate(_batches(generator.take(total_updates), batch_size), 1):
+            live.apply_updates(batch)
+            if batches == compact_after:
+                live.log.compact(lambda: load_dynamic_state(_load_base(), policy=policy))
+        recovered = VersionedSummary(_load_base(), policy=policy, log=UpdateLog(Path(scratch)), base_loader=_load_base)
+        expected, actual = live.state.export_core(), recovered.state.export_core()
+    differences = sorted(key for key in expected.keys() | actual.keys() if expected.get(key) != actual.get(key))
+    return {
+        "version": live.version,
+        "recovered_version": recovered.version,
+        "equal": live.version == recovered.version and not differences,
+        "differences": differences,
+        "live_stats": live.current_stats(),
+        "recovered_stats": recovered.current_stats(),
+    }
+
+
+def main() -> None:
+    import argparse
+    import logging
+
+    from backend.dynamic_updates import logger as dynamic_logger
+
+    parser = argparse.ArgumentParser(description="Benchmark dynamic summary updates on a synthetic workload.")
+    parser.add_argument("input_path", type=str, help="Path to output.json")
+    parser.add_argument("--target", choices=["state", "function", "api"], default="state")
+    parser.add_argument("--num-updates", "-n", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--mix", choices=WORKLOAD_MIXES, default="uniform")
+    parser.add_argument("--insert-ratio", type=float, default=0.5)
+    parser.add_argument("--skew", type=float, default=1.2)
+    parser.add_argument("--locality", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--maintain", action="store_true", help="Enable structural maintenance (default policy)")
+    parser.add_argument("--max-work-per-batch", type=int, default=None, help="Maintenance work budget per batch (with --maintain)")
+    parser.add_argument("--workers", type=int, default=1, help="Shard processes for the state and function targets (without a policy)")
+    parser.add_argument("--sample-every", type=int, default=1)
+    parser.add_argument("--api-url", type=str, default="http://localhost:8000")
+    parser.add_argument("--dataset-id", type=str, default=None, help="Dataset to update for the api target")
+    parser.add_argument("--output", "-o", type=str, default=None, help="Also write the JSON report here")
+    parser.add_argument("--verify-recovery", action="store_true", help="Check log recovery against the live state instead of timing")
+    parser.add_argument("--compact-after", type=int, default=5, help="Batches before the snapshot (with --verify-recovery)")
+    args = parser.parse_args()
+
+    # Per-pair change logging would dominate the measurement.
+    dynamic_logger.setLevel(logging.WARNING)
+
+    with open(args.input_path, "r", encoding="utf-8") as f:
+        summary_output = json.load(f)
+
+    spec = WorkloadSpec(args.mix, args.insert_ratio, args.skew, args.locality, args.seed)
+    policy = MaintenancePolicy() if args.maintain else None
+    if policy is not None and args.max_work_per_batch is not None:
+        policy = replace(policy, max_work_per_batch=args.max_work_per_batch)
+
+    if args.verify_recovery:
+        result = verify_recovery(summary_output, spec, args.num_updates, args.batch_size, policy, args.compact_after)
+        print(json.dumps(result, indent=2))
+        if not result["equal"]:
+            raise SystemExit(1)
+        return
+
+    report = run_benchmark(
+        summary_output,
+        spec,
+        args.num_updates,
+        batch_size=args.batch_size,
+        target=args.target,
+        policy=policy,
+        workers=args.workers,
+        sample_every=args.sample_every,
+        api_url=args.api_url,
+        dataset_id=args.dataset_id,
+    )
+    text = json.dumps(report.as_dict(), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""Streaming ingestion of line-delimited edge update logs.
+
+Three line formats are accepted:
+
+* ``ndjson``   - one JSON update object per line (same fields as the JSON upload)
+* ``csv``      - ``type,source,target[,timestamp]`` rows, with an optional header row
+* ``edgelist`` - whitespace separated ``source target`` (an addition),
+  ``op source target`` where ``op`` is add/remove/+/-, or
+  ``op source target timestamp``
+
+Timestamps are epoch seconds or ISO 8601 strings and drive sliding-window
+expiry when the dynamic state has a window.
+
+Input is consumed chunk by chunk and applied to a dynamic state in bounded
+micro-batches, so arbitrarily large logs never have to be held in memory.
+Malformed lines are recorded in the report and skipped instead of aborting
+the whole ingestion.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Literal, Optional, Tuple
+
+from backend.dynamic_updates import (
+    OPERATION_FIELDS,
+    SOURCE_FIELDS,
+    TARGET_FIELDS,
+    TIMESTAMP_FIELDS,
+    EdgeUpdate,
+    UpdateStreamError,
+    normalise_operation,
+    parse_timestamp,
+    update_from_entry,
+)
+
+LineFormat = Literal["auto", "ndjson", "csv", "edgelist"]
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+DEFAULT_BATCH_SIZE = 10_000
+MAX_REPORTED_ERRORS = 100
+
+
+@dataclass
+class IngestReport:
+    """Running totals for one ingestion; also passed to progress callbacks."""
+
+    format: str = "auto"
+    lines: int = 0
+    parsed: int = 0
+    applied: int = 0
+    batches: int = 0
+    bytes_read: int = 0
+    error_count: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+
+    def record_error(self, line_number: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_number, message))
+
+    def as_dict(self) -> dict:
+        return {
+            "format": self.format,
+            "lines": self.lines,
+            "parsed": self.parsed,
+            "applied": self.applied,
+            "batches": self.batches,
+            "bytes_read": self.bytes_read,
+            "error_count": self.error_count,
+            "errors": [{"line": line, "message": message} for line, message in self.errors],
+        }
+
+
+def iter_file_chunks(handle: BinaryIO, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield fixed-size byte chunks from an open binary file until EOF."""
+
+    while True:
+        chunk = handle.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def follow_file_chunks(
+    path: Path,
+    start_offset: int = 0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    poll_interval: float = 1.0,
+    stop_event: Optional[threading.Event] = None,
+) -> Iterator[bytes]:
+    """Yield bytes appended to ``path``, polling for growth like ``tail -f``.
+
+    An empty chunk is yielded after every idle poll so consumers can flush
+    partially filled batches while the producer is quiet. Iteration ends once
+    ``stop_event`` is set and the file has been drained. If the file shrinks
+    (truncation or rotation) reading restarts from its beginning.
+    """
+
+    offset = start_offset
+    while True:
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if size < offset:
+            logger.info("Update log %s shrank; restarting from the beginning", path)
+            offset = 0
+
+        if size > offset:
+            with path.open("rb") as handle:
+                handle.seek(offset)
+                for chunk in iter_file_chunks(handle, chunk_size):
+                    offset += len(chunk)
+                    yield chunk
+            continue
+
+        if stop_event is not None and stop_event.is_set():
+            return
+        yield b""
+        if stop_event is not None:
+            stop_event.wait(poll_interval)
+        else:
+            time.sleep(poll_interval)
+
+
+def iter_lines(
+    chunks: Iterable[bytes],
+    report: Optional[IngestReport] = None,
+) -> Iterator[Tuple[int, Optional[str]]]:
+    """Split a byte-chunk stream into numbered, decoded lines.
+
+    A trailing partial line is carried over to the next chunk; the final
+    fragment is emitted once the chunk stream ends. An empty chunk is passed
+    through as a ``None`` line to signal that the source is idle.
+    """
+
+    pending = b""
+    line_number = 0
+    for chunk in chunks:
+        if not chunk:
+            yield line_number, None
+            continue
+        if report is not None:
+            report.bytes_read += len(chunk)
+        pending += chunk
+        *complete, pending = pending.split(b"\n")
+        for raw in complete:
+            line_number += 1
+            yield line_number, raw.decode("utf-8", errors="replace").rstrip("\r")
+    if pending:
+        line_number += 1
+        yield line_number, pending.decode("utf-8", errors="replace").rstrip("\r")
+
+
+def detect_format(line: str) -> LineFormat:
+    stripped = line.lstrip()
+    if stripped.startswith("{"):
+        return "ndjson"
+    if "," in stripped:
+        return "csv"
+    return "edgelist"
+
+
+class _LineParser:
+    """Turns individual lines of one format into ``EdgeUpdate`` records."""
+
+    def __init__(self, fmt: LineFormat):
+        self.fmt = fmt
+        self._csv_columns: Optional[Tuple[Optional[int], int, int, Optional[int]]] = None
+
+    def parse(self, line_number: int, line: str) -> Optional[EdgeUpdate]:
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            return None
+        label = f"Line {line_number}"
+
+        if self.fmt == "ndjson":
+            try:
+                entry = json.loads(stripped)
+            except json.JSONDecodeError as exc:
+                raise UpdateStreamError(f"{label} is not valid JSON") from exc
+            return update_from_entry(entry, label)
+
+        if self.fmt == "csv":
+            row = next(csv.reader([stripped]))
+            if self._csv_columns is None and self._read_header(row):
+                return None
+            return self._from_tokens([token.strip() for token in row], label)
+
+        return self._from_tokens(stripped.split(), label)
+
+    def _read_header(self, row: List[str]) -> bool:
+        lowered = [token.strip().lower() for token in row]
+
+        def _index(names: Tuple[str, ...]) -> Optional[int]:
+            for idx, token in enumerate(lowered):
+                if token in names:
+                    return idx
+            return None
+
+        source_idx, target_idx = _index(SOURCE_FIELDS), _index(TARGET_FIELDS)
+        if source_idx is None or target_idx is None:
+            return False
+        self._csv_columns = (_index(OPERATION_FIELDS), source_idx, target_idx, _index(TIMESTAMP_FIELDS))
+        return True
+
+    def _from_tokens(self, tokens: List[str], label: str) -> EdgeUpdate:
+        if self._csv_columns is not None:
+            op_idx, source_idx, target_idx, ts_idx = self._csv_columns
+            if max(idx for idx in self._csv_columns if idx is not None) >= len(tokens):
+                raise UpdateStreamError(f"{label} has too few columns")
+            operation = normalise_operation(tokens[op_idx], label) if op_idx is not None else "add"
+            timestamp = parse_timestamp(tokens[ts_idx], label) if ts_idx is not None and tokens[ts_idx] else None
+            return EdgeUpdate(operation, tokens[source_idx], tokens[target_idx], timestamp)
+
+        if len(tokens) == 2:
+            return EdgeUpdate(operation="add", source=tokens[0], target=tokens[1])
+        if len(tokens) in (3, 4):
+            timestamp = parse_timestamp(tokens[3], label) if len(tokens) == 4 else None
+            return EdgeUpdate(normalise_operation(tokens[0], label), tokens[1], tokens[2], timestamp)
+        raise UpdateStreamError(f"{label} must have 2 to 4 fields, found {len(tokens)}")
+
+
+def iter_updates(
+    chunks: Iterable[bytes],
+    fmt: LineFormat = "auto",
+    report: Optional[IngestReport] = None,
+) -> Iterator[Tuple[int, Optional[EdgeUpdate]]]:
+    """Parse a chunked line stream lazily, recording bad lines in ``report``.
+
+    ``None`` is yielded in place of an update when the source reports idle.
+    """
+
+    report = report if report is not None else IngestReport()
+    parser: Optional[_LineParser] = None if fmt == "auto" else _LineParser(fmt)
+    report.format = fmt
+    for line_number, line in iter_lines(chunks, report):
+        if line is None:
+            yield line_number, None
+            continue
+        report.lines = line_number
+        if parser is None:
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            parser = _LineParser(detect_format(line))
+            report.format = parser.fmt
+        try:
+            update = parser.parse(line_number, line)
+        except UpdateStreamError as exc:
+            report.record_error(line_number, str(exc))
+            continue
+        if update is None:
+            continue
+        report.parsed += 1
+        yield line_number, update
+
+
+def ingest_updates(
+    state,
+    chunks: Iterable[bytes],
+    fmt: LineFormat = "auto",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    on_batch: Optional[Callable[[IngestReport], None]] = None,
+    report: Optional[IngestReport] = None,
+) -> IngestReport:
+    """Stream updates from ``chunks`` into ``state`` in micro-batches.
+
+    ``state`` is anything with ``check``/``apply_updates`` methods, i.e. a
+    dynamic summary state (see ``load_dynamic_state``) or a
+    ``VersionedSummary``, which records one version per micro-batch. Each
+    update is checked against it before being queued, so rejected updates
+    (self-loops, unknown nodes) become per-line errors rather than failing a
+    whole batch. Partial batches are flushed when the source goes idle.
+    ``on_batch`` is called with the running report after every applied
+    micro-batch.
+    """
+
+    report = report if report is not None else IngestReport()
+    batch: List[EdgeUpdate] = []
+
+    def _flush() -> None:
+        if not batch:
+            return
+        state.apply_updates(batch)
+        report.applied += len(batch)
+        report.batches += 1
+        batch.clear()
+        logger.info(
+            "Applied batch %d: %d updates from %d lines (%d errors)",
+            report.batches, report.applied, report.lines, report.error_count,
+        )
+        if on_batch is not None:
+            on_batch(report)
+
+    for line_number, update in iter_updates(chunks, fmt, report):
+        if update is None:
+            _flush()
+            continue
+        try:
+            state.check(update)
+        except UpdateStreamError as exc:
+            report.record_error(line_number, str(exc))
+            continue
+        batch.append(update)
+        if len(batch) >= batch_size:
+            _flush()
+    _flush()
+    return report
+
+
+def main() -> None:
+    import argparse
+
+    from backend.dynamic_updates import MaintenancePolicy
+    from backend.summary_versions import SummaryRegistry
+
+    parser = argparse.ArgumentParser(description="Stream an edge update log into a dataset's dynamic summary.")
+    parser.add_argument("dataset", help="Folder under backend/dataset")
+    parser.add_argument("updates", type=str, help="Path to an NDJSON/CSV/edge-list update log")
+    parser.add_argument("--format", choices=["auto", "ndjson", "csv", "edgelist"], default="auto")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--follow", "-f", action="store_true", help="Keep reading as the log grows (Ctrl-C to stop)")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--window", type=float, default=None, help="Sliding window length in timestamp units (seconds)")
+    parser.add_argument("--shards", type=int, default=1, help="Apply batches in this many worker processes (fixed membership, no window)")
+    args = parser.parse_args()
+    if args.shards > 1 and args.window is not None:
+        parser.error("--shards cannot be combined with --window")
+
+    # Every micro-batch goes through the dataset's write-ahead log, so the
+    # API server recovers the same state on its next start.
+    registry = SummaryRegistry(
+        Path(__file__).resolve().parent / "dataset",
+        policy=MaintenancePolicy() if args.shards <= 1 else None,
+        window=args.window,
+        shards=args.shards,
+    )
+    session = registry.get(args.dataset)
+    start_version = session.version
+
+    updates_path = Path(args.updates)
+    stop_event = threading.Event()
+    if args.follow:
+        chunks: Iterable[bytes] = follow_file_chunks(updates_path, poll_interval=args.poll_interval, stop_event=stop_event)
+    else:
+        handle = updates_path.open("rb")
+        chunks = iter_file_chunks(handle)
+
+    report = IngestReport()
+    try:
+        ingest_updates(session, chunks, args.format, args.batch_size, report=report)
+    except KeyboardInterrupt:
+        stop_event.set()
+    finally:
+        if not args.follow:
+            handle.close()
+
+    print(json.dumps(report.as_dict(), indent=2))
+    print(f"Dynamic summary advanced from v{start_version} to v{session.version} (logged in {session.log.wal_path})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,536 @@
+"""Write-ahead log and snapshot compaction for dynamic summaries.
+
+Each dataset directory gets an append-only ``updates.wal`` with one line per
+applied batch (``{"v": version, "u": [[op, source, target(, timestamp)], ...]}``), fsynced
+before the batch is applied, so steady-state writes are proportional to the
+number of updates rather than to the size of the summary. Once the log grows
+past a threshold it is folded in the background into ``dynamic_snapshot.pkl.gz``
+(the dynamic state's core at some version) and the folded prefix is dropped.
+
+Rollbacks are logged as ``{"v": version, "r": target, "p": [...], "s": [...]}``
+with the pair and supernode images they restore, so replaying them does not
+depend on in-memory history.
+
+Recovery is: base ``output.json`` + snapshot + replay of the remaining log.
+When a re-summarised base replaces the summary (``rebase``), the snapshot is
+rewritten at the swap version and the records it covers are dropped.
+
+Both files carry the engine configuration (maintenance policy, window,
+shards) they were written under: the log as a ``{"c": config}`` first line,
+the snapshot as a header pickled ahead of the core. A session claims the
+log with its own configuration and is refused (``UpdateLogError``) when
+they differ, since replaying under another configuration would rebuild a
+different summary. Likewise a logged batch that no longer applies is an
+error rather than something to skip.
+
+Several processes may serve the same dataset. Every append and every
+rewrite of the log or snapshot happens under ``exclusive()``, a file lock on
+``updates.wal.lock``, and ``tail`` returns what other processes appended
+since this one last read or wrote the log, so a writer can catch up before
+it picks the next version number.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+import pickle
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from backend.atomic_files import FileLock
+from backend.dynamic_updates import EdgeUpdate, PairImage, PairKey, UpdateStreamError
+
+logger = logging.getLogger(__name__)
+
+WAL_NAME = "updates.wal"
+SNAPSHOT_NAME = "dynamic_snapshot.pkl.gz"
+LOCK_NAME = "updates.wal.lock"
+# Appends hold the lock for one fsync, so waiting processes poll often.
+LOCK_POLL_INTERVAL = 0.005
+DEFAULT_COMPACT_BYTES = 64 * 1024 * 1024
+
+_OP_CODES = {"add": "+", "remove": "-"}
+_OP_NAMES = {code: name for name, code in _OP_CODES.items()}
+_HEADER_PREFIX = b'{"c":'
+
+
+class UpdateLogError(RuntimeError):
+    """Raised when a dataset's log cannot be replayed by this session."""
+
+
+@dataclass(frozen=True)
+class RollbackRecord:
+    """Images restored by a rollback to ``to_version`` (see ``restore_images``)."""
+
+    to_version: int
+    pairs: Dict[PairKey, PairImage]
+    supernodes: Dict[str, Optional[List[str]]]
+
+    def apply_to(self, state) -> None:
+        state.restore_images(self.pairs, self.supernodes)
+
+
+LogEntry = Union[List[EdgeUpdate], RollbackRecord]
+# (inode, mtime, size) of a file, or None while it does not exist.
+FileStamp = Optional[Tuple[int, int, int]]
+
+
+def _stamp(path: Path) -> FileStamp:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _encode_line(record: Dict) -> bytes:
+    return (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class UpdateLog:
+    """Append-only batch log plus compacted snapshot for one dataset directory."""
+
+    def __init__(self, dataset_dir: Path, compact_bytes: int = DEFAULT_COMPACT_BYTES):
+        self.dataset_dir = dataset_dir
+        # Engine configuration written into new headers and checked against existing ones; see ``claim``.
+        self.config: Optional[Dict] = None
+        self.wal_path = dataset_dir / WAL_NAME
+        self.snapshot_path = dataset_dir / SNAPSHOT_NAME
+        self.compact_bytes = compact_bytes
+        self._lock = threading.Lock()
+        self._compacting = threading.Event()
+        # Serialises compactions started by this process.
+        self._snapshot_lock = threading.Lock()
+        self._file_lock = FileLock(dataset_dir / LOCK_NAME)
+        self._owner = threading.RLock()
+        self._depth = 0
+        # (WAL inode, snapshot stamp, offset) up to which this process has read or written the log.
+        self._position: Optional[Tuple[int, FileStamp, int]] = None
+        self._snapshot_seen: FileStamp = None
+
+    def exists(self) -> bool:
+        return self.wal_path.exists() or self.snapshot_path.exists()
+
+    def claim(self, config: Dict) -> None:
+        """Use this log for a session running with ``config``.
+
+        Raises ``UpdateLogError`` when the log or snapshot was written under
+        a different configuration. Logs written before headers existed are
+        accepted and get one with their next rewrite.
+        """
+
+        config = json.loads(json.dumps(config))
+        with self.exclusive():
+            self.config = config
+            self._verify("log", self._read_header())
+            if self.snapshot_path.exists():
+                self._verify("snapshot", self._read_snapshot(header_only=True)[0].get("config"))
+
+    def _verify(self, source: str, found: Optional[Dict]) -> None:
+        if found is not None and self.config is not None and found != self.config:
+            raise UpdateLogError(
+                f"The update {source} of dataset '{self.dataset_dir.name}' was written with engine "
+                f"configuration {found}, but this session uses {self.config}"
+            )
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        """Hold the dataset's log lock against every other thread and process; reentrant."""
+
+        with self._owner:
+            if self._depth == 0:
+                self._file_lock.acquire(poll_interval=LOCK_POLL_INTERVAL)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._file_lock.release()
+
+    # ------------------------------------------------------------------
+    # Log
+    # ------------------------------------------------------------------
+    def append(self, version: int, updates: Sequence[EdgeUpdate]) -> None:
+        """Durably record one batch; returns only after the data is fsynced."""
+
+        record = {
+            "v": version,
+            "u": [
+                [_OP_CODES[update.operation], update.source, update.target]
+                + ([update.timestamp] if update.timestamp is not None else [])
+                for update in updates
+            ],
+        }
+        self._write_line(record)
+
+    def append_rollback(self, version: int, rollback: RollbackRecord) -> None:
+        """Durably record a rollback as the images it restores."""
+
+        self._write_line({
+            "v": version,
+            "r": rollback.to_version,
+            "p": [
+                [pair[0], pair[1], is_superedge, sorted(plus), sorted(minus)]
+                for pair, (is_superedge, plus, minus) in rollback.pairs.items()
+            ],
+            "s": [[supernode, nodes] for supernode, nodes in rollback.supernodes.items()],
+        })
+
+    def _write_line(self, record: Dict) -> None:
+        line = _encode_line(record)
+        with self.exclusive():
+            created = not self.wal_path.exists()
+            with self.wal_path.open("ab") as handle:
+                if handle.tell() == 0 and self.config is not None:
+                    handle.write(_encode_line({"c": self.config}))
+                start = handle.tell()
+                handle.write(line)
+                handle.flush()
+                os.fsync(handle.fileno())
+                inode = os.fstat(handle.fileno()).st_ino
+            if created:
+                _fsync_dir(self.dataset_dir)
+            # Only skip our own line when everything before it has been read.
+            if self._current_position(start) == (inode, start):
+                self._position = (inode, _stamp(self.snapshot_path), start + len(line))
+
+    def repair(self) -> int:
+        """Truncate a torn final record so later appends start on a fresh line.
+
+        Returns the number of bytes dropped.
+        """
+
+        with self.exclusive():
+            size = self.size()
+            if size == 0:
+                return 0
+            with self.wal_path.open("r+b") as handle:
+                end = size
+                while end > 0:
+                    start = max(0, end - (1 << 16))
+                    handle.seek(start)
+                    block = handle.read(end - start)
+                    newline = block.rfind(b"\n")
+                    if newline != -1:
+                        end = start + newline + 1
+                        break
+                    end = start
+                if end == size:
+                    return 0
+                handle.truncate(end)
+                handle.flush()
+                os.fsync(handle.fileno())
+        logger.warning("Dropped %d bytes of a torn record from %s", size - end, self.wal_path)
+        return size - end
+
+    def records(
+        self,
+        after_version: int = 0,
+        end_offset: Optional[int] = None,
+        start_offset: int = 0,
+    ) -> Iterator[Tuple[int, LogEntry]]:
+        """Yield logged batches (or rollbacks) with a version above ``after_version``.
+
+        A torn final line (crash mid-append) is ignored.
+        """
+
+        if not self.wal_path.exists():
+            return
+        with self.wal_path.open("rb") as handle:
+            handle.seek(start_offset)
+            while end_offset is None or handle.tell() < end_offset:
+                line = handle.readline()
+                if not line:
+                    return
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("Ignoring torn record at the end of %s", self.wal_path)
+                    return
+                if "c" in record:
+                    continue
+                version = int(record["v"])
+                if version <= after_version:
+                    continue
+                if "r" in record:
+                    yield version, RollbackRecord(
+                        to_version=int(record["r"]),
+                        pairs={
+                            (u, v): (bool(is_superedge), frozenset(map(tuple, plus)), frozenset(map(tuple, minus)))
+                            for u, v, is_superedge, plus, minus in record["p"]
+                        },
+                        supernodes={supernode: nodes for supernode, nodes in record["s"]},
+                    )
+                    continue
+                yield version, [
+                    EdgeUpdate(_OP_NAMES[entry[0]], entry[1], entry[2], entry[3] if len(entry) > 3 else None)  # type: ignore[arg-type]
+                    for entry in record["u"]
+                ]
+
+    def tail(self, after_version: int) -> List[Tuple[int, LogEntry]]:
+        """Records above ``after_version`` appended since this process last read or wrote the log.
+
+        Reads from where this process left off unless the log was rewritten
+        meanwhile, and repairs a record torn by a process that died mid-append.
+        """
+
+        with self.exclusive():
+            stamp = _stamp(self.wal_path)
+            if stamp is None:
+                self._position = None
+                return []
+            size = stamp[2]
+            if size and not self._ends_with_newline(size):
+                self.repair()
+                size = self.size()
+            position = self._current_position(size)
+            start = position[1] if position is not None and position[0] == stamp[0] else 0
+            if start == 0:
+                self._verify("log", self._read_header())
+            entries = list(self.records(after_version, size, start))
+            self._position = (stamp[0], _stamp(self.snapshot_path), size)
+            return entries
+
+    def changed_since_read(self) -> bool:
+        """Whether the log or snapshot changed since this process last read or wrote them.
+
+        Two ``stat`` calls and no lock, so it can be polled; a True answer
+        is then acted on with ``tail``/``changed_snapshot`` under ``exclusive``.
+        """
+
+        snapshot = _stamp(self.snapshot_path)
+        if snapshot != self._snapshot_seen:
+            return True
+        wal = _stamp(self.wal_path)
+        position = self._position
+        if wal is None or position is None:
+            return wal is not None and wal[2] > 0
+        return (wal[0], snapshot, wal[2]) != position
+
+    def _current_position(self, size: int) -> Optional[Tuple[int, int]]:
+        """(inode, offset) this process has read up to, if still valid for a log of ``size`` bytes."""
+
+        if self._position is None:
+            return None
+        inode, snapshot, offset = self._position
+        # Prefixes are only dropped after a snapshot rewrite.
+        if snapshot != _stamp(self.snapshot_path) or offset > size:
+            return None
+        return inode, offset
+
+    def _header_line(self) -> bytes:
+        """The log's ``{"c": config}`` line, or b"" when it has none."""
+
+        try:
+            with self.wal_path.open("rb") as handle:
+                if handle.read(len(_HEADER_PREFIX)) != _HEADER_PREFIX:
+                    return b""
+                handle.seek(0)
+                line = handle.readline()
+        except FileNotFoundError:
+            return b""
+        return line if line.endswith(b"\n") else b""
+
+    def _read_header(self) -> Optional[Dict]:
+        line = self._header_line()
+        return json.loads(line)["c"] if line else None
+
+    def _ends_with_newline(self, size: int) -> bool:
+        with self.wal_path.open("rb") as handle:
+            handle.seek(size - 1)
+            return handle.read(1) == b"\n"
+
+    def size(self) -> int:
+        try:
+            return self.wal_path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    # ------------------------------------------------------------------
+    # Snapshot
+    # ------------------------------------------------------------------
+    def load_snapshot(self) -> Optional[Tuple[int, Dict]]:
+        if not self.snapshot_path.exists():
+            return None
+        header, core = self._read_snapshot()
+        return int(header["version"]), core
+
+    def _read_snapshot(self, header_only: bool = False) -> Tuple[Dict, Optional[Dict]]:
+        """(header, core) of the snapshot; the core is left unread with ``header_only``."""
+
+        with gzip.open(self.snapshot_path, "rb") as handle:
+            header = pickle.load(handle)
+            if "core" in header:
+                # Written before snapshots had a separate header.
+                return header, header["core"]
+            return header, None if header_only else pickle.load(handle)
+
+    def changed_snapshot(self) -> Optional[Tuple[int, Dict]]:
+        """The snapshot if it was written since this process last saw it, else None."""
+
+        with self.exclusive():
+            stamp = _stamp(self.snapshot_path)
+            if stamp == self._snapshot_seen:
+                return None
+            self._snapshot_seen = stamp
+            if stamp is None:
+                return None
+            header, core = self._read_snapshot()
+            self._verify("snapshot", header.get("config"))
+            return int(header["version"]), core  # type: ignore[return-value]
+
+    def write_snapshot(self, version: int, core: Dict) -> None:
+        tmp_path = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+        with tmp_path.open("wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=1) as handle:
+                pickle.dump({"version": version, "config": self.config}, handle, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(core, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        _fsync_dir(self.dataset_dir)
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+    def should_compact(self) -> bool:
+        return not self._compacting.is_set() and self.size() >= self.compact_bytes
+
+    def compact(self, new_state: Callable[[], object]) -> Optional[int]:
+        """Fold the current log into a new snapshot and drop the folded records.
+
+        ``new_state`` must return a fresh dynamic state built from the base
+        summary with the same maintenance policy as the live one. The live
+        state is never touched, so appends can continue while this runs.
+        Returns the snapshot version, or None if there was nothing to fold.
+        """
+
+        with self._snapshot_lock:
+            return self._compact(new_state)
+
+    def _compact(self, new_state: Callable[[], object]) -> Optional[int]:
+        with self.exclusive():
+            wal, snapshot_stamp = _stamp(self.wal_path), _stamp(self.snapshot_path)
+        if wal is None or wal[2] == 0:
+            return None
+        end_offset = wal[2]
+
+        state = new_state()
+        snapshot = self.load_snapshot()
+        snapshot_version = 0
+        if snapshot is not None:
+            snapshot_version, core = snapshot
+            state.restore_core(core)  # type: ignore[attr-defined]
+
+        folded_version = snapshot_version
+        for version, entry in self.records(snapshot_version, end_offset):
+            try:
+                if isinstance(entry, RollbackRecord):
+                    entry.apply_to(state)
+                else:
+                    state.apply_updates(entry)  # type: ignore[attr-defined]
+            except UpdateStreamError as exc:
+                raise UpdateLogError(f"Logged batch v{version} of {self.wal_path} could not be applied: {exc}") from exc
+            folded_version = version
+        if folded_version == snapshot_version:
+            return None
+
+        core = state.export_core()  # type: ignore[attr-defined]
+        with self.exclusive():
+            current = _stamp(self.wal_path)
+            if current is None or current[0] != wal[0] or _stamp(self.snapshot_path) != snapshot_stamp:
+                logger.info("%s was rewritten by another writer; skipping this compaction", self.wal_path)
+                return None
+            self.write_snapshot(folded_version, core)
+            self._drop_prefix(end_offset)
+        logger.info("Compacted %s into snapshot v%d", self.wal_path, folded_version)
+        return folded_version
+
+    def rebase(self, version: int, core: Dict) -> None:
+        """Make ``core`` the snapshot at ``version`` and drop every record up to it.
+
+        Used after the live state was replaced wholesale (see
+        ``VersionedSummary.rebase``); records appended after the swap are kept.
+        """
+
+        with self.exclusive():
+            self.write_snapshot(version, core)
+            self._snapshot_seen = _stamp(self.snapshot_path)
+            end_offset = self.size()
+            # Versions only grow along the file, so the records to keep form a suffix.
+            offset = 0
+            if end_offset:
+                with self.wal_path.open("rb") as handle:
+                    while offset < end_offset:
+                        line = handle.readline()
+                        if line.startswith(_HEADER_PREFIX):
+                            offset += len(line)
+                            continue
+                        try:
+                            if int(json.loads(line)["v"]) > version:
+                                break
+                        except (json.JSONDecodeError, KeyError, ValueError):
+                            break
+                        offset += len(line)
+            self._drop_prefix(offset)
+        logger.info("Rebased %s onto snapshot v%d", self.wal_path, version)
+
+    def _drop_prefix(self, offset: int) -> None:
+        if offset == 0:
+            return
+        with self.exclusive():
+            header = self._header_line()
+            if not header and self.config is not None:
+                header = _encode_line({"c": self.config})
+            tmp_path = self.wal_path.with_name(self.wal_path.name + ".tmp")
+            with self.wal_path.open("rb") as source, tmp_path.open("wb") as target:
+                target.write(header)
+                source.seek(offset)
+                while True:
+                    chunk = source.read(1 << 20)
+                    if not chunk:
+                        break
+                    target.write(chunk)
+                target.flush()
+                os.fsync(target.fileno())
+            os.replace(tmp_path, self.wal_path)
+            _fsync_dir(self.dataset_dir)
+
+    def compact_in_background(self, new_state: Callable[[], object]) -> bool:
+        """Start ``compact`` on a daemon thread unless one is already running."""
+
+        with self._lock:
+            if self._compacting.is_set():
+                return False
+            self._compacting.set()
+
+        def _run() -> None:
+            try:
+                self.compact(new_state)
+            except Exception:
+                logger.exception("Background compaction of %s failed", self.wal_path)
+            finally:
+                self._compacting.clear()
+
+        threading.Thread(target=_run, name=f"compact-{self.dataset_dir.name}", daemon=True).start()
+        return True
@@ -0,0 +1,285 @@
+"""Synthetic edge update workloads built from summary artifacts.
+
+Streams are produced lazily, so millions of operations can be generated
+without materialising them. Node ids come from the supernode membership in
+``artifacts``. Deletions draw from a pool of live edges: the (possibly
+sampled) initial edge list plus every edge the stream itself inserted.
+
+Mixes:
+
+* ``uniform``  - both endpoints uniformly at random
+* ``hub``      - endpoints drawn from a power law over nodes ranked by degree
+* ``locality`` - endpoints inside one supernode or across one of its superedges
+* ``churn``    - repeated inserts and deletes between one supernode pair
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import random
+from dataclasses import dataclass
+from itertools import accumulate, islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Literal, Optional, Tuple
+
+from backend.dynamic_updates import EdgeUpdate, EdgeKey
+from backend.output_types import PoligrasOutput
+
+WorkloadMix = Literal["uniform", "hub", "locality", "churn"]
+WORKLOAD_MIXES: Tuple[WorkloadMix, ...] = ("uniform", "hub", "locality", "churn")
+
+# Endpoint draws per insertion before the stream falls back to a deletion.
+_INSERT_RETRIES = 8
+# Consecutive empty draws after which a single-operation stream gives up.
+_MAX_STALLS = 1000
+
+
+@dataclass(frozen=True)
+class WorkloadSpec:
+    mix: WorkloadMix = "uniform"
+    insert_ratio: float = 0.5
+    skew: float = 1.2
+    locality: float = 0.9
+    seed: Optional[int] = None
+
+
+class _EdgePool:
+    """Set of edges with O(1) membership, insertion and uniform random removal."""
+
+    def __init__(self, edges: Iterable[EdgeKey] = ()):
+        self._edges: List[EdgeKey] = []
+        self._index: Dict[EdgeKey, int] = {}
+        for edge in edges:
+            self.add(edge)
+
+    def __len__(self) -> int:
+        return len(self._edges)
+
+    def __contains__(self, edge: EdgeKey) -> bool:
+        return edge in self._index
+
+    def __iter__(self) -> Iterator[EdgeKey]:
+        return iter(self._edges)
+
+    def add(self, edge: EdgeKey) -> None:
+        if edge not in self._index:
+            self._index[edge] = len(self._edges)
+            self._edges.append(edge)
+
+    def discard(self, edge: EdgeKey) -> None:
+        position = self._index.pop(edge, None)
+        if position is None:
+            return
+        last = self._edges.pop()
+        if position < len(self._edges):
+            self._edges[position] = last
+            self._index[last] = position
+
+    def pop_random(self, rng: random.Random) -> Optional[EdgeKey]:
+        if not self._edges:
+            return None
+        edge = self._edges[rng.randrange(len(self._edges))]
+        self.discard(edge)
+        return edge
+
+
+class WorkloadGenerator:
+    """Lazily generates ``EdgeUpdate`` streams for one summary."""
+
+    def __init__(self, summary_output: PoligrasOutput, spec: WorkloadSpec = WorkloadSpec()):
+        if not 0.0 <= spec.insert_ratio <= 1.0:
+            raise ValueError("insert_ratio must be between 0 and 1")
+        if spec.mix not in WORKLOAD_MIXES:
+            raise ValueError(f"Unknown workload mix '{spec.mix}'")
+
+        artifacts = summary_output.get("artifacts") or {}
+        supernodes = artifacts.get("supernodes") or {}
+        self.members: Dict[str, List[str]] = {
+            str(supernode): [str(node) for node in nodes]
+            for supernode, nodes in (supernodes.get("members") or {}).items()
+        }
+        if not self.members:
+            raise ValueError("Summary artifacts do not contain supernode membership information.")
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+        self.nodes: List[str] = [node for nodes in self.members.values() for node in nodes]
+
+        initial = summary_output.get("graphs", {}).get("initial", {})
+        self.directed = bool(initial.get("directed", False))
+        self.live = _EdgePool(
+            self._edge_key(str(edge["source"]), str(edge["target"]))
+            for edge in initial.get("edges", []) or []
+            if str(edge["source"]) != str(edge["target"])
+        )
+
+        summary_edges = summary_output.get("graphs", {}).get("summary", {}).get("edges", []) or []
+        self._neighbours: Dict[str, List[str]] = {}
+        for edge in summary_edges:
+            source, target = str(edge["source"]), str(edge["target"])
+            if source in self.members and target in self.members and source != target:
+                self._neighbours.setdefault(source, []).append(target)
+                self._neighbours.setdefault(target, []).append(source)
+
+        self._hub_nodes: List[str] = []
+        self._hub_weights: List[float] = []
+        if spec.mix == "hub":
+            degrees = {str(node["id"]): int(node.get("degree", 0)) for node in initial.get("nodes", []) or []}
+            ranked = sorted(self.nodes, key=lambda node: (-degrees.get(node, 0), self.rng.random()))
+            self._hub_nodes = ranked
+            self._hub_weights = list(accumulate((rank + 1) ** -spec.skew for rank in range(len(ranked))))
+
+        self._local_supernodes: List[str] = []
+        self._local_weights: List[float] = []
+        if spec.mix == "locality":
+            self._local_supernodes = [
+                supernode for supernode, nodes in self.members.items()
+                if len(nodes) > 1 or supernode in self._neighbours
+            ]
+            self._local_weights = list(accumulate(len(self.members[s]) for s in self._local_supernodes))
+
+        self._churn_pair: Optional[Tuple[str, str]] = None
+        self._churn_live = _EdgePool()
+        if spec.mix == "churn":
+            self._churn_pair = self._pick_churn_pair()
+            left_nodes, right_nodes = (set(self.members[supernode]) for supernode in self._churn_pair)
+            self._churn_live = _EdgePool(
+                edge for edge in self.live
+                if (edge[0] in left_nodes and edge[1] in right_nodes)
+                or (edge[0] in right_nodes and edge[1] in left_nodes)
+            )
+
+    def _edge_key(self, source: str, target: str) -> EdgeKey:
+        if self.directed or source <= target:
+            return (source, target)
+        return (target, source)
+
+    # ------------------------------------------------------------------
+    # Endpoint samplers
+    # ------------------------------------------------------------------
+    def _pick_churn_pair(self) -> Tuple[str, str]:
+        best: Optional[Tuple[int, Tuple[str, str]]] = None
+        for source, targets in self._neighbours.items():
+            for target in targets:
+                possible = len(self.members[source]) * len(self.members[target])
+                if best is None or possible > best[0]:
+                    best = (possible, (source, target))
+        if best is not None:
+            return best[1]
+        largest = sorted(self.members, key=lambda supernode: -len(self.members[supernode]))
+        return (largest[0], largest[1] if len(largest) > 1 else largest[0])
+
+    def _weighted(self, items: List[str], cumulative: List[float]) -> str:
+        return items[bisect.bisect_left(cumulative, self.rng.random() * cumulative[-1])]
+
+    def _endpoints(self) -> Tuple[str, str]:
+        rng = self.rng
+        mix = self.spec.mix
+        if mix == "hub":
+            return self._weighted(self._hub_nodes, self._hub_weights), self._weighted(self._hub_nodes, self._hub_weights)
+        if mix == "locality" and self._local_supernodes and rng.random() < self.spec.locality:
+            supernode = self._weighted(self._local_supernodes, self._local_weights)
+            neighbours = self._neighbours.get(supernode)
+            other = rng.choice(neighbours) if neighbours and rng.random() < 0.5 else supernode
+            return rng.choice(self.members[supernode]), rng.choice(self.members[other])
+        if mix == "churn" and self._churn_pair is not None:
+            left, right = self._churn_pair
+            return rng.choice(self.members[left]), rng.choice(self.members[right])
+        return rng.choice(self.nodes), rng.choice(self.nodes)
+
+    # ------------------------------------------------------------------
+    # Stream
+    # ------------------------------------------------------------------
+    def _insert(self) -> Optional[EdgeUpdate]:
+        pool = self._churn_live if self.spec.mix == "churn" else self.live
+        for _ in range(_INSERT_RETRIES):
+            source, target = self._endpoints()
+            if source == target:
+                continue
+            edge = self._edge_key(source, target)
+            if edge in pool:
+                continue
+            pool.add(edge)
+            if pool is not self.live:
+                self.live.add(edge)
+            return EdgeUpdate("add", source, target)
+        return None
+
+    def _delete(self) -> Optional[EdgeUpdate]:
+        pool = self._churn_live if self.spec.mix == "churn" else self.live
+        edge = pool.pop_random(self.rng)
+        if edge is None:
+            return None
+        if pool is not self.live:
+            self.live.discard(edge)
+        return EdgeUpdate("remove", edge[0], edge[1])
+
+    def stream(self) -> Iterator[EdgeUpdate]:
+        """Infinite update stream; slice it with ``take`` or ``itertools.islice``.
+
+        With ``insert_ratio`` 1.0 (or 0.0) only insertions (or deletions)
+        are emitted. Such a stream ends early if no fresh edge (or no live
+        edge) turns up in ``_MAX_STALLS`` consecutive attempts.
+        """
+
+        ratio = self.spec.insert_ratio
+        mixed = 0.0 < ratio < 1.0
+        stalls = 0
+        while True:
+            wants_insert = self.rng.random() < ratio
+            update = self._insert() if wants_insert else self._delete()
+            if update is None and mixed:
+                # Nothing left to delete, or no fresh edge found: flip the operation.
+                update = self._delete() if wants_insert else self._insert()
+            if update is None:
+                stalls += 1
+                if stalls >= _MAX_STALLS:
+                    return
+                continue
+            stalls = 0
+            yield update
+
+    def take(self, count: int) -> Iterator[EdgeUpdate]:
+        return islice(self.stream(), count)
+
+
+def write_workload(updates: Iterator[EdgeUpdate], path: Path, fmt: str = "ndjson") -> int:
+    """Write updates as NDJSON or an ``op source target`` edge list; returns the count."""
+
+    written = 0
+    with path.open("w", encoding="utf-8") as handle:
+        for update in updates:
+            if fmt == "ndjson":
+                handle.write(json.dumps({"type": update.operation, "source": update.source, "target": update.target}))
+                handle.write("\n")
+            else:
+                handle.write(f"{'+' if update.operation == 'add' else '-'} {update.source} {update.target}\n")
+            written += 1
+    return written
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic edge update stream from a summary output.")
+    parser.add_argument("input_path", type=str, help="Path to output.json")
+    parser.add_argument("output_path", type=str, help="Where to write the update stream")
+    parser.add_argument("--num-updates", "-n", type=int, default=1_000_000)
+    parser.add_argument("--mix", choices=WORKLOAD_MIXES, default="uniform")
+    parser.add_argument("--insert-ratio", type=float, default=0.5)
+    parser.add_argument("--skew", type=float, default=1.2, help="Power-law exponent for the hub mix")
+    parser.add_argument("--locality", type=float, default=0.9, help="Share of local updates for the locality mix")
+    parser.add_argument("--format", choices=["ndjson", "edgelist"], default="ndjson")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.input_path, "r", encoding="utf-8") as f:
+        summary_output = json.load(f)
+    spec = WorkloadSpec(args.mix, args.insert_ratio, args.skew, args.locality, args.seed)
+    generator = WorkloadGenerator(summary_output, spec)
+    written = write_workload(generator.take(args.num_updates), Path(args.output_path), args.format)
+    print(f"Wrote {written} {args.mix} updates to {args.output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -557,6 +557,7 @@ export default function TimelineVisualizationPage() {
                     {/* Edge Update Panel */}
                     <EdgeUpdatePanel
                         datasetId={datasetId}
+                        currentOutput={output}
                         onUpdateApplied={handleEdgeUpdateApplied}
                     />
                 </div>
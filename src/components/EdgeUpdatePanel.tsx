@@ -2,14 +2,16 @@
 
 import React, { useState, useRef, useCallback } from "react";
 import { Upload, CheckCircle, XCircle, Loader2, RefreshCw } from "lucide-react";
-import { PoligrasOutput } from "@/types";
+import { PoligrasOutput, SummaryDiff } from "@/types";
+import { applySummaryDiff } from "@/lib/summaryDiff";
 
 interface EdgeUpdatePanelProps {
     datasetId: string;
+    currentOutput: PoligrasOutput | null;
     onUpdateApplied: (updatedOutput: PoligrasOutput) => void;
 }
 
-export default function EdgeUpdatePanel({ datasetId, onUpdateApplied }: EdgeUpdatePanelProps) {
+export default function EdgeUpdatePanel({ datasetId, currentOutput, onUpdateApplied }: EdgeUpdatePanelProps) {
     const [file, setFile] = useState<File | null>(null);
     const [isUploading, setIsUploading] = useState(false);
     const [status, setStatus] = useState<"idle" | "uploading" | "success" | "error">("idle");
@@ -20,6 +22,8 @@ export default function EdgeUpdatePanel({ datasetId, onUpdateApplied }: EdgeUpda
     } | null>(null);
 
     const fileInputRef = useRef<HTMLInputElement>(null);
+    // Summary version held by the page; the original output.json is version 0.
+    const versionRef = useRef(0);
 
     const handleFileChange = useCallback((e: React.ChangeEvent<HTMLInputElement>) => {
         const selectedFile = e.target.files?.[0];
@@ -32,7 +36,7 @@ export default function EdgeUpdatePanel({ datasetId, onUpdateApplied }: EdgeUpda
     }, []);
 
     const handleApplyUpdates = useCallback(async () => {
-        if (!file || !datasetId) return;
+        if (!file || !datasetId || !currentOutput) return;
 
         setIsUploading(true);
         setStatus("uploading");
@@ -42,7 +46,7 @@ export default function EdgeUpdatePanel({ datasetId, onUpdateApplied }: EdgeUpda
         formData.append("updates_file", file);
 
         try {
-            const response = await fetch(`/api/datasets/${datasetId}/apply-updates`, {
+            const response = await fetch(`/api/datasets/${datasetId}/apply-updates?since=${versionRef.current}`, {
                 method: "POST",
                 body: formData,
             });
@@ -52,7 +56,9 @@ export default function EdgeUpdatePanel({ datasetId, onUpdateApplied }: EdgeUpda
                 throw new Error(errorData.detail || `Failed with status ${response.status}`);
             }
 
-            const updatedOutput: PoligrasOutput = await response.json();
+            const diff: SummaryDiff = await response.json();
+            const updatedOutput = applySummaryDiff(currentOutput, diff);
+            versionRef.current = diff.to_version;
 
             const summarySnapshot = updatedOutput.graphs?.summary;
             setUpdateStats({
@@ -72,7 +78,7 @@ export default function EdgeUpdatePanel({ datasetId, onUpdateApplied }: EdgeUpda
             setStatus("error");
             setIsUploading(false);
         }
-    }, [file, datasetId, onUpdateApplied]);
+    }, [file, datasetId, currentOutput, onUpdateApplied]);
 
     const resetPanel = useCallback(() => {
         setFile(null);
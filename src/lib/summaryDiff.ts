@@ -0,0 +1,52 @@
+import { PoligrasOutput, SummaryDiff, SummaryEdge, SummaryNode } from "@/types";
+
+function edgeKey(edge: { source: string; target: string }, directed: boolean): string {
+    const source = String(edge.source);
+    const target = String(edge.target);
+    if (directed || source <= target) {
+        return `${source}|${target}`;
+    }
+    return `${target}|${source}`;
+}
+
+/**
+ * Applies a versioned summary diff from the backend to the summary held by
+ * the client. Returns a new output object; the input is not mutated.
+ */
+export function applySummaryDiff(current: PoligrasOutput, diff: SummaryDiff): PoligrasOutput {
+    if (diff.snapshot) {
+        return diff.snapshot;
+    }
+
+    const summary = current.graphs.summary;
+    const directed = summary.directed;
+
+    const nodes = new Map<string, SummaryNode>(summary.nodes.map((node) => [String(node.id), node]));
+    diff.supernodes?.removed.forEach((id) => nodes.delete(id));
+    diff.supernodes?.upserted.forEach(({ id, size }) => {
+        nodes.set(id, { ...(nodes.get(id) ?? {}), id, size });
+    });
+
+    const edges = new Map<string, SummaryEdge>(summary.edges.map((edge) => [edgeKey(edge, directed), edge]));
+    diff.superedges?.removed.forEach((edge) => edges.delete(edgeKey(edge, directed)));
+    diff.superedges?.added.forEach((edge) => edges.set(edgeKey(edge, directed), edge));
+    diff.superedges?.changed.forEach((edge) => edges.set(edgeKey(edge, directed), edge));
+
+    const stats = diff.stats ?? current.stats;
+
+    return {
+        ...current,
+        stats,
+        graphs: {
+            ...current.graphs,
+            summary: {
+                ...summary,
+                nodes: Array.from(nodes.values()),
+                edges: Array.from(edges.values()),
+                node_count: nodes.size,
+                edge_count: edges.size,
+                correction_edge_count: stats.summary.correction_edges,
+            },
+        },
+    };
+}
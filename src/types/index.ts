@@ -159,3 +159,40 @@ export interface GraphStep {
     corrections: Corrections;
     action_metadata: ActionMetadata;
 }
+
+// ============================================
+// Dynamic Update Diffs (apply-updates responses)
+// ============================================
+
+export interface CorrectionEdge {
+    source: string;
+    target: string;
+}
+
+export interface CorrectionChanges {
+    added: CorrectionEdge[];
+    removed: CorrectionEdge[];
+}
+
+export interface SummaryDiff {
+    from_version: number | null;
+    to_version: number;
+    superedges?: {
+        added: SummaryEdge[];
+        removed: { source: string; target: string }[];
+        changed: SummaryEdge[];
+    };
+    corrections?: {
+        positive: CorrectionChanges;
+        negative: CorrectionChanges;
+    };
+    supernodes?: {
+        upserted: (SummaryNode & { members: string[] })[];
+        removed: string[];
+    };
+    stats?: Stats;
+    stats_delta?: Partial<Record<keyof Stats, unknown>>;
+    // Present instead of the change lists when the requested base version
+    // is no longer retained by the server.
+    snapshot?: PoligrasOutput;
+}